@@ -0,0 +1,229 @@
+# audio_capture_hub.py
+#
+# One audio capture shared by every pipeline that listens to an input device
+#
+# This module:
+# - Owns the app's single PortAudio context (PyAudio), created once at
+#   startup, so starting a pipeline no longer pays for PortAudio's device
+#   enumeration
+# - Opens each input device at most once, on the first subscription, and
+#   reads it on its own thread; the stream is closed when the last subscriber
+#   leaves, and a new subscription to that device waits until it is closed
+#   (so the device is never opened twice)
+# - Fans every captured block out to all subscribers of the device (long-form
+#   recorder, real-time lanes, level meter, ...). The block is the immutable
+#   bytes object PyAudio returned, so subscribers share it without copies,
+#   and two pipelines on the same microphone cost one capture
+# - Gives every subscriber a bounded queue: a subscriber that falls behind
+#   loses its own oldest blocks (counted as dropped frames) and never holds up
+#   the capture or the other subscribers
+# - Tracks frames the device itself dropped with a CaptureClock per device
+# - Provides a level meter subscriber (peak dBFS per input, as a metric)
+#
+# All devices use the configured format, channel count, rate and chunk size
+
+import math
+import queue
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pyaudio
+
+from metrics import REGISTRY, DROPPED_FRAMES, CaptureClock
+
+INPUT_PEAK_DBFS = REGISTRY.gauge(
+    "stt_input_peak_dbfs", "Peak level of the latest capture block of an input", ["input"])
+
+
+def device_label(device_index: Optional[int]) -> str:
+    return "input:default" if device_index is None else f"input:{device_index}"
+
+
+class CaptureSubscription:
+    """A subscriber's view of one input device: its blocks in capture order."""
+
+    def __init__(self, hub: "AudioCaptureHub", device: "DeviceCapture", name: str, max_blocks: int):
+        self.hub = hub
+        self.device = device
+        self.name = name
+        self.blocks: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_blocks)
+        self.closed = False     # Set when unsubscribed or when the device failed
+        self.dropped = 0
+
+    def _deliver(self, data: bytes) -> None:
+        """Called on the device thread; never blocks."""
+        try:
+            self.blocks.put_nowait(data)
+        except queue.Full:
+            # Behind by max_blocks: drop the oldest block of this subscriber only
+            try:
+                self.blocks.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            DROPPED_FRAMES.inc(len(data) // 2, source=self.name)
+            self.blocks.put_nowait(data)
+
+    def _end(self) -> None:
+        self.closed = True
+        try:
+            self.blocks.put_nowait(None)
+        except queue.Full:
+            pass  # The reader sees `closed` after its next block
+
+    def read(self, timeout: float = 0.5) -> Optional[bytes]:
+        """Next block, or None after `timeout` seconds without one or once the subscription ended."""
+        if self.closed and self.blocks.empty():
+            return None
+        try:
+            return self.blocks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.hub._unsubscribe(self)
+
+
+class DeviceCapture:
+    """One open input stream and the thread reading it."""
+
+    def __init__(self, hub: "AudioCaptureHub", device_index: Optional[int]):
+        self.hub = hub
+        self.device_index = device_index
+        self.label = device_label(device_index)
+        self.subscribers: Tuple[CaptureSubscription, ...] = ()  # Replaced on change, iterated without a lock
+        self.running = True
+        self.stopped = threading.Event()  # Set once the stream is closed
+        self.stream = hub.audio.open(
+            format=hub.config.format,
+            channels=hub.config.channels,
+            rate=hub.config.rate,
+            input=True,
+            frames_per_buffer=hub.config.chunk,
+            input_device_index=device_index
+        )
+        self.thread = threading.Thread(target=self._run, name=f"capture-{self.label}", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        chunk = self.hub.config.chunk
+        clock = CaptureClock(self.label, self.hub.config.rate, chunk)
+        while self.running:
+            try:
+                data = self.stream.read(chunk, exception_on_overflow=False)
+            except Exception as e:
+                if self.running:
+                    self.hub.console.print(f"[bold red]Audio capture from {self.label} failed: {e}[/bold red]")
+                    self.hub._device_failed(self)
+                return
+            clock.read(len(data) // 2)
+            for subscriber in self.subscribers:
+                subscriber._deliver(data)
+
+    def stop(self) -> None:
+        self.running = False
+        try:
+            if self.thread is not threading.current_thread():
+                self.thread.join(timeout=2.0)
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception as e:
+                self.hub.console.print(f"[red]Error closing audio stream {self.label}: {e}[/red]")
+        finally:
+            self.stopped.set()
+
+
+class AudioCaptureHub:
+    def __init__(self, config, console, buffer_seconds: float = 2.0):
+        self.config = config
+        self.console = console
+        self.audio = pyaudio.PyAudio()  # Device enumeration happens once, here
+        self.devices: Dict[Optional[int], DeviceCapture] = {}
+        self.closing: Dict[Optional[int], DeviceCapture] = {}  # Removed from devices, stream not closed yet
+        self.lock = threading.Lock()
+        self.max_blocks = max(4, int(buffer_seconds * config.rate / config.chunk))
+
+    def subscribe(self, device_index: Optional[int], name: str) -> CaptureSubscription:
+        """Receive the blocks of an input device (opened now unless already captured); raises if it can't open."""
+        while True:
+            with self.lock:
+                closing = self.closing.get(device_index)
+                if closing is None:
+                    device = self.devices.get(device_index)
+                    if device is None:
+                        device = self.devices[device_index] = DeviceCapture(self, device_index)
+                    subscription = CaptureSubscription(self, device, name, self.max_blocks)
+                    device.subscribers = device.subscribers + (subscription,)
+                    return subscription
+            # The last subscriber just left and the stream is still closing: reopen only after it is closed
+            closing.stopped.wait()
+
+    def _stop_device(self, device: DeviceCapture) -> None:
+        """Close a device already removed from `devices` (registered in `closing` until it is closed)."""
+        try:
+            device.stop()
+        finally:
+            with self.lock:
+                if self.closing.get(device.device_index) is device:
+                    del self.closing[device.device_index]
+
+    def _unsubscribe(self, subscription: CaptureSubscription) -> None:
+        device = subscription.device
+        with self.lock:
+            device.subscribers = tuple(s for s in device.subscribers if s is not subscription)
+            if device.subscribers or self.devices.get(device.device_index) is not device:
+                return
+            del self.devices[device.device_index]
+            self.closing[device.device_index] = device
+        self._stop_device(device)
+
+    def _device_failed(self, device: DeviceCapture) -> None:
+        with self.lock:
+            owned = self.devices.get(device.device_index) is device  # Else it is already being stopped
+            if owned:
+                del self.devices[device.device_index]
+                self.closing[device.device_index] = device
+            subscribers = device.subscribers
+            device.subscribers = ()
+        for subscriber in subscribers:
+            subscriber._end()
+        if owned:
+            self._stop_device(device)
+
+    def sample_size(self) -> int:
+        return self.audio.get_sample_size(self.config.format)
+
+    def close(self) -> None:
+        """Stop every capture and release PortAudio."""
+        with self.lock:
+            devices = list(self.devices.values())
+            self.devices.clear()
+        for device in devices:
+            for subscriber in device.subscribers:
+                subscriber._end()
+            device.stop()
+        self.audio.terminate()
+
+
+class LevelMeter:
+    """Subscriber that exports the peak level of an input (stt_input_peak_dbfs)."""
+
+    def __init__(self, hub: AudioCaptureHub, device_index: Optional[int]):
+        self.label = device_label(device_index)
+        self.subscription = hub.subscribe(device_index, f"level-{self.label}")
+        self.thread = threading.Thread(target=self._run, name=f"level-{self.label}", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while not self.subscription.closed:
+            data = self.subscription.read()
+            if data:
+                peak = int(np.abs(np.frombuffer(data, dtype=np.int16).astype(np.int32)).max())
+                INPUT_PEAK_DBFS.set(round(20 * math.log10(max(peak, 1) / 32768), 1), input=self.label)
+
+    def close(self) -> None:
+        self.subscription.close()
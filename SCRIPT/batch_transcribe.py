@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# batch_transcribe.py
+#
+# Headless batch transcription of static files
+#
+# Runs the same streaming static pipeline as the F10 hotkey, without the
+# tray, the hotkeys or a file dialog, so transcription can be scripted:
+# - Accepts files, directories (searched recursively) and glob patterns
+# - Gives every job its own workspace (checkpoint directory), so several
+#   files can be processed at once
+# - Transcribes up to --jobs files concurrently and prefetches the next file
+#   (FFmpeg decode + VAD fill its segment queue while the model is busy)
+# - Keeps a manifest of content hashes and parameters and skips files whose
+#   outputs are up to date
+# - Prints a throughput summary at the end
+# - Optionally traces every job's stages to JSONL (--trace DIR, see trace_report.py)
+#
+# Usage:
+#   python batch_transcribe.py PATH [PATH ...] [--jobs 1] [--prefetch 1] [--formats txt,srt]
+#                              [--output-dir DIR] [--manifest FILE] [--force] [--language el]
+#                              [--trace DIR]
+
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import threading
+from typing import Dict, List
+from rich.console import Console
+from main import Config
+from transcription_engine import Transcriber
+from static_file_processor import StaticFileProcessor
+from job_checkpoint import file_content_hash
+from job_control import CancellationToken
+from job_queue import is_media_file
+from transcript_formats import TIMED_FORMATS, parse_formats
+from tracing import TRACER
+
+class NullTray:
+    """The static processor reports status through the tray; there is none in headless mode."""
+
+    def set_color(self, *args, **kwargs):
+        pass
+
+    def flash_white(self, *args, **kwargs):
+        pass
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """Files, directories (recursive, media files only) and glob patterns -> unique file list."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                files.extend(os.path.join(root, n) for n in sorted(names) if is_media_file(n))
+        elif os.path.isfile(pattern):
+            files.append(pattern)
+        else:
+            files.extend(sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p)))
+
+    unique, seen = [], set()
+    for path in files:
+        path = os.path.abspath(path)
+        if path not in seen:
+            seen.add(path)
+            unique.append(path)
+    return unique
+
+
+class Manifest:
+    """JSON record of finished files: content hash, parameters and outputs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.entries = {}
+
+    def is_current(self, file_path: str, file_hash: str, params: Dict) -> bool:
+        entry = self.entries.get(file_path)
+        return (entry is not None and entry["hash"] == file_hash and entry["params"] == params
+                and all(os.path.exists(p) for p in entry["outputs"]))
+
+    def record(self, file_path: str, file_hash: str, params: Dict, outputs: List[str]) -> None:
+        with self.lock:
+            self.entries[file_path] = {"hash": file_hash, "params": params, "outputs": outputs,
+                                       "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+def workspace_for(root: str, file_path: str) -> str:
+    """Per-job working directory (holds the job's checkpoint)."""
+    key = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(file_path))[0][:40]
+    return os.path.join(root, f"{name}-{key}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe audio/video files without the hotkey app")
+    parser.add_argument("inputs", nargs="+", help="Files, directories or glob patterns")
+    parser.add_argument("--jobs", type=int, default=1, help="Files transcribed concurrently")
+    parser.add_argument("--prefetch", type=int, default=1, help="Files decoded + VAD'd ahead of the model")
+    parser.add_argument("--formats", default=None, help="Output formats (txt,srt,vtt,json)")
+    parser.add_argument("--output-dir", default=None, help="Write outputs here instead of next to each file")
+    parser.add_argument("--manifest", default=None, help="Manifest file (default: <output dir or temp_audio>/batch_manifest.json)")
+    parser.add_argument("--force", action="store_true", help="Transcribe files even if the manifest says they are current")
+    parser.add_argument("--language", default=None, help="Language (defaults to the configured long-form language)")
+    parser.add_argument("--model", default=None, help="Model (defaults to the configured long-form model)")
+    parser.add_argument("--trace", default=None, metavar="DIR", help="Write pipeline spans (JSONL) to this directory")
+    args = parser.parse_args()
+
+    console = Console()
+    config = Config.load_from_file()
+    if args.formats:
+        config.static_output_formats = args.formats
+    if args.language:
+        config.longform_language = args.language
+    # Every concurrent job needs a model worker of its own
+    config.model_num_workers = max(config.model_num_workers, args.jobs)
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        sys.exit("No input files found.")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.trace:
+        console.print(f"[cyan]Tracing to {TRACER.start(args.trace)}[/cyan]")
+    console.print(f"[cyan]Loading model {args.model or config.longform_model}...[/cyan]")
+    transcriber = Transcriber(config, console, model_id=args.model or config.longform_model)
+    processor = StaticFileProcessor(config, console, transcriber, NullTray())
+
+    workspace_root = os.path.join(processor.temp_dir, "batch_jobs")
+    manifest = Manifest(args.manifest or os.path.join(args.output_dir or processor.temp_dir, "batch_manifest.json"))
+    vad = processor.create_vad()
+    timed = any(fmt in TIMED_FORMATS for fmt in parse_formats(config.static_output_formats))
+    params = processor.job_parameters(vad.name if vad is not None else "", timed)
+    params["formats"] = config.static_output_formats
+    params["output_dir"] = os.path.abspath(args.output_dir) if args.output_dir else ""
+
+    # Skip files whose outputs are up to date
+    pending = []
+    skipped = 0
+    for path in files:
+        file_hash = file_content_hash(path)
+        if not args.force and manifest.is_current(path, file_hash, params):
+            skipped += 1
+            console.print(f"[yellow]Up to date, skipping: {path}[/yellow]")
+        else:
+            pending.append((path, file_hash))
+
+    token = CancellationToken()
+    transcribe_slots = threading.Semaphore(max(1, args.jobs))
+    job_slots = threading.Semaphore(max(1, args.jobs) + max(0, args.prefetch))
+    results, failures = [], []
+    results_lock = threading.Lock()
+
+    def run(path: str, file_hash: str):
+        gate = threading.Event()
+        slot = {"held": False, "done": False}
+        slot_lock = threading.Lock()
+
+        def wait_for_slot():
+            # Decode + VAD start at once; the model is used once a transcription slot is free
+            while not token.cancelled:
+                if transcribe_slots.acquire(timeout=0.2):
+                    with slot_lock:
+                        if slot["done"]:
+                            transcribe_slots.release()  # The job ended before it got its turn
+                            return
+                        slot["held"] = True
+                    gate.set()
+                    return
+
+        threading.Thread(target=wait_for_slot, daemon=True).start()
+        try:
+            console.print(f"[bold cyan]Starting: {path}[/bold cyan]")
+            result = processor.run_job(path, token, workspace=workspace_for(workspace_root, path),
+                                       output_dir=args.output_dir, transcribe_gate=gate, show_transcript=False)
+            with results_lock:
+                if result is not None:
+                    results.append(result)
+                    manifest.record(path, file_hash, params, result.outputs)
+        except Exception as e:
+            console.print(f"[bold red]Failed: {path}: {e}[/bold red]")
+            with results_lock:
+                failures.append(path)
+        finally:
+            with slot_lock:
+                slot["done"] = True
+                if slot["held"]:
+                    transcribe_slots.release()
+            job_slots.release()
+
+    wall_start = time.time()
+    threads = []
+    try:
+        for path, file_hash in pending:
+            while not job_slots.acquire(timeout=0.2):
+                pass
+            thread = threading.Thread(target=run, args=(path, file_hash), daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.2)
+    except KeyboardInterrupt:
+        console.print("[bold yellow]Interrupted - finishing the model calls in flight (checkpoints are kept)...[/bold yellow]")
+        token.cancel("interrupted")
+        for thread in threads:
+            thread.join()
+
+    # Throughput summary
+    wall = time.time() - wall_start
+    audio = sum(r.audio_seconds for r in results)
+    speech = sum(r.speech_seconds for r in results)
+    console.print("\n[bold]Batch summary[/bold]")
+    console.print(f"  Files transcribed: {len(results)}   skipped: {skipped}   failed: {len(failures)}"
+                  f"   cancelled: {len(pending) - len(results) - len(failures)}")
+    console.print(f"  Audio: {audio / 3600:.2f} h ({speech / 3600:.2f} h of speech)   wall time: {wall:.1f} s")
+    if wall > 0 and audio > 0:
+        console.print(f"  Throughput: {audio / wall:.1f}x real time   real-time factor: {wall / audio:.4f}")
+    TRACER.stop()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# batched_decoding.py
+#
+# Batched Whisper decoding on top of a loaded faster-whisper model
+#
+# faster-whisper's transcribe() decodes one audio buffer per call. This module
+# talks to the underlying CTranslate2 model directly so that several short
+# buffers (up to 30 s each) share one encoder pass and one generate() call:
+# - Computes (or accepts precomputed) log-mel features for every item
+# - Stacks them into a single batch, encodes once and decodes all prompts
+#   together with beam search
+# - Detects the language per item when none is given
+# - Optionally keeps timestamp tokens and splits each item into timed segments
+# - Drops items the model considers silence (same rule as faster-whisper)
+# - Keeps known hallucination phrases out of the output while decoding
+#   (hallucination_lexicon.py): single-token phrases are suppressed, longer
+#   ones steer the choice among the beam hypotheses
+# - Falls back to the regular transcribe() path for items longer than 30 s
+#
+# Used wherever several utterances or segments are ready at the same time
+# (dual-source real-time lanes, parallel static segments, the HTTP API)
+
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+import numpy as np
+from incremental_feature_extractor import log_mel_features, install_feature_cache
+from hallucination_lexicon import HallucinationLexicon
+
+if TYPE_CHECKING:
+    from faster_whisper.tokenizer import Tokenizer
+
+
+@dataclass
+class BatchItemResult:
+    """Decoded text (and optional timed segments) for one item of a batch."""
+    text: str
+    language: str
+    segments: List[Tuple[float, float, str]] = field(default_factory=list)
+    no_speech_prob: float = 0.0
+
+
+class BatchedWhisperDecoder:
+    def __init__(self, model, max_batch_size: int = 8, lexicon: Optional[HallucinationLexicon] = None):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.lexicon = lexicon if lexicon is not None and lexicon.phrases else None
+        self.feature_provider = install_feature_cache(model)
+        self.time_precision = 0.02
+        self.max_length = 448
+        self.no_speech_threshold = 0.6
+        self.log_prob_threshold = -1.0
+
+    @property
+    def window_samples(self) -> int:
+        """Longest item (in samples) that fits one batched decoding window."""
+        return self.model.feature_extractor.n_samples
+
+    def features_for(self, audio: np.ndarray) -> np.ndarray:
+        """Log-mel features for a float32 buffer (without transforming the zero padding)."""
+        return log_mel_features(self.model.feature_extractor, audio)
+
+    def _tokenizer(self, language: str, task: str) -> "Tokenizer":
+        from faster_whisper.tokenizer import Tokenizer  # Loaded with the model, not when this module is imported
+        return Tokenizer(self.model.hf_tokenizer, self.model.model.is_multilingual, task=task, language=language)
+
+    def suppress_tokens_for(self, suppress_tokens: Optional[List[int]] = None) -> List[int]:
+        """suppress_tokens for model.transcribe(), extended with the single-token lexicon phrases."""
+        suppress_tokens = list(suppress_tokens) if suppress_tokens is not None else [-1]
+        if self.lexicon is None:
+            return suppress_tokens
+        compiled = self.lexicon.compile(self._tokenizer("en", "transcribe"))
+        return suppress_tokens + [t for t in compiled.suppress_ids if t not in suppress_tokens]
+
+    def _pick_hypothesis(self, result, compiled) -> Tuple[List[int], float]:
+        """Best beam hypothesis without lexicon phrases (or the best one, phrases cut out)."""
+        best = result.sequences_ids[0]
+        if compiled is None:
+            return best, result.scores[0]
+
+        generated = sum(1 for t in best if t < compiled.eot)
+        hallucinated = sum(1 for start, end in compiled.matches(best) for t in best[start:end] if t < compiled.eot)
+        self.lexicon.record(items=1, generated_tokens=generated, hallucinated_tokens=hallucinated)
+        if not hallucinated:
+            return best, result.scores[0]
+
+        for tokens, score in zip(result.sequences_ids[1:], result.scores[1:]):
+            if not compiled.matches(tokens):
+                self.lexicon.record(rerouted_items=1)
+                return tokens, score
+
+        tokens, _ = compiled.strip(best)
+        emptied = not any(t < compiled.eot for t in tokens)
+        self.lexicon.record(stripped_items=1, emptied_items=int(emptied))
+        return tokens, result.scores[0]
+
+    def _split_timestamps(self, tokens: Sequence[int], tokenizer: "Tokenizer") -> List[Tuple[float, float, str]]:
+        """Turn <|t0|> text <|t1|> token runs into (start, end, text) tuples."""
+        segments = []
+        start = None
+        text_tokens = []
+        for token in tokens:
+            if token >= tokenizer.timestamp_begin:
+                t = (token - tokenizer.timestamp_begin) * self.time_precision
+                if start is None:
+                    start = t
+                else:
+                    text = tokenizer.decode(text_tokens).strip()
+                    if text:
+                        segments.append((start, t, text))
+                    start, text_tokens = None, []
+            elif token < tokenizer.eot:
+                text_tokens.append(token)
+
+        # Unterminated trailing text (no closing timestamp)
+        if text_tokens:
+            text = tokenizer.decode(text_tokens).strip()
+            if text:
+                segments.append((start or 0.0, None, text))
+        return segments
+
+    def transcribe_batch(self, audios: Sequence[np.ndarray], features: Optional[Sequence[np.ndarray]] = None,
+                         language: Optional[str] = None, task: str = "transcribe", beam_size: int = 5,
+                         without_timestamps: bool = True, suppress_tokens: Optional[List[int]] = None,
+                         initial_prompts: Optional[Sequence[str]] = None) -> List[BatchItemResult]:
+        """Decode several float32 buffers; results are returned in input order."""
+        from faster_whisper.transcribe import get_ctranslate2_storage, get_suppressed_tokens
+        suppress_tokens = suppress_tokens if suppress_tokens is not None else [-1]
+        results: List[Optional[BatchItemResult]] = [None] * len(audios)
+        n_frames = self.model.feature_extractor.nb_max_frames
+
+        # Items longer than one window go through the regular sequential path
+        short = []
+        for i, audio in enumerate(audios):
+            if len(audio) > self.window_samples:
+                results[i] = self._transcribe_long(audio, features[i] if features else None,
+                                                   language, task, beam_size, suppress_tokens)
+            else:
+                short.append(i)
+
+        for start in range(0, len(short), self.max_batch_size):
+            indices = short[start:start + self.max_batch_size]
+            batch = np.stack([
+                (features[i] if features else self.features_for(audios[i]))[:, :n_frames]
+                for i in indices
+            ]).astype(np.float32)
+
+            encoder_output = self.model.model.encode(get_ctranslate2_storage(batch), to_cpu=False)
+
+            if language is None and self.model.model.is_multilingual:
+                detected = self.model.model.detect_language(encoder_output)
+                languages = [r[0][0][2:-2] for r in detected]
+            else:
+                languages = [language or "en"] * len(indices)
+
+            tokenizers = [self._tokenizer(lang, task) for lang in languages]
+            prompts = []
+            for k, i in enumerate(indices):
+                prompt = []
+                if initial_prompts and initial_prompts[i]:
+                    prompt.append(tokenizers[k].sot_prev)
+                    prompt.extend(tokenizers[k].encode(" " + initial_prompts[i].strip())[-(self.max_length // 2 - 1):])
+                prompt.extend(tokenizers[k].sot_sequence)
+                if without_timestamps:
+                    prompt.append(tokenizers[k].no_timestamps)
+                prompts.append(prompt)
+
+            compiled = self.lexicon.compile(tokenizers[0]) if self.lexicon is not None else None
+            suppressed = get_suppressed_tokens(tokenizers[0], suppress_tokens)
+            if compiled is not None:
+                suppressed = suppressed + [t for t in compiled.suppress_ids if t not in suppressed]
+            # The other beam hypotheses are only needed to route around multi-token phrases
+            num_hypotheses = beam_size if compiled is not None and compiled.has_sequences else 1
+
+            decode_start = time.perf_counter()
+            generated = self.model.model.generate(
+                encoder_output,
+                prompts,
+                beam_size=beam_size,
+                max_length=self.max_length,
+                return_scores=True,
+                return_no_speech_prob=True,
+                num_hypotheses=num_hypotheses,
+                suppress_blank=True,
+                suppress_tokens=suppressed,
+            )
+            if self.lexicon is not None:
+                self.lexicon.record(decode_seconds=time.perf_counter() - decode_start)
+
+            for k, (i, result) in enumerate(zip(indices, generated)):
+                tokenizer = tokenizers[k]
+                tokens, score = self._pick_hypothesis(result, compiled)
+                avg_logprob = score * len(tokens) / (len(tokens) + 1)
+
+                # Same silence rule as faster-whisper: confident "no speech" and a weak decode
+                if result.no_speech_prob > self.no_speech_threshold and avg_logprob < self.log_prob_threshold:
+                    results[i] = BatchItemResult("", languages[k], [], result.no_speech_prob)
+                    continue
+
+                text = tokenizer.decode(tokens)
+                segments = [] if without_timestamps else self._split_timestamps(tokens, tokenizer)
+                results[i] = BatchItemResult(text, languages[k], segments, result.no_speech_prob)
+
+        return results
+
+    def _transcribe_long(self, audio, features, language, task, beam_size, suppress_tokens) -> BatchItemResult:
+        features = features if features is not None else self.features_for(audio)
+        with self.feature_provider.provide(audio, features):
+            segments, info = self.model.transcribe(
+                audio,
+                language=language,
+                task=task,
+                beam_size=beam_size,
+                suppress_tokens=self.suppress_tokens_for(suppress_tokens)
+            )
+            segments = [(s.start, s.end, s.text.strip()) for s in segments]
+        return BatchItemResult("".join(" " + text for _, _, text in segments), info.language, segments)
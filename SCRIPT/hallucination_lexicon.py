@@ -0,0 +1,138 @@
+# hallucination_lexicon.py
+#
+# Decode-time handling of known Whisper hallucination phrases
+#
+# The regex filters in the configuration only run on finished text. This
+# module works on the decoder's token ids instead:
+# - The phrase lexicon is tokenized once per model tokenizer into token
+#   sequences (with and without a leading space, either first-letter case)
+# - Phrases that are a single token are passed to the model's suppress_tokens,
+#   so the decoder can never generate them
+# - Longer phrases cannot be forbidden inside CTranslate2's generate() (it
+#   only suppresses individual tokens, everywhere); the decoder instead asks
+#   for the whole beam and takes the best hypothesis that contains no lexicon
+#   sequence, which is text the model decoded without conditioning on the
+#   phrase
+# - If every hypothesis contains one, the matched tokens (and the punctuation
+#   right after them) are cut from the token stream before detokenizing, so
+#   timestamps and segment splits stay consistent
+# - Counts generated vs. hallucinated tokens and decode time, for the report
+#   in "test & utility scripts/hallucination_report.py"
+#
+# The regex pass in Transcriber.clean_text stays as the safety net
+
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+
+class CompiledLexicon:
+    """The lexicon as token sequences of one tokenizer."""
+
+    def __init__(self, phrases: Sequence[str], tokenizer):
+        self.eot = tokenizer.eot
+        self._tokenizer = tokenizer
+        self._punctuation: Dict[int, bool] = {}
+        variants = set()
+        for phrase in phrases:
+            for form in {phrase, phrase[:1].upper() + phrase[1:], phrase[:1].lower() + phrase[1:]}:
+                variants.add(tuple(tokenizer.encode(form)))
+                variants.add(tuple(tokenizer.encode(" " + form)))
+        variants.discard(())
+
+        self.suppress_ids: List[int] = sorted({seq[0] for seq in variants if len(seq) == 1})
+        # Longest sequences first, indexed by their first token
+        self.by_first: Dict[int, List[Tuple[int, ...]]] = {}
+        for seq in sorted((s for s in variants if len(s) > 1), key=len, reverse=True):
+            self.by_first.setdefault(seq[0], []).append(seq)
+
+    @property
+    def has_sequences(self) -> bool:
+        return bool(self.by_first)
+
+    def _is_punctuation(self, token: int) -> bool:
+        if token not in self._punctuation:
+            piece = self._tokenizer.decode([token])
+            self._punctuation[token] = not any(ch.isalnum() for ch in piece)
+        return self._punctuation[token]
+
+    def matches(self, tokens: Sequence[int]) -> List[Tuple[int, int]]:
+        """Non-overlapping (start, end) positions of lexicon sequences, ignoring timestamp tokens in between."""
+        text_positions = [i for i, t in enumerate(tokens) if t < self.eot]
+        text_tokens = [tokens[i] for i in text_positions]
+        found = []
+        k = 0
+        while k < len(text_tokens):
+            for seq in self.by_first.get(text_tokens[k], ()):
+                if tuple(text_tokens[k:k + len(seq)]) == seq:
+                    end = k + len(seq)
+                    # Trailing punctuation belongs to the phrase (as in the regex filters)
+                    while end < len(text_tokens) and self._is_punctuation(text_tokens[end]):
+                        end += 1
+                    found.append((text_positions[k], text_positions[end - 1] + 1))
+                    k = end
+                    break
+            else:
+                k += 1
+        return found
+
+    def strip(self, tokens: Sequence[int]) -> Tuple[List[int], int]:
+        """Tokens without the matched phrases; also returns how many text tokens were removed."""
+        spans = self.matches(tokens)
+        if not spans:
+            return list(tokens), 0
+        kept, removed, pos = [], 0, 0
+        for start, end in spans:
+            kept.extend(tokens[pos:start])
+            # Timestamp tokens inside a match are kept so the segment structure survives
+            kept.extend(t for t in tokens[start:end] if t >= self.eot)
+            removed += sum(1 for t in tokens[start:end] if t < self.eot)
+            pos = end
+        kept.extend(tokens[pos:])
+        return kept, removed
+
+
+class HallucinationLexicon:
+    """Phrase list shared by all decoders; compiled lazily per tokenizer."""
+
+    def __init__(self, phrases: Sequence[str]):
+        self.phrases = [p.strip() for p in phrases if p.strip()]
+        self._compiled: Dict[int, CompiledLexicon] = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def compile(self, tokenizer) -> CompiledLexicon:
+        """Token sequences for this tokenizer's vocabulary (tokenized once per model)."""
+        key = id(tokenizer.tokenizer)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(key)
+                if compiled is None:
+                    compiled = CompiledLexicon(self.phrases, tokenizer)
+                    self._compiled[key] = compiled
+        return compiled
+
+    def reset_stats(self) -> None:
+        self.stats = {
+            "items": 0,               # Decoded items
+            "generated_tokens": 0,    # Text tokens of the best hypotheses
+            "hallucinated_tokens": 0, # ... of which were lexicon phrases
+            "rerouted_items": 0,      # Items decoded from a phrase-free beam hypothesis instead
+            "stripped_items": 0,      # Items where the phrase had to be cut from the tokens
+            "emptied_items": 0,       # Items that were nothing but a phrase
+            "decode_seconds": 0.0,    # Time spent in generate()
+        }
+
+    def record(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+
+    def report(self) -> Dict[str, float]:
+        """Stats plus the decode time the model spent on hallucinated tokens."""
+        with self._lock:
+            stats = dict(self.stats)
+        share = stats["hallucinated_tokens"] / stats["generated_tokens"] if stats["generated_tokens"] else 0.0
+        stats["hallucinated_share"] = share
+        stats["hallucinated_decode_seconds"] = stats["decode_seconds"] * share
+        return stats
@@ -0,0 +1,381 @@
+# http_api.py
+#
+# Local HTTP transcription API on top of the app's loaded model
+#
+# Other tools on this machine can send audio to the running app instead of
+# loading their own copy of the model:
+#
+#   POST /v1/transcribe[?language=el&timestamps=1]   audio in the request body
+#   GET  /v1/health                                  queue depth and statistics
+#   GET  /metrics                                    pipeline metrics (Prometheus text format)
+#
+# This module:
+# - Accepts any ffmpeg-decodable upload (raw body or multipart/form-data
+#   field "file"); conforming 16 kHz mono WAV and raw PCM (audio/pcm or
+#   audio/L16, optional ";rate=") are read without ffmpeg
+# - Gathers concurrent requests into micro-batches: the first request opens a
+#   short window, everything arriving within it (up to the batch size) is
+#   decoded in one batched model call
+# - Runs one batching worker per model worker of the shared Transcriber
+# - Applies admission control: bounded queue (503 + Retry-After when full),
+#   upload size limit (413), Content-Length required (411); a request that is
+#   not decoded within http_api_request_timeout_s gets 504 (and is dropped from
+#   the queue, not decoded for nobody), and requests still queued when the API
+#   stops get 503
+# - Returns the transcript, timed segments and queue/decode timings as JSON
+#
+# Listens on 127.0.0.1 only; disabled unless http_api_enabled is set
+
+import io
+import json
+import time
+import wave
+import queue
+import threading
+import subprocess
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from metrics import REGISTRY, TRANSCRIPTION_SECONDS, AUDIO_SECONDS, QUEUE_WAIT_SECONDS, QUEUE_DEPTH
+
+SAMPLE_RATE = 16000
+
+
+class AudioDecodeError(Exception):
+    """The upload could not be decoded to audio."""
+
+
+def decode_audio_bytes(data: bytes, content_type: str = "") -> np.ndarray:
+    """Upload -> 16 kHz mono float32 samples."""
+    mime, _, params = content_type.partition(";")
+    mime = mime.strip().lower()
+    options = dict(p.strip().split("=", 1) for p in params.split(";") if "=" in p)
+
+    if mime in ("audio/pcm", "audio/l16", "application/x-pcm"):
+        try:
+            rate = int(options.get("rate", SAMPLE_RATE))
+        except ValueError:
+            raise AudioDecodeError(f"invalid sample rate {options['rate']!r}")
+        if rate <= 0:
+            raise AudioDecodeError(f"invalid sample rate {rate}")
+        if rate == SAMPLE_RATE:
+            return np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+        return _ffmpeg_decode(data, ["-f", "s16le", "-ar", str(rate), "-ac", "1"])
+
+    # WAV files that already have the model's format need no decoding
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            with wave.open(io.BytesIO(data)) as w:
+                if (w.getframerate(), w.getnchannels(), w.getsampwidth(), w.getcomptype()) == (SAMPLE_RATE, 1, 2, "NONE"):
+                    frames = w.readframes(w.getnframes())
+                    return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+        except (wave.Error, EOFError):
+            pass
+    return _ffmpeg_decode(data, [])
+
+
+def _ffmpeg_decode(data: bytes, input_options: List[str]) -> np.ndarray:
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-nostdin", "-loglevel", "error", *input_options, "-i", "pipe:0",
+             "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"],
+            input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+    if result.returncode != 0:
+        raise AudioDecodeError(result.stderr.decode("utf-8", errors="replace").strip() or "ffmpeg failed")
+    return np.frombuffer(result.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+@dataclass
+class APIRequest:
+    """One upload waiting for its batch."""
+    audio: np.ndarray
+    language: Optional[str]
+    timed: bool
+    submitted: float = field(default_factory=time.perf_counter)
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    abandoned: bool = False  # The client got 504; the request is skipped instead of decoded
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batched Transcriber calls."""
+
+    def __init__(self, transcriber, console, window_ms: int = 30, max_batch: int = 8, max_queue: int = 32):
+        self.transcriber = transcriber
+        self.console = console
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.requests = queue.Queue(maxsize=max(1, max_queue))
+        self.keep_running = True
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rejected": 0, "failed": 0, "abandoned": 0, "batches": 0, "audio_seconds": 0.0}
+        self.workers = [threading.Thread(target=self._run, name=f"http-batcher-{i}", daemon=True)
+                        for i in range(max(1, transcriber.num_workers))]
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self) -> None:
+        """Stop the workers and fail the requests still waiting in the queue."""
+        self.keep_running = False
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            request.error = "server shutting down"
+            request.done.set()
+
+    @property
+    def depth(self) -> int:
+        return self.requests.qsize()
+
+    def submit(self, request: APIRequest) -> bool:
+        """Admit a request, or refuse it (False) when the queue is full or the batcher stopped."""
+        if not self.keep_running:
+            return False
+        try:
+            self.requests.put_nowait(request)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.stats["rejected"] += 1
+            return False
+
+    def _gather(self) -> List[APIRequest]:
+        """Wait for a request, then take whatever else arrives within the batching window."""
+        try:
+            batch = [self.requests.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return self._live(batch)
+
+    def _live(self, requests: List[APIRequest]) -> List[APIRequest]:
+        """Drop the requests whose client already got a timeout (504)."""
+        live = [r for r in requests if not r.abandoned]
+        if len(live) < len(requests):
+            with self.lock:
+                self.stats["abandoned"] += len(requests) - len(live)
+        return live
+
+    def _run(self) -> None:
+        while self.keep_running:
+            batch = self._gather()
+            if not batch:
+                continue
+            # One model call per language/timestamp combination in the batch
+            groups: Dict[tuple, List[APIRequest]] = {}
+            for request in batch:
+                groups.setdefault((request.language, request.timed), []).append(request)
+            for (language, timed), group in groups.items():
+                self._decode(group, language, timed, len(batch))
+
+    def _decode(self, group: List[APIRequest], language: Optional[str], timed: bool, batch_size: int) -> None:
+        group = self._live(group)  # Earlier groups of the batch may have taken long enough for a timeout
+        if not group:
+            return
+        start = time.perf_counter()
+        audios = [r.audio for r in group]
+        for request in group:
+            QUEUE_WAIT_SECONDS.observe(start - request.submitted, queue="http_api")
+        try:
+            if timed:
+                results = self.transcriber.transcribe_batch_timed(audios, language=language)
+                outputs = [(r.text, [{"start": round(s, 2), "end": round(e, 2), "text": t} for s, e, t in r.segments])
+                           for r in results]
+            else:
+                texts = self.transcriber.transcribe_batch(audios, language=language)
+                outputs = [(text, []) for text in texts]
+        except Exception as e:
+            self.console.print(f"[red]HTTP API batch failed: {e}[/red]")
+            with self.lock:
+                self.stats["failed"] += len(group)
+            for request in group:
+                request.error = str(e)
+                request.done.set()
+            return
+
+        decode_ms = (time.perf_counter() - start) * 1000
+        TRANSCRIPTION_SECONDS.observe(decode_ms / 1000, pipeline="http_api")
+        AUDIO_SECONDS.inc(sum(len(a) for a in audios) / SAMPLE_RATE, pipeline="http_api")
+        with self.lock:
+            self.stats["requests"] += len(group)
+            self.stats["batches"] += 1
+            self.stats["audio_seconds"] += sum(len(a) for a in audios) / SAMPLE_RATE
+        for request, (text, segments) in zip(group, outputs):
+            request.result = {
+                "text": text.strip(),
+                "language": language or self.transcriber.config.longform_language,
+                "duration": round(len(request.audio) / SAMPLE_RATE, 3),
+                "segments": segments,
+                "timings": {
+                    "queue_ms": round((start - request.submitted) * 1000, 1),
+                    "decode_ms": round(decode_ms, 1),
+                    "batch_size": batch_size,
+                },
+            }
+            request.done.set()
+
+
+class TranscriptionAPI:
+    """The HTTP server; request threads decode uploads and wait on the micro-batcher."""
+
+    def __init__(self, config, console, transcriber):
+        self.config = config
+        self.console = console
+        self.max_upload_bytes = int(config.http_api_max_upload_mb * 1024 * 1024)
+        self.request_timeout = config.http_api_request_timeout_s
+        self.batcher = MicroBatcher(transcriber, console, window_ms=config.http_api_batch_window_ms,
+                                    max_batch=config.http_api_max_batch, max_queue=config.http_api_max_queue)
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread = None
+
+    def start(self, host: str = "127.0.0.1", port: Optional[int] = None) -> None:
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass  # Requests are not logged to the console
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/v1/health":
+                    api._send(self, 200, api.health())
+                elif path == "/metrics":
+                    api._send_text(self, 200, REGISTRY.render(), "text/plain; version=0.0.4; charset=utf-8")
+                else:
+                    api._send(self, 404, {"error": "not found"})
+
+            def do_POST(self):
+                if urlparse(self.path).path != "/v1/transcribe":
+                    api._send(self, 404, {"error": "not found"})
+                    return
+                api._transcribe(self)
+
+        self.server = ThreadingHTTPServer((host, port if port is not None else self.config.http_api_port), Handler)
+        self.server.daemon_threads = True
+        self.batcher.start()
+        REGISTRY.add_collector("http_api", lambda: QUEUE_DEPTH.set(self.batcher.depth, queue="http_api"))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        self.console.print(f"[bold yellow]HTTP transcription API on http://{host}:{port}/v1/transcribe[/bold yellow]")
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.batcher.stop()
+        REGISTRY.remove_collector("http_api")
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def health(self) -> Dict:
+        with self.batcher.lock:
+            stats = dict(self.batcher.stats)
+        stats["queue_depth"] = self.batcher.depth
+        stats["queue_limit"] = self.batcher.requests.maxsize
+        stats["mean_batch_size"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def _send(self, handler: BaseHTTPRequestHandler, status: int, payload: Dict, headers: Optional[Dict] = None) -> None:
+        self._send_text(handler, status, json.dumps(payload, ensure_ascii=False), "application/json; charset=utf-8",
+                        headers)
+
+    def _send_text(self, handler: BaseHTTPRequestHandler, status: int, text: str, content_type: str,
+                   headers: Optional[Dict] = None) -> None:
+        body = text.encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _read_upload(self, handler: BaseHTTPRequestHandler):
+        """Request body -> (audio bytes, content type); multipart uploads use their 'file' part."""
+        data = handler.rfile.read(int(handler.headers["Content-Length"]))
+        content_type = handler.headers.get("Content-Type", "")
+        if content_type.lower().startswith("multipart/form-data"):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + data)
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "file":
+                    return part.get_payload(decode=True), part.get_content_type()
+            raise AudioDecodeError("multipart upload without a 'file' field")
+        return data, content_type
+
+    def _transcribe(self, handler: BaseHTTPRequestHandler) -> None:
+        if handler.headers.get("Content-Length") is None:
+            self._send(handler, 411, {"error": "Content-Length required"}, {"Connection": "close"})
+            handler.close_connection = True
+            return
+        # The body cannot be skipped without a valid length, so the connection is closed
+        try:
+            length = int(handler.headers["Content-Length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send(handler, 400, {"error": "invalid Content-Length"}, {"Connection": "close"})
+            handler.close_connection = True
+            return
+        if length > self.max_upload_bytes:
+            self._send(handler, 413, {"error": f"upload larger than {self.config.http_api_max_upload_mb} MB"},
+                       {"Connection": "close"})
+            handler.close_connection = True
+            return
+        # Refuse before reading and decoding the upload when the queue is already full
+        if self.batcher.depth >= self.batcher.requests.maxsize:
+            with self.batcher.lock:
+                self.batcher.stats["rejected"] += 1
+            self._send(handler, 503, {"error": "queue full"}, {"Retry-After": "1", "Connection": "close"})
+            handler.close_connection = True
+            return
+
+        query = parse_qs(urlparse(handler.path).query)
+        language = query.get("language", [None])[0] or None
+        timed = query.get("timestamps", ["1"])[0].lower() not in ("0", "false", "no")
+        try:
+            data, content_type = self._read_upload(handler)
+            audio = decode_audio_bytes(data, content_type)
+        except AudioDecodeError as e:
+            self._send(handler, 400, {"error": f"cannot decode audio: {e}"})
+            return
+        if len(audio) == 0:
+            self._send(handler, 400, {"error": "empty audio"})
+            return
+
+        request = APIRequest(audio, language, timed)
+        if not self.batcher.submit(request):
+            self._send(handler, 503, {"error": "queue full"}, {"Retry-After": "1"})
+            return
+        if not request.done.wait(self.request_timeout):
+            request.abandoned = True
+            self._send(handler, 504, {"error": f"not transcribed within {self.request_timeout:g} s"})
+            return
+        if request.error is not None:
+            self._send(handler, 500 if self.batcher.keep_running else 503, {"error": request.error})
+        else:
+            self._send(handler, 200, request.result)
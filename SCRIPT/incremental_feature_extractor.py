@@ -0,0 +1,218 @@
+# incremental_feature_extractor.py
+#
+# Incremental log-mel feature extraction for repeatedly decoded real-time audio
+#
+# faster-whisper recomputes the full log-mel spectrogram of the whole buffer
+# (plus 30 s of zero padding) on every transcribe() call. This module:
+# - Keeps the mel frames of audio that has already been seen and only computes
+#   the STFT/mel frames for new hops when the buffer grows
+# - Recomputes only the few frames whose analysis window touches the end of
+#   the buffer, and fills the all-zero padding region with a constant
+# - Trims old audio at hop-aligned offsets so cached frames survive trimming
+# - Produces features identical to faster_whisper.FeatureExtractor output
+# - Hands precomputed features to WhisperModel.transcribe() through a thin
+#   proxy installed in place of the model's feature extractor
+#
+# Repeated decodes of a growing buffer therefore cost O(new audio) for the
+# STFT/mel stage instead of O(buffer + 30 s)
+
+import contextlib
+import threading
+import numpy as np
+
+LOG_FLOOR = -10.0  # log10 of the 1e-10 clip applied to silent (all-zero) frames
+
+
+class IncrementalLogMelExtractor:
+    """Growing audio buffer with cached Whisper log-mel frames."""
+
+    def __init__(self, feature_extractor=None, initial_capacity: int = 16000 * 60):
+        self.feature_extractor = feature_extractor
+        self._buffer = np.zeros(initial_capacity, dtype=np.float32)
+        self.length = 0
+
+        if feature_extractor is not None:
+            self.n_fft = feature_extractor.n_fft
+            self.hop_length = feature_extractor.hop_length
+            self.n_samples = feature_extractor.n_samples
+            self.mel_filters = feature_extractor.mel_filters
+            self.window = np.hanning(self.n_fft + 1)[:-1]
+            self.half_window = (self.n_fft - 1) // 2 + 1
+        self._reset_cache()
+
+    def _reset_cache(self) -> None:
+        n_mels = self.mel_filters.shape[0] if self.feature_extractor is not None else 0
+        self._frames = np.zeros((n_mels, 0), dtype=np.float32)  # Final (unnormalized log10) frames
+        self._frames_max = LOG_FLOOR
+
+    @property
+    def audio(self) -> np.ndarray:
+        """View of the buffered float32 audio (valid until the next append or trim)."""
+        return self._buffer[:self.length]
+
+    def reset(self) -> None:
+        """Drop all buffered audio and cached frames."""
+        self.length = 0
+        self._reset_cache()
+
+    def append(self, samples: np.ndarray) -> None:
+        """Append float32 samples in [-1, 1] to the buffer (features are computed lazily)."""
+        n = len(samples)
+        if self.length + n > len(self._buffer):
+            capacity = max(len(self._buffer) * 2, self.length + n)
+            grown = np.zeros(capacity, dtype=np.float32)
+            grown[:self.length] = self._buffer[:self.length]
+            self._buffer = grown
+        self._buffer[self.length:self.length + n] = samples
+        self.length += n
+
+    def trim_to_last(self, keep_samples: int) -> None:
+        """Keep roughly the last `keep_samples` samples, dropping a hop-aligned prefix."""
+        drop = self.length - keep_samples
+        if drop <= 0:
+            return
+
+        hop = self.hop_length if self.feature_extractor is not None else 1
+        drop -= drop % hop  # Keep a little extra so cached frames stay on the same grid
+        if drop <= 0:
+            return
+
+        self._buffer[:self.length - drop] = self._buffer[drop:self.length]
+        self.length -= drop
+
+        if self.feature_extractor is not None:
+            # The first two frames of a buffer use reflect padding, so they are recomputed
+            dropped_frames = drop // hop
+            keep_from = dropped_frames + self._reflect_frames()
+            if keep_from < self._frames.shape[1]:
+                self._frames = self._frames[:, keep_from:]
+                self._frames = np.concatenate([self._compute_frames(0, self._reflect_frames()), self._frames], axis=1)
+                self._frames_max = float(self._frames.max()) if self._frames.size else LOG_FLOOR
+            else:
+                self._reset_cache()
+
+    def _reflect_frames(self) -> int:
+        """Number of leading frames whose window is reflect-padded at the buffer start."""
+        return (self.half_window - 1) // self.hop_length + 1
+
+    def _frame_signal(self, start: int, stop: int) -> np.ndarray:
+        """Audio [start, stop) of the virtual padded signal (buffer followed by zeros)."""
+        out = np.zeros(stop - start, dtype=np.float32)
+        lo, hi = max(start, 0), min(stop, self.length)
+        if hi > lo:
+            out[lo - start:hi - start] = self._buffer[lo:hi]
+        return out
+
+    def _compute_frames(self, first: int, last: int) -> np.ndarray:
+        """Unnormalized log10 mel frames [first, last) exactly as faster-whisper frames them."""
+        if last <= first:
+            return np.zeros((self.mel_filters.shape[0], 0), dtype=np.float32)
+
+        hop, half = self.hop_length, self.half_window
+        frames = np.empty((last - first, self.n_fft), dtype=np.float64)
+        regular_from = first
+
+        # Leading frames: window reflect-padded at the start of the buffer
+        for t in range(first, min(last, self._reflect_frames())):
+            i = t * hop
+            frame = self._frame_signal(0, i + half)
+            frames[t - first] = np.pad(frame, (half - i, 0), mode="reflect")
+            regular_from = t + 1
+
+        # Remaining frames are plain strided windows of the (zero-padded) signal
+        if regular_from < last:
+            start = regular_from * hop - half
+            signal = self._frame_signal(start, (last - 1) * hop + half)
+            strided = np.lib.stride_tricks.sliding_window_view(signal, self.n_fft)[::hop]
+            frames[regular_from - first:] = strided[:last - regular_from]
+
+        spectrum = np.fft.rfft(frames * self.window, axis=1).astype(np.complex64)
+        magnitudes = (np.abs(spectrum) ** 2).T
+        mel_spec = self.mel_filters @ magnitudes
+        return np.log10(np.clip(mel_spec, a_min=1e-10, a_max=None)).astype(np.float32)
+
+    def features(self) -> np.ndarray:
+        """Whisper log-mel features of the whole buffer, padded like FeatureExtractor(padding=True)."""
+        if self.feature_extractor is None:
+            raise RuntimeError("IncrementalLogMelExtractor needs a feature extractor to compute features")
+
+        hop, half, n = self.hop_length, self.half_window, self.length
+        total_frames = (n + self.n_samples) // hop
+
+        # Frames whose window lies entirely inside the buffer are final and cached
+        final_frames = (n - half) // hop + 1 if n >= half else 0
+        final_frames = max(min(final_frames, total_frames), 0)
+        cached = self._frames.shape[1]
+        if final_frames > cached:
+            new = self._compute_frames(cached, final_frames)
+            self._frames = np.concatenate([self._frames, new], axis=1)
+            self._frames_max = max(self._frames_max, float(new.max()))
+        elif final_frames < cached:
+            self._frames = self._frames[:, :final_frames]
+            self._frames_max = float(self._frames.max()) if self._frames.size else LOG_FLOOR
+
+        # Frames overlapping the end of the buffer depend on the padding: recompute them
+        audio_frames = min(-(-(n + half) // hop), total_frames)
+        provisional = self._compute_frames(final_frames, audio_frames)
+
+        log_max = self._frames_max
+        if provisional.size:
+            log_max = max(log_max, float(provisional.max()))
+        floor = log_max - 8.0
+
+        out = np.empty((self._frames.shape[0], total_frames), dtype=np.float32)
+        out[:, :final_frames] = self._frames
+        out[:, final_frames:audio_frames] = provisional
+
+        # Everything after that is pure zero padding: a constant column
+        np.maximum(out[:, :audio_frames], floor, out=out[:, :audio_frames])
+        out[:, audio_frames:] = max(LOG_FLOOR, floor)
+        out += 4.0
+        out /= 4.0
+        return out
+
+
+def log_mel_features(feature_extractor, audio: np.ndarray) -> np.ndarray:
+    """One-shot features for a short buffer, skipping the STFT of the zero padding."""
+    extractor = IncrementalLogMelExtractor(feature_extractor, initial_capacity=len(audio))
+    extractor.append(audio)
+    return extractor.features()
+
+
+class CachedFeatureProvider:
+    """Stands in for WhisperModel.feature_extractor and serves precomputed features.
+
+    Features registered with `provide()` are returned when transcribe() asks for
+    the features of that exact audio array; every other call is delegated to the
+    real extractor. Registrations are per thread.
+    """
+
+    def __init__(self, feature_extractor):
+        self._extractor = feature_extractor
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self._extractor, name)
+
+    @contextlib.contextmanager
+    def provide(self, audio: np.ndarray, features: np.ndarray):
+        self._local.pending = (audio, features)
+        try:
+            yield
+        finally:
+            self._local.pending = None
+
+    def __call__(self, waveform, padding=True, chunk_length=None):
+        pending = getattr(self._local, "pending", None)
+        if (pending is not None and pending[0] is waveform and padding
+                and chunk_length in (None, self._extractor.chunk_length)):
+            self._local.pending = None
+            return pending[1]
+        return self._extractor(waveform, padding=padding, chunk_length=chunk_length)
+
+
+def install_feature_cache(model) -> CachedFeatureProvider:
+    """Wrap a WhisperModel's feature extractor so precomputed features can be passed in."""
+    if not isinstance(model.feature_extractor, CachedFeatureProvider):
+        model.feature_extractor = CachedFeatureProvider(model.feature_extractor)
+    return model.feature_extractor
@@ -0,0 +1,116 @@
+# job_checkpoint.py
+#
+# Per-job checkpoints for long static transcriptions
+#
+# Completed segments are appended to a JSONL checkpoint as soon as they are
+# transcribed, so a crash or reset late in a multi-hour file loses at most
+# the batches in flight. Re-submitting the same file resumes from it:
+# - The checkpoint name is derived from a content hash of the input and the
+#   parameters that affect the result (model, language, VAD and segmentation
+#   settings, timestamp decoding), so changed input or settings never reuse
+#   stale text
+# - The content hash samples the file (size + 16 evenly spaced 1 MB chunks)
+#   instead of reading multi-GB recordings twice
+# - Each record carries the segment's original sample ranges; a segment is
+#   only reused when decoding + VAD produce exactly the same ranges again
+# - Every append is flushed and fsynced, and a torn last line (crash while
+#   writing) is ignored on load
+#
+# The checkpoint is deleted once the job's outputs have been written
+
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+CHECKPOINT_VERSION = 1
+HASH_CHUNK_BYTES = 1024 * 1024
+HASH_SAMPLES = 16
+
+
+def file_content_hash(path: str) -> str:
+    """sha256 over the file size and evenly spaced chunks of its content."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as f:
+        if size <= HASH_CHUNK_BYTES * HASH_SAMPLES:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        else:
+            step = (size - HASH_CHUNK_BYTES) // (HASH_SAMPLES - 1)
+            for i in range(HASH_SAMPLES):
+                f.seek(i * step)
+                digest.update(f.read(HASH_CHUNK_BYTES))
+    return digest.hexdigest()
+
+
+class JobCheckpoint:
+    def __init__(self, directory: str, file_path: str, params: Dict):
+        self.file_hash = file_content_hash(file_path)
+        self.params = params
+        key_source = json.dumps({"file": self.file_hash, "params": params}, sort_keys=True)
+        self.key = hashlib.sha256(key_source.encode()).hexdigest()[:24]
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{os.path.splitext(os.path.basename(file_path))[0][:40]}-{self.key}.jsonl")
+        self.completed: Dict[int, Dict] = {}
+        self._file = None
+
+    def load(self) -> int:
+        """Read completed segments of an earlier run; returns how many can be reused."""
+        self.completed = {}
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline() or "{}")
+                if (header.get("version") != CHECKPOINT_VERSION or header.get("file_hash") != self.file_hash
+                        or header.get("params") != self.params):
+                    return 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # Torn write at the end of a crashed run
+                    self.completed[record["index"]] = record
+        except (OSError, json.JSONDecodeError):
+            self.completed = {}
+        return len(self.completed)
+
+    def reusable(self, index: int, ranges: List[Tuple[int, int]]) -> Optional[Dict]:
+        """The stored record of a segment, if it covers exactly the same audio."""
+        record = self.completed.get(index)
+        if record is not None and [tuple(r) for r in record["ranges"]] == [tuple(r) for r in ranges]:
+            return record
+        return None
+
+    def open(self) -> None:
+        """Start writing: header plus the reusable records (drops a torn tail), then appends."""
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({"version": CHECKPOINT_VERSION, "file_hash": self.file_hash, "params": self.params})
+        for index in sorted(self.completed):
+            self._write(self.completed[index])
+        self._file.flush()
+
+    def _write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def append(self, records: List[Dict]) -> None:
+        """Persist completed segments ({index, ranges, text, cues}) durably."""
+        if self._file is None:
+            return
+        for record in records:
+            self._write(record)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
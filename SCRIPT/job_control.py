@@ -0,0 +1,56 @@
+# job_control.py
+#
+# Cooperative cancellation for background jobs
+#
+# Native code (CTranslate2 inference, FFmpeg) cannot be interrupted by
+# injecting exceptions into Python threads, and doing so only works on
+# Windows anyway. Jobs instead carry a CancellationToken:
+# - Pipeline stages check it between units of work (blocks, segments)
+# - Resources that can be stopped right away (FFmpeg pipes, process pools)
+#   register a callback that runs the moment the job is cancelled
+# - Waiting on queues uses short timeouts so a cancelled job never sits
+#   blocked
+#
+# A cancelled static job therefore stops after the model call in flight and
+# frees the model for the next job on every platform
+
+import threading
+from typing import Callable, List
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def __call__(self) -> bool:
+        """Tokens can be passed wherever a `should_abort()` callable is expected."""
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "") -> None:
+        """Cancel the job and run the registered callbacks (once)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Run `callback` when the job is cancelled (immediately if it already is)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
@@ -0,0 +1,382 @@
+# job_queue.py
+#
+# Persistent background queue for static file jobs
+#
+# Files can be handed to the running app at any time - through the command
+# server or by dropping them into a watched folder - and are transcribed one
+# after another in the background.
+#
+# This module:
+# - Stores the jobs in SQLite (temp_audio/job_queue.sqlite3), so the queue
+#   survives restarts; jobs interrupted by a crash are queued again and resume
+#   from their checkpoints
+# - Orders queued jobs by position, with cancel and reorder (move to a
+#   position, top or bottom) operations
+# - Runs the jobs on a background worker at background priority: recording
+#   and real-time transcription get the model first (see model_scheduler.py),
+#   the job keeps going with the capacity left over
+# - Watches folders for new media files (watchdog when installed, otherwise
+#   polling) and queues each file once its size has stopped changing
+#
+# Queued files never wait for a hotkey, and the model never sits idle while
+# files are waiting
+
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional
+from job_control import CancellationToken
+from metrics import QUEUE_WAIT_SECONDS
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+MEDIA_EXTENSIONS = {
+    '.wav', '.mp3', '.m4a', '.flac', '.ogg', '.opus', '.aac', '.wma',
+    '.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm',
+}
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+
+
+def is_media_file(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in MEDIA_EXTENSIONS
+
+
+class JobQueue:
+    """SQLite-backed job list; safe to use from several threads."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.closed = False
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    position REAL NOT NULL,
+                    size INTEGER,
+                    mtime REAL,
+                    added REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    error TEXT,
+                    outputs TEXT
+                )""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, position)")
+            # Jobs that were running when the app stopped are picked up again (their checkpoints remain)
+            self.db.execute("UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'")
+
+    def add(self, path: str, source: str = "command") -> Optional[int]:
+        """Queue a file at the end; returns the job id (an existing one if the same file is waiting)."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock, self.db:
+            row = self.db.execute(
+                "SELECT id FROM jobs WHERE path = ? AND status IN ('queued', 'running')", (path,)).fetchone()
+            if row is not None:
+                return row["id"]
+            position = self._last_position() + 1
+            cursor = self.db.execute(
+                "INSERT INTO jobs (path, source, status, position, size, mtime, added) VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (path, source, position, stat.st_size, stat.st_mtime, time.time()))
+            return cursor.lastrowid
+
+    def seen(self, path: str) -> bool:
+        """True if this exact file version (size + mtime) was ever queued - watch folders queue files once."""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        with self.lock:
+            row = self.db.execute("SELECT 1 FROM jobs WHERE path = ? AND size = ? AND mtime = ?",
+                                  (path, stat.st_size, stat.st_mtime)).fetchone()
+        return row is not None
+
+    def _last_position(self) -> float:
+        row = self.db.execute("SELECT MAX(position) AS p FROM jobs WHERE status = 'queued'").fetchone()
+        return row["p"] if row["p"] is not None else 0.0
+
+    def claim_next(self) -> Optional[Dict]:
+        """Mark the first queued job as running and return it."""
+        with self.lock, self.db:
+            if self.closed:
+                return None
+            row = self.db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY position, id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), row["id"]))
+            return dict(row)
+
+    def finish(self, job_id: int, status: str, error: str = "", outputs: Optional[List[str]] = None) -> None:
+        """Record a job's result; ignored once the queue is closed (the job stays 'running' and is resumed)."""
+        with self.lock:
+            if self.closed:
+                return
+            with self.db:
+                self.db.execute("UPDATE jobs SET status = ?, finished = ?, error = ?, outputs = ? WHERE id = ?",
+                                (status, time.time(), error, json.dumps(outputs or []), job_id))
+
+    def cancel(self, job_id: int) -> Optional[str]:
+        """Cancel a queued job; returns the job's status before the call (None if unknown)."""
+        with self.lock, self.db:
+            row = self.db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == "queued":
+                self.db.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ?", (time.time(), job_id))
+            return row["status"]
+
+    def move(self, job_id: int, where: str) -> bool:
+        """Reorder a queued job: 'top', 'bottom' or a 1-based position among the queued jobs."""
+        with self.lock, self.db:
+            queued = [r["id"] for r in self.db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY position, id")]
+            if job_id not in queued:
+                return False
+            queued.remove(job_id)
+            if where == "top":
+                index = 0
+            elif where == "bottom":
+                index = len(queued)
+            else:
+                index = min(max(int(where) - 1, 0), len(queued))
+            queued.insert(index, job_id)
+            self.db.executemany("UPDATE jobs SET position = ? WHERE id = ?",
+                                [(float(i + 1), jid) for i, jid in enumerate(queued)])
+            return True
+
+    def jobs(self, include_finished: int = 10) -> List[Dict]:
+        """Running and queued jobs in order, then the most recently finished ones."""
+        with self.lock:
+            active = self.db.execute(
+                "SELECT * FROM jobs WHERE status IN ('running', 'queued') "
+                "ORDER BY status = 'queued', position, id").fetchall()
+            finished = self.db.execute(
+                "SELECT * FROM jobs WHERE status NOT IN ('running', 'queued') ORDER BY finished DESC LIMIT ?",
+                (include_finished,)).fetchall()
+        return [dict(r) for r in active] + [dict(r) for r in finished]
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            rows = self.db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update({r["status"]: r["n"] for r in rows})
+        return counts
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            self.db.close()
+
+
+class JobQueueWorker:
+    """Runs queued jobs one at a time through the static processor, in the background."""
+
+    def __init__(self, job_queue: JobQueue, processor, console):
+        self.queue = job_queue
+        self.processor = processor
+        self.console = console
+        self.wakeup = threading.Event()
+        self.keep_running = True
+        self.thread = None
+        self.current_job: Optional[Dict] = None
+        self.current_token: Optional[CancellationToken] = None
+        self.lock = threading.Lock()  # Guards current_job/current_token (cancel and stop run on other threads)
+        self.workspace_root = os.path.join(processor.temp_dir, "queue_jobs")
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def notify(self) -> None:
+        """New work was queued."""
+        self.wakeup.set()
+
+    def cancel(self, job_id: int) -> Optional[str]:
+        """Cancel a queued job, or stop the running one after its model call in flight."""
+        # Under the lock a job is either still queued or claimed with its token published
+        with self.lock:
+            status = self.queue.cancel(job_id)
+            current, token = self.current_job, self.current_token
+        if status == "running" and current is not None and token is not None and current["id"] == job_id:
+            token.cancel("cancelled")
+        return status
+
+    def stop(self) -> None:
+        """Stop the worker (waits for the model call in flight); the job stays 'running' and resumes next start."""
+        self.keep_running = False
+        with self.lock:
+            token = self.current_token
+        if token is not None:
+            token.cancel("shutdown")
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _workspace(self, path: str) -> str:
+        key = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.workspace_root, f"{os.path.splitext(os.path.basename(path))[0][:40]}-{key}")
+
+    def _run(self) -> None:
+        while self.keep_running:
+            # Claimed and published together, so a cancel never sees a running job without its token
+            with self.lock:
+                job = self.queue.claim_next()
+                token = CancellationToken()
+                if job is not None:
+                    self.current_job, self.current_token = job, token
+            if job is None:
+                self.wakeup.wait(5.0)
+                self.wakeup.clear()
+                continue
+
+            QUEUE_WAIT_SECONDS.observe(max(0.0, time.time() - job["added"]), queue="job_queue")
+            self.console.print(f"[bold cyan]Queue job {job['id']}: {job['path']}[/bold cyan]")
+            try:
+                if not os.path.exists(job["path"]):
+                    raise FileNotFoundError(job["path"])
+                result = self.processor.run_job(job["path"], token, workspace=self._workspace(job["path"]),
+                                                show_transcript=False)
+                if result is not None:
+                    self.queue.finish(job["id"], "done", outputs=result.outputs)
+                    self.console.print(f"[green]Queue job {job['id']} done ({result.audio_seconds:.0f} s of audio "
+                                       f"in {result.elapsed:.1f} s)[/green]")
+                elif token.reason != "shutdown":
+                    self.queue.finish(job["id"], "cancelled")
+                    self.console.print(f"[yellow]Queue job {job['id']} cancelled[/yellow]")
+            except Exception as e:
+                self.queue.finish(job["id"], "failed", error=str(e))
+                self.console.print(f"[bold red]Queue job {job['id']} failed: {e}[/bold red]")
+            finally:
+                with self.lock:
+                    self.current_job, self.current_token = None, None
+
+
+class FolderWatcher:
+    """Queues media files that appear in the watched folders once they are completely written."""
+
+    def __init__(self, folders: List[str], on_file: Callable[[str], None], seen: Callable[[str], bool],
+                 console, settle_seconds: float = 5.0, poll_seconds: float = 10.0):
+        self.folders = [os.path.abspath(f) for f in folders if os.path.isdir(f)]
+        self.on_file = on_file
+        self.seen = seen
+        self.console = console
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.keep_running = True
+        self.thread = None
+        self.observer = None
+        self.candidates: Dict[str, tuple] = {}  # path -> (size, time the size was last seen changing)
+        self.handed_over = set()                # (path, size) already passed to on_file
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+
+        for folder in folders:
+            if not os.path.isdir(folder):
+                self.console.print(f"[red]Watch folder not found: {folder}[/red]")
+
+    def start(self) -> None:
+        if not self.folders:
+            return
+        if WATCHDOG_AVAILABLE:
+            watcher = self
+
+            class Handler(FileSystemEventHandler):
+                def on_created(self, event):
+                    if not event.is_directory:
+                        watcher._note(event.src_path)
+
+                def on_modified(self, event):
+                    if not event.is_directory:
+                        watcher._note(event.src_path)
+
+                def on_moved(self, event):
+                    if not event.is_directory:
+                        watcher._note(event.dest_path)
+
+            self.observer = Observer()
+            for folder in self.folders:
+                self.observer.schedule(Handler(), folder, recursive=True)
+            self.observer.start()
+        mode = "file system events" if WATCHDOG_AVAILABLE else f"polling every {self.poll_seconds:.0f} s"
+        self.console.print(f"[blue]Watching {len(self.folders)} folder(s) for media files ({mode})[/blue]")
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.keep_running = False
+        self.changed.set()
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join(timeout=2.0)
+
+    def _note(self, path: str) -> None:
+        if not is_media_file(path):
+            return
+        with self.lock:
+            self.candidates.setdefault(os.path.abspath(path), (-1, time.time()))
+        self.changed.set()
+
+    def _scan(self) -> None:
+        """Pick up files already present (startup) or missed by the events (polling fallback)."""
+        for folder in self.folders:
+            for root, _, names in os.walk(folder):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if not is_media_file(path):
+                        continue
+                    with self.lock:
+                        known = path in self.candidates
+                    if not known and not any(p == path for p, _ in self.handed_over) and not self.seen(path):
+                        self._note(path)
+
+    def _settle(self) -> None:
+        """Queue candidates whose size has not changed for settle_seconds (copy/recording finished)."""
+        now = time.time()
+        with self.lock:
+            items = list(self.candidates.items())
+        for path, (last_size, since) in items:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                with self.lock:
+                    self.candidates.pop(path, None)
+                continue
+            if size != last_size:
+                with self.lock:
+                    self.candidates[path] = (size, now)
+            elif now - since >= self.settle_seconds:
+                with self.lock:
+                    self.candidates.pop(path, None)
+                if (path, size) not in self.handed_over and not self.seen(path):
+                    self.handed_over.add((path, size))
+                    self.on_file(path)
+
+    def _run(self) -> None:
+        last_scan = 0.0
+        while self.keep_running:
+            if not WATCHDOG_AVAILABLE or last_scan == 0.0:
+                if time.time() - last_scan >= self.poll_seconds:
+                    self._scan()
+                    last_scan = time.time()
+            self._settle()
+            with self.lock:
+                settling = bool(self.candidates)
+            # Short waits while files are settling, long ones when there is nothing to do
+            self.changed.wait(1.0 if settling else self.poll_seconds)
+            self.changed.clear()
@@ -3,35 +3,63 @@
 # Handles audio recording, buffering, and chunking for long-form transcription
 #
 # This module:
-# - Captures audio from microphone or system audio
+# - Captures audio from microphone or system audio (a subscription to the
+#   shared capture hub, so it can share a device with real-time transcription)
 # - Buffers audio data and writes to temporary WAV files
 # - Detects silence to intelligently split audio into chunks (via peak amplitude detection and not WebRTC VAD)
 # - Manages time-based splitting for extended recordings
 # - Coordinates asynchronous transcription of audio chunks
-# - Combines partial transcriptions into a complete result
+# - Finalizes stopped recordings on a background thread: waits for the last
+#   chunks, combines the partial transcriptions and pastes the result, so a
+#   new recording can start right after a stop; results of back-to-back
+#   recordings are pasted in the order the recordings were made
 # - Sends transcribed text to clipboard and optionally presses Enter
 # - Provides visual feedback through the tray icon during operations
+# - Records chunk transcription times, audio processed and dropped input
+#   frames (metrics), and traces capture, flush, split, transcription, the
+#   wait for the last chunks and the paste (one trace session per recording)
 #
 # The chunking approach allows handling very long recordings while
 # providing incremental transcription results
 
 import time
-import pyaudio
 import wave
 import os
+import queue
 import threading
 import pyperclip
 import keyboard
 import struct
 import glob
 from rich.panel import Panel
+from metrics import TRANSCRIPTION_SECONDS, AUDIO_SECONDS
+from tracing import TRACER
+
+
+class RecordingSession:
+    """One recording: its chunk files, chunk transcription threads and partial transcripts."""
+
+    def __init__(self, number: int, trace_session: str):
+        self.number = number
+        self.trace_session = trace_session
+        self.files = []
+        self.partial_transcripts = {}
+        self.transcription_threads = []
+        self.stop_started = 0.0
+
+    def chunk_path(self, temp_dir: str, chunk_idx: int) -> str:
+        path = os.path.join(temp_dir, f"temp_audio_file{self.number}_{chunk_idx}.wav")
+        self.files.append(path)
+        return path
+
 
 class LongFormAudioRecorder:
-    def __init__(self, config, console, transcriber, tray):
+    def __init__(self, config, console, transcriber, tray, capture_hub):
         self.config = config
         self.console = console
         self.transcriber = transcriber
         self.tray = tray
+        self.capture_hub = capture_hub
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         self.temp_dir = os.path.join(self.script_dir, "temp_audio")
         
@@ -45,13 +73,10 @@ class LongFormAudioRecorder:
                 # Fall back to script directory if temp directory creation fails
                 self.temp_dir = self.script_dir
         
-        # Initialize PyAudio
-        self.audio = pyaudio.PyAudio()
-        
         # Recording state
         self.recording = False
         self.recording_thread = None
-        self.stream = None
+        self.subscription = None
         self.active_wave_file = None
         self.active_filename = None
         
@@ -61,15 +86,35 @@ class LongFormAudioRecorder:
         self.next_split_time = 0
         self.chunk_split_requested = False
         
+        # Capture span per chunk file (tracing)
+        self.chunk_started = 0
+        
         # Buffers and results
         self.buffer = []
-        self.partial_transcripts = {}
-        self.transcription_threads = []
+        self.session = None              # The recording being captured
+        self.session_count = 0
+        
+        # Stopped recordings waiting for their transcript, finalized one at a time in order
+        self.pending_sessions = []
+        self.pending_lock = threading.Lock()
+        self.finalize_queue = queue.Queue()
+        self.finalizer_thread = threading.Thread(target=self._finalize_loop, name="longform-finalizer", daemon=True)
+        self.finalizer_thread.start()
+    
+    @property
+    def finalizing(self) -> bool:
+        """True while a stopped recording is still being transcribed or pasted."""
+        with self.pending_lock:
+            return bool(self.pending_sessions)
     
     def _cleanup_temp_files(self) -> None:
-        """Remove any temporary audio files from previous recordings."""
+        """Remove any temporary audio files from previous recordings (except those still being transcribed)."""
+        with self.pending_lock:
+            in_use = {path for session in self.pending_sessions for path in session.files}
         temp_files = glob.glob(os.path.join(self.temp_dir, "temp_audio_file*.wav"))
         for f in temp_files:
+            if f in in_use:
+                continue
             try:
                 os.remove(f)
                 self.console.print(f"[yellow]Deleted file: {os.path.basename(f)}[/yellow]")
@@ -86,37 +131,31 @@ class LongFormAudioRecorder:
         self._cleanup_temp_files()
 
         # Reset state
-        self.partial_transcripts.clear()
-        self.transcription_threads.clear()
+        self.session_count += 1
+        self.session = RecordingSession(self.session_count, TRACER.new_session("longform"))
         self.buffer.clear()
         self.current_chunk_index = 1
 
         # Initialize timing for chunking
         self.record_start_time = time.time()
+        self.chunk_started = self.record_start_time
         self.next_split_time = self.record_start_time + self.config.chunk_split_interval
         self.chunk_split_requested = False
 
         # Set up recording
         self.recording = True
-        first_file = os.path.join(self.temp_dir, f"temp_audio_file{self.current_chunk_index}.wav")
+        first_file = self.session.chunk_path(self.temp_dir, self.current_chunk_index)
         self.active_filename = first_file
 
         try:
-            # Open audio stream
-            stream_params = {
-                'format': self.config.format,
-                'channels': self.config.channels,
-                'rate': self.config.rate,
-                'input': True,
-                'frames_per_buffer': self.config.chunk,
-                'input_device_index': self.config.input_device_index if self.config.longform_use_system_audio else None
-            }
-            self.stream = self.audio.open(**stream_params)
+            # Subscribe to the input (opened by the capture hub unless another pipeline already captures it)
+            device_index = self.config.input_device_index if self.config.longform_use_system_audio else None
+            self.subscription = self.capture_hub.subscribe(device_index, "longform")
 
             # Open wave file for saving
             self.active_wave_file = wave.open(first_file, 'wb')
             self.active_wave_file.setnchannels(self.config.channels)
-            self.active_wave_file.setsampwidth(self.audio.get_sample_size(self.config.format))
+            self.active_wave_file.setsampwidth(self.capture_hub.sample_size())
             self.active_wave_file.setframerate(self.config.rate)
 
             # Update tray icon and start recording thread
@@ -137,7 +176,11 @@ class LongFormAudioRecorder:
         try:
             while self.recording:
                 # Read audio data
-                data = self.stream.read(self.config.chunk, exception_on_overflow=False)
+                data = self.subscription.read()
+                if data is None:
+                    if self.subscription.closed:
+                        raise RuntimeError("the input device stopped")
+                    continue
                 samples = struct.unpack(f'<{len(data)//2}h', data)
                 peak = max(abs(sample) for sample in samples)
                 
@@ -163,7 +206,11 @@ class LongFormAudioRecorder:
                     # If splitting was requested and we have some silence, do the split
                     if self.chunk_split_requested and (silence_duration >= 0.1):
                         self.console.print("[bold green]Splitting now at silence...[/bold green]")
-                        self._split_chunk()
+                        TRACER.record("capture", self.chunk_started, now, "longform", self.session.trace_session,
+                                      chunk=self.current_chunk_index)
+                        self.chunk_started = now
+                        with TRACER.span("split", "longform", self.session.trace_session, chunk=self.current_chunk_index):
+                            self._split_chunk()
                         self.next_split_time += self.config.chunk_split_interval
                         self.chunk_split_requested = False
                 else:
@@ -191,8 +238,9 @@ class LongFormAudioRecorder:
     def _flush_buffer(self) -> None:
         """Write buffered audio data to the active wave file."""
         if self.buffer and self.active_wave_file:
-            self.active_wave_file.writeframes(b''.join(self.buffer))
-            self.buffer.clear()
+            with TRACER.span("flush", "longform", self.session.trace_session, chunks=len(self.buffer)):
+                self.active_wave_file.writeframes(b''.join(self.buffer))
+                self.buffer.clear()
     
     def _cleanup_resources(self) -> None:
         """Clean up audio resources."""
@@ -203,13 +251,9 @@ class LongFormAudioRecorder:
                 self.console.print(f"[red]Error closing wave file: {e}[/red]")
             self.active_wave_file = None
             
-        if hasattr(self, 'stream') and self.stream:
-            try:
-                self.stream.stop_stream()
-                self.stream.close()
-            except Exception as e:
-                self.console.print(f"[red]Error closing audio stream: {e}[/red]")
-            self.stream = None
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
     
     def _split_chunk(self) -> None:
         """Split the current audio chunk and start transcribing it."""
@@ -226,49 +270,71 @@ class LongFormAudioRecorder:
             self.console.print(f"[red]split_chunk() -> file: {chunk_path} does NOT exist[/red]")
 
         # Start transcription in a separate thread
-        t = threading.Thread(
-            target=self._transcribe_chunk, 
-            args=(chunk_path, self.current_chunk_index)
-        )
-        t.start()
-        self.transcription_threads.append(t)
+        self._start_chunk_transcription(self.session, chunk_path, self.current_chunk_index)
 
         # Prepare for the next chunk
         self.current_chunk_index += 1
-        new_filename = os.path.join(self.temp_dir, f"temp_audio_file{self.current_chunk_index}.wav")
+        new_filename = self.session.chunk_path(self.temp_dir, self.current_chunk_index)
         self.active_filename = new_filename
 
         try:
             # Create a new wave file for the next chunk
             self.active_wave_file = wave.open(new_filename, 'wb')
             self.active_wave_file.setnchannels(self.config.channels)
-            self.active_wave_file.setsampwidth(self.audio.get_sample_size(self.config.format))
+            self.active_wave_file.setsampwidth(self.capture_hub.sample_size())
             self.active_wave_file.setframerate(self.config.rate)
             self.console.print(f"[green]Opened new chunk file: {os.path.basename(new_filename)}[/green]")
         except Exception as e:
             self.console.print(f"[bold red]Failed to open new chunk file {new_filename}: {e}[/bold red]")
     
-    def _transcribe_chunk(self, chunk_path: str, chunk_idx: int) -> None:
+    def _start_chunk_transcription(self, session: RecordingSession, chunk_path: str, chunk_idx: int) -> None:
+        t = threading.Thread(
+            target=self._transcribe_chunk, 
+            args=(session, chunk_path, chunk_idx)
+        )
+        t.start()
+        session.transcription_threads.append(t)
+    
+    def _transcribe_chunk(self, session: RecordingSession, chunk_path: str, chunk_idx: int) -> None:
         """Transcribe a single audio chunk."""
-        text = self.transcriber.transcribe(chunk_path)
+        with TRANSCRIPTION_SECONDS.time(pipeline="longform"), \
+                TRACER.span("transcribe", "longform", session.trace_session, chunk=chunk_idx):
+            text = self.transcriber.transcribe(chunk_path)
+        try:
+            # 16-bit mono after the 44-byte WAV header
+            AUDIO_SECONDS.inc(max(0, os.path.getsize(chunk_path) - 44) / 2 / self.config.rate, pipeline="longform")
+        except OSError:
+            pass
         
         self.console.print(f"[cyan]Partial transcription of {os.path.basename(chunk_path)}[/cyan]")
         self.console.print(f"[bold magenta]{text}[/bold magenta]\n")
 
-        self.partial_transcripts[chunk_idx] = text
+        session.partial_transcripts[chunk_idx] = text
+    
+    def _stop_capture(self) -> RecordingSession:
+        """End the capture of the current recording; returns its session."""
+        session = self.session
+        self.recording = False
+
+        # Wait for recording thread to finish
+        if self.recording_thread:
+            with TRACER.span("wait_capture", "longform", session.trace_session, waits=True):
+                self.recording_thread.join()
+        self.session = None
+        return session
     
     def stop_and_transcribe(self) -> None:
-        """Stop recording and transcribe all chunks."""
+        """Stop recording and hand it to the finalizer; returns as soon as capture has stopped."""
         if not self.recording:
             self.console.print("[italic bold yellow]Recording not in progress[/italic bold yellow]")
             return
 
         self.console.print("[bold blue]Stopping recording and transcribing...[/bold blue]")
-        self.recording = False
-
-        # Wait for recording thread to finish
-        if self.recording_thread:
-            self.recording_thread.join()
+        stop_start = time.time()
+        session = self._stop_capture()
+        session.stop_started = stop_start
+        TRACER.record("capture", self.chunk_started, time.time(), "longform", session.trace_session,
+                      chunk=self.current_chunk_index)
 
         # Process the final chunk if it exists and has content
         if self.active_filename and os.path.exists(self.active_filename):
@@ -276,46 +342,86 @@ class LongFormAudioRecorder:
             
             # WAV header is 44 bytes, so check if there's actual audio data
             if os.path.getsize(self.active_filename) > 44:
-                final_chunk_idx = self.current_chunk_index
-                t = threading.Thread(
-                    target=self._transcribe_chunk, 
-                    args=(self.active_filename, final_chunk_idx)
-                )
-                t.start()
-                self.transcription_threads.append(t)
+                self._start_chunk_transcription(session, self.active_filename, self.current_chunk_index)
                 self.current_chunk_index += 1
 
-        # Update tray icon
-        self.tray.set_color('blue', self.config.send_enter)
-        
+        with self.pending_lock:
+            self.pending_sessions.append(session)
+        self.finalize_queue.put(session)
+        self._update_tray()
+    
+    def discard(self) -> None:
+        """Stop the current recording without transcribing it (chunks already being transcribed are dropped)."""
+        if not self.recording:
+            return
+        self._stop_capture()
+        self.buffer.clear()
+        self._update_tray()
+    
+    def _update_tray(self) -> None:
+        if self.recording:
+            self.tray.set_color('red', self.config.send_enter)
+        elif self.finalizing:
+            self.tray.set_color('blue', self.config.send_enter)
+        else:
+            self.tray.set_color('gray', self.config.send_enter)
+    
+    def _finalize_loop(self) -> None:
+        """Finalize stopped recordings one at a time, so their results are pasted in recording order."""
+        while True:
+            session = self.finalize_queue.get()
+            if session is None:
+                return
+            try:
+                self._finalize(session)
+            except Exception as e:
+                self.console.print(f"[bold red]Failed to finalize recording {session.number}: {e}[/bold red]")
+            finally:
+                with self.pending_lock:
+                    self.pending_sessions.remove(session)
+                self._update_tray()
+    
+    def _finalize(self, session: RecordingSession) -> None:
+        """Wait for the chunk transcriptions of a stopped recording, then combine and paste them."""
         # Wait for all transcription threads to complete
-        self.console.print("[blue]Waiting for partial transcriptions...[/blue]")
-        for t in self.transcription_threads:
-            t.join()
+        self.console.print(f"[blue]Waiting for partial transcriptions of recording {session.number}...[/blue]")
+        with TRACER.span("wait_transcripts", "longform", session.trace_session, waits=True,
+                         threads=sum(t.is_alive() for t in session.transcription_threads)):
+            for t in session.transcription_threads:
+                t.join()
 
         # Combine all transcriptions in order
         ordered_texts = []
-        for idx in sorted(self.partial_transcripts.keys()):
-            ordered_texts.append(self.partial_transcripts[idx])
+        for idx in sorted(session.partial_transcripts.keys()):
+            ordered_texts.append(session.partial_transcripts[idx])
         
         full_text = "".join(ordered_texts)
         if full_text and full_text[0].isspace():
             full_text = full_text[1:]
 
-        # Display the result
-        panel = Panel(
-            f"[bold magenta]Final Combined Transcription:[/bold magenta] {full_text}",
-            title="Transcription",
-            border_style="yellow"
-        )
-        self.console.print(panel)
+        with TRACER.span("output", "longform", session.trace_session, characters=len(full_text)):
+            # Display the result
+            panel = Panel(
+                f"[bold magenta]Final Combined Transcription:[/bold magenta] {full_text}",
+                title="Transcription",
+                border_style="yellow"
+            )
+            self.console.print(panel)
 
-        # Copy to clipboard and paste
-        pyperclip.copy(full_text)
-        keyboard.send('ctrl+v')
-        if self.config.send_enter:
-            keyboard.send('enter')
-            self.console.print("[yellow]Sent an ENTER keystroke after transcription.[/yellow]")
+            # Copy to clipboard and paste
+            pyperclip.copy(full_text)
+            keyboard.send('ctrl+v')
+            if self.config.send_enter:
+                keyboard.send('enter')
+                self.console.print("[yellow]Sent an ENTER keystroke after transcription.[/yellow]")
 
+        TRACER.record("stop", session.stop_started, time.time(), "longform", session.trace_session,
+                      chunks=len(session.partial_transcripts))
         self.console.print("[italic green]Done.[/italic green]")
-        self.tray.set_color('gray', self.config.send_enter)
\ No newline at end of file
+    
+    def shutdown(self, timeout: float = 60.0) -> None:
+        """Let the finalizer paste the recordings still being transcribed, then stop it."""
+        if self.finalizing:
+            self.console.print("[yellow]Waiting for the last recordings to be transcribed...[/yellow]")
+        self.finalize_queue.put(None)
+        self.finalizer_thread.join(timeout=timeout)
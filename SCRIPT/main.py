@@ -4,8 +4,22 @@
 # This module initializes all components and orchestrates the application:
 # - Loads and manages configuration (language settings, audio sources, models)
 # - Creates and coordinates all system components (recorder, transcriber, UI)
-# - Handles hotkey commands via TCP server (F1, F2, ...)
-# - Manages application lifecycle (startup, shutdown, resource handling)
+# - Handles hotkey commands via a non-blocking TCP server (F1, F2, ...):
+#   commands run on worker lanes and every request gets a JSON reply
+# - Optionally serves the loaded models to other local tools (HTTP uploads,
+#   WebSocket streaming)
+# - Runs a persistent background queue of static file jobs (QUEUE_* commands,
+#   watch folders)
+# - Exports pipeline metrics in the Prometheus text format (METRICS command,
+#   GET /metrics of the HTTP API) and, when enabled, traces the pipeline
+#   stages to JSONL
+# - Profiles the live app on demand (PROFILE_START / PROFILE_STOP write a
+#   speedscope file; MEMSNAP reports memory per model and Python allocator)
+# - Manages application lifecycle (startup, shutdown, resource handling):
+#   the model loads and warms up in the background while the tray, command
+#   server and hotkey script come up, so hotkeys work within a second or two
+#   (transcriptions asked for meanwhile wait for the model), and a startup
+#   report shows where the time went
 # - Provides command handlers for all user interactions
 # - Toggles between different transcription modes
 #
@@ -13,6 +27,8 @@
 # 1. Long-form transcription: For extended recordings with chunking support
 # 2. Real-time transcription: For immediate feedback during speech
 # 3. Static file transcription: For processing pre-recorded audio files
+# All three can run at the same time on the shared model: recording and
+# real-time transcription have priority, static work uses what is left
 #
 # The application handles translation depending on the model type (applies to real-time models only):
 # Turbo models, which are faster (e.g. deepdml/faster-whisper-large-v3-turbo-ct2 is faster than
@@ -28,19 +44,32 @@ import threading
 from rich.console import Console
 from rich.panel import Panel
 import re
+import json
+import queue
 import socket
+import selectors
 import subprocess
+import tracemalloc
 import psutil
 from dataclasses import dataclass
-from typing import List
-
-# Import modules
-from system_tray_icon_manager import TrayManager
-from transcription_engine import Transcriber
-from longform_audio_recorder import LongFormAudioRecorder
-from static_file_processor import StaticFileProcessor
-from realtime_transcription_handler import RealtimeTranscriptionHandler
-from unified_configuration_dialog import UnifiedConfigDialog
+from typing import List, Optional
+
+# Import modules (heavy libraries such as faster-whisper and tkinter are imported where they are first used)
+from startup_timing import STARTUP
+with STARTUP.phase("imports"):
+    from system_tray_icon_manager import TrayManager
+    from transcription_engine import Transcriber
+    from longform_audio_recorder import LongFormAudioRecorder
+    from static_file_processor import StaticFileProcessor
+    from realtime_transcription_handler import RealtimeTranscriptionHandler
+    from audio_capture_hub import AudioCaptureHub, LevelMeter
+    from unified_configuration_dialog import UnifiedConfigDialog
+    from job_queue import JobQueue, JobQueueWorker, FolderWatcher
+    from http_api import TranscriptionAPI
+    from websocket_streaming import StreamingServer
+    from metrics import REGISTRY, PIPELINE_ACTIVE, QUEUE_DEPTH
+    from tracing import TRACER
+    from profiling import SamplingProfiler, memory_snapshot
 
 # --------------------------------------------------------------------------------------
 # Configuration
@@ -52,9 +81,12 @@ class Config:
     
     # Audio settings for Real-Time STT
     realtime_use_system_audio: bool = True            # For real-time STT (default to system audio)
+    realtime_dual_source: bool = False                # Capture microphone AND system audio as two lanes
+    realtime_batch_window_ms: int = 150               # Utterances finishing this close together are batch-decoded
     
     # Common audio settings
     input_device_index: int = 3
+    input_level_meter: bool = False                   # Keep the configured inputs open and export their peak level (metrics)
     format: int = pyaudio.paInt16
     channels: int = 1
     rate: int = 16000
@@ -70,15 +102,63 @@ class Config:
     realtime_model: str = "deepdml/faster-whisper-large-v3-turbo-ct2"  # Default model for real-time STT
     
     # Detection settings
+    vad_backend: str = "webrtc"                       # Voice activity detector: "webrtc", "energy" or "onnx"
+    vad_onnx_model_path: str = ""                     # Local Silero-style ONNX model (used when vad_backend is "onnx")
     threshold: int = 500
     silence_limit_sec: float = 1.5
     chunk_split_interval: int = 60
     
+    # Real-time endpointing
+    realtime_adaptive_endpointing: bool = True       # Adapt the end-of-utterance silence to observed pauses
+    realtime_early_finalize_decode: bool = False     # Quick-decode the tail to finalize finished sentences early
+    
+    # Static file transcription
+    static_segment_seconds: float = 30.0              # Speech per independently transcribed segment
+    static_batch_size: int = 8                        # Segments decoded together in one model call
+    static_block_seconds: float = 10.0                # Audio decoded and VAD-checked per streaming block
+    static_vad_workers: int = 0                       # VAD processes for WAV inputs (0 = one per core but one, 1 = in-process)
+    static_vad_padding_ms: int = 90                   # Audio kept before and after every speech run
+    static_vad_hangover_ms: int = 300                 # Pauses shorter than this stay inside the speech run
+    static_output_formats: str = "txt"                # Comma-separated: txt, srt, vtt, json
+    static_checkpoints: bool = True                   # Persist finished segments so long jobs can resume
+    model_num_workers: int = 1                        # Parallel model workers (more = faster static jobs, more memory)
+    model_cpu_threads: int = 0                        # CPU threads shared by all model workers on CPU (0 = all cores)
+    model_warmup: bool = True                         # Decode a second of silence after loading, so the first transcription isn't slower
+    
+    # Background job queue
+    job_queue_enabled: bool = True                    # Transcribe queued files (QUEUE_ADD, watch folders) in the background
+    job_queue_watch_folders: str = ""                 # Semicolon-separated folders whose new media files are queued
+    job_queue_settle_seconds: float = 5.0             # A watched file is queued once its size is unchanged this long
+    
+    # Local HTTP transcription API
+    http_api_enabled: bool = False                    # Serve POST /v1/transcribe on 127.0.0.1 with the loaded model
+    http_api_port: int = 34910
+    http_api_batch_window_ms: int = 30                # Requests arriving this close together share one model call
+    http_api_max_batch: int = 8                       # Requests per batched model call
+    http_api_max_queue: int = 32                      # Requests waiting beyond this are refused (503)
+    http_api_max_upload_mb: float = 200.0             # Larger uploads are refused (413)
+    http_api_request_timeout_s: float = 600.0         # A request still waiting for its batch after this gets 504
+    
+    # WebSocket streaming transcription
+    websocket_enabled: bool = False                   # Serve ws://127.0.0.1:<port>/v1/stream (needs 'websockets')
+    websocket_port: int = 34911
+    websocket_max_sessions: int = 8                   # Concurrent streaming clients
+    websocket_max_batch: int = 4                      # Sessions decoded together in one model call
+    websocket_partial_interval_ms: int = 700          # New speech between partial results
+    websocket_max_speed: float = 1.0                  # Clients sending faster than this x real time are slowed down
+    
     # Transcription settings
     send_enter: bool = False
+    decode_time_hallucination_filter: bool = True     # Keep known hallucination phrases out while decoding (regexes still run)
     
     # System settings
     hotkey_script: str = "AHK_script-hotkeys_handling.ahk"
+    tracing_enabled: bool = False                     # Write pipeline spans as JSONL (see trace_report.py)
+    tracing_dir: str = ""                             # Where trace files go (default: temp_audio/traces)
+    profile_interval_ms: int = 10                     # Sampling period of PROFILE_START
+    profile_max_seconds: float = 600.0                # The profiler stops sampling by itself after this long
+    profile_dir: str = ""                             # Where profiles and MEMSNAP reports go (default: temp_audio/profiles)
+    trace_python_allocations: bool = False            # Start tracemalloc at startup, so MEMSNAP sees the model setup too
     
     # Derived properties
     @property
@@ -110,6 +190,14 @@ class Config:
             re.compile(r"\bΣας\s+ευχαριστώ\b[^\w]*", re.IGNORECASE),
         ]
 
+    # The same phrases as a lexicon for the decoder (tokenized once per model)
+    @property
+    def hallucination_phrases(self) -> List[str]:
+        return [
+            "Υπότιτλοι AUTHORWAVE",
+            "Σας ευχαριστώ",
+        ]
+
     # User Configuration File
     def save_to_file(self, file_path="userdata.config"):
         """Save current configuration to a file."""
@@ -124,12 +212,25 @@ class Config:
             # Save all preferences
             "longform_use_system_audio": self.longform_use_system_audio,
             "realtime_use_system_audio": self.realtime_use_system_audio,
+            "realtime_dual_source": self.realtime_dual_source,
             "longform_language": self.longform_language,
             "realtime_language": self.realtime_language,
             "send_enter": self.send_enter,
             "task": self.task,
             "longform_model": self.longform_model,
-            "realtime_model": self.realtime_model
+            "realtime_model": self.realtime_model,
+            "vad_backend": self.vad_backend,
+            "vad_onnx_model_path": self.vad_onnx_model_path,
+            "static_output_formats": self.static_output_formats,
+            "job_queue_enabled": self.job_queue_enabled,
+            "job_queue_watch_folders": self.job_queue_watch_folders,
+            "job_queue_settle_seconds": self.job_queue_settle_seconds,
+            "http_api_enabled": self.http_api_enabled,
+            "http_api_port": self.http_api_port,
+            "websocket_enabled": self.websocket_enabled,
+            "websocket_port": self.websocket_port,
+            "tracing_enabled": self.tracing_enabled,
+            "tracing_dir": self.tracing_dir
         }
 
         try:
@@ -174,12 +275,80 @@ class Config:
 # --------------------------------------------------------------------------------------
 # Command Server
 # --------------------------------------------------------------------------------------
+class CommandLane:
+    """A worker thread that runs one group of commands in order, off the server thread."""
+
+    def __init__(self, name: str, console, max_pending: int = 8):
+        self.name = name
+        self.console = console
+        self.max_pending = max_pending
+        self.commands = queue.Queue()
+        self.busy_with = None
+        self.thread = threading.Thread(target=self._run, name=f"command-lane-{name}", daemon=True)
+        self.thread.start()
+
+    @property
+    def pending(self) -> int:
+        return self.commands.qsize() + (1 if self.busy_with else 0)
+
+    def submit(self, command: str, handler) -> bool:
+        """Queue a command; False if the lane is backed up (e.g. a hotkey held down behind a dialog)."""
+        if self.pending >= self.max_pending:
+            return False
+        self.commands.put((command, handler))
+        return True
+
+    def _run(self) -> None:
+        while True:
+            command, handler = self.commands.get()
+            self.busy_with = command
+            try:
+                handler()
+            except SystemExit:
+                pass  # QUIT -> shutdown() exits from this thread
+            except Exception as e:
+                self.console.print(f"[red]Command {command} failed: {e}[/red]")
+            finally:
+                self.busy_with = None
+
+
 class CommandServer:
-    def __init__(self, app: 'STTApp'):
+    # Commands that change what the app is doing run on worker threads, one lane per group:
+    # commands in a lane keep their order, lanes never wait for each other. A long
+    # STOP_AND_TRANSCRIBE or an open configuration dialog no longer blocks other hotkeys.
+    COMMAND_LANES = {
+        "OPEN_CONFIG_DIALOG": "dialog",
+        "TRANSCRIBE_STATIC": "static",
+        "START_RECORDING": "capture",
+        "STOP_AND_TRANSCRIBE": "capture",
+        "TOGGLE_REALTIME_TRANSCRIPTION": "capture",
+        "RESET_TRANSCRIPTION": "reset",
+        "TOGGLE_LANGUAGE": "settings",
+        "TOGGLE_ENTER": "settings",
+        "QUIT": "lifecycle",
+        "PROFILE_STOP": "diagnostics",
+        "MEMSNAP": "diagnostics",
+    }
+    # A second dialog behind an open one is pointless: repeated presses are refused instead
+    LANE_LIMITS = {"dialog": 1, "static": 1, "diagnostics": 2}
+    # Accepted while the model is still loading; their transcription waits for it
+    MODEL_COMMANDS = {"STOP_AND_TRANSCRIBE", "TRANSCRIBE_STATIC"}
+    MAX_LINE_BYTES = 64 * 1024
+
+    def __init__(self, app: 'STTApp', host: str = '127.0.0.1', port: int = 34909):
         self.app = app
         self.console = app.console
+        self.host = host
+        self.port = port
         self.keep_running = True
+        self.stopped = threading.Event()
         self.server_thread = None
+        self.selector = selectors.DefaultSelector()
+        self.lanes = {}
+        # Writing to this socket pair wakes the selector (immediate shutdown, no polling)
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self.ready = threading.Event()
     
     def start(self) -> None:
         """Start the TCP server in a separate thread."""
@@ -187,73 +356,215 @@ class CommandServer:
         self.server_thread.start()
     
     def _run_server(self) -> None:
-        """Run the TCP server to receive commands from AHK."""
-        host = '127.0.0.1'
-        port = 34909
+        """Serve commands from AHK (and other clients) on one selector loop.
         
+        Protocol: one command per line ("COMMAND [argument]"), answered with one JSON line
+        {"ok", "command", "status", "result"/"error"}. Connections may stay open for any
+        number of commands; a client that sends a command without a newline and closes its
+        side (AHK via ncat) still gets it executed.
+        """
+        listener = None
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             # Add socket option to reuse address to avoid "address already in use" errors
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            sock.bind((host, port))
-            sock.listen(5)
-            sock.settimeout(1)  # Allow checking keep_running flag every second
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((self.host, self.port))
+            listener.listen(16)
+            listener.setblocking(False)
+            self.port = listener.getsockname()[1]
+            self.selector.register(listener, selectors.EVENT_READ, data="listener")
+            self.selector.register(self._wakeup_recv, selectors.EVENT_READ, data="wakeup")
 
-            self.console.print(f"[bold yellow]TCP server listening on {host}:{port}[/bold yellow]")
+            self.console.print(f"[bold yellow]TCP server listening on {self.host}:{self.port}[/bold yellow]")
+            self.ready.set()
 
             while self.keep_running:
-                try:
-                    conn, addr = sock.accept()
-                    data = conn.recv(1024).decode('utf-8').strip()
-                    self.console.print(f"[italic cyan]Received command: '{data}'[/italic cyan]")
-
-                    # Process command
-                    self._handle_command(data)
-                    conn.close()
-                    
-                except socket.timeout:
-                    continue  # Just a timeout, check keep_running and continue
-                except Exception as e:
-                    self.console.print(f"[red]Socket error: {e}[/red]")
+                for key, mask in self.selector.select():
+                    if key.data == "listener":
+                        self._accept(listener)
+                    elif key.data == "wakeup":
+                        try:
+                            self._wakeup_recv.recv(512)
+                        except BlockingIOError:
+                            pass
+                    else:
+                        self._service(key.fileobj, key.data, mask)
                     
         except Exception as e:
             self.console.print(f"[bold red]Server error: {e}[/bold red]")
             
         finally:
-            if 'sock' in locals():
-                sock.close()
-    
-    def _handle_command(self, command: str) -> None:
-        """Process commands received from AHK."""
-        if command == "OPEN_CONFIG_DIALOG":
-            self.app.open_config_dialog()
-        if command == "TOGGLE_LANGUAGE":
-            self.app.toggle_language()
-        elif command == "START_RECORDING":
-            self.app.start_recording()
-        elif command == "STOP_AND_TRANSCRIBE":
-            self.app.stop_and_transcribe()
-        elif command == "TOGGLE_ENTER":
-            self.app.toggle_enter()
-        elif command == "RESET_TRANSCRIPTION":
-            self.app.reset_transcription()
-        elif command == "TRANSCRIBE_STATIC":
-            self.app.transcribe_static()
-        elif command == "TOGGLE_REALTIME_TRANSCRIPTION":
-            self.app.toggle_realtime_transcription()
-        elif command == "QUIT":
-            self.console.print("[bold red]Received QUIT command[/bold red]")
-            self.stop()
+            for key in list(self.selector.get_map().values()):
+                if key.data not in ("listener", "wakeup"):
+                    key.fileobj.close()
+            self.selector.close()
+            if listener is not None:
+                listener.close()
+            self.ready.set()
+    
+    def _accept(self, listener: socket.socket) -> None:
+        try:
+            conn, _ = listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        conn.setblocking(False)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        state = {"inbuf": bytearray(), "outbuf": bytearray(), "closing": False}
+        self.selector.register(conn, selectors.EVENT_READ, data=state)
+    
+    def _close(self, conn: socket.socket) -> None:
+        try:
+            self.selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+    
+    def _service(self, conn: socket.socket, state: dict, mask: int) -> None:
+        if mask & selectors.EVENT_READ:
+            try:
+                data = conn.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                data = None
+            except OSError:
+                self._close(conn)
+                return
+            if data == b"":
+                # Client closed its side: a trailing command without newline still counts
+                if state["inbuf"].strip():
+                    self._dispatch(conn, state, bytes(state["inbuf"]))
+                state["inbuf"].clear()
+                state["closing"] = True
+            elif data:
+                state["inbuf"] += data
+                while b"\n" in state["inbuf"]:
+                    line, _, rest = bytes(state["inbuf"]).partition(b"\n")
+                    state["inbuf"] = bytearray(rest)
+                    if line.strip():
+                        self._dispatch(conn, state, line)
+                if len(state["inbuf"]) > self.MAX_LINE_BYTES:
+                    self._reply(conn, state, {"ok": False, "command": "", "status": "error", "error": "line too long"})
+                    state["inbuf"].clear()
+                    state["closing"] = True
+        self._flush(conn, state)
+    
+    def _flush(self, conn: socket.socket, state: dict) -> None:
+        """Send what the socket takes now; wait for writability for the rest."""
+        if conn.fileno() == -1:
+            return
+        if state["outbuf"]:
+            try:
+                sent = conn.send(state["outbuf"])
+                del state["outbuf"][:sent]
+            except (BlockingIOError, InterruptedError):
+                pass
+            except OSError:
+                self._close(conn)
+                return
+        if state["closing"] and not state["outbuf"]:
+            self._close(conn)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if state["outbuf"] else 0)
+        if state["closing"]:
+            events = selectors.EVENT_WRITE
+        self.selector.modify(conn, events, data=state)
+    
+    def _reply(self, conn: socket.socket, state: dict, reply: dict) -> None:
+        state["outbuf"] += (json.dumps(reply, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+    
+    def _dispatch(self, conn: socket.socket, state: dict, line: bytes) -> None:
+        command = line.decode('utf-8', errors='replace').strip()
+        try:
+            reply = self._handle_command(command)
+        except Exception as e:
+            self.console.print(f"[red]Command '{command}' failed: {e}[/red]")
+            reply = {"ok": False, "command": command.partition(" ")[0], "status": "error", "error": str(e)}
+        self._reply(conn, state, reply)
+    
+    def _lane(self, name: str) -> CommandLane:
+        if name not in self.lanes:
+            self.lanes[name] = CommandLane(name, self.console, self.LANE_LIMITS.get(name, 8))
+        return self.lanes[name]
+    
+    def _handle_command(self, command: str) -> dict:
+        """Process commands received from AHK; returns the reply sent to the client."""
+        name, _, argument = command.partition(" ")
+        argument = argument.strip()
+
+        # Answered right away on the server thread
+        if name == "PING":
+            return {"ok": True, "command": name, "status": "done", "result": "pong"}
+        if name == "STATUS":
+            status = self.app.status()
+            status["command_lanes"] = {lane.name: lane.pending for lane in self.lanes.values()}
+            return {"ok": True, "command": name, "status": "done", "result": status}
+        if name == "METRICS":
+            return {"ok": True, "command": name, "status": "done", "result": REGISTRY.render()}
+        # Diagnostics: "PROFILE_START [interval_ms]" only starts a thread and is answered here;
+        # "PROFILE_STOP" and "MEMSNAP [top N]" write files and can take seconds, so they run on a lane
+        if name in ("PROFILE_START", "PROFILE_STOP", "MEMSNAP"):
+            result = self.app.check_profiling_command(name, argument)
+            if result is None and name == "PROFILE_START":
+                result = self.app.handle_profiling_command(name, argument)
+            if result is not None:
+                if not result.pop("ok", True):
+                    return {"ok": False, "command": name, "status": "error", "error": result.get("error", "")}
+                return {"ok": True, "command": name, "status": "done", "result": result}
+        # Queue commands carry an argument: "QUEUE_ADD <path>", "QUEUE_CANCEL <id>", "QUEUE_MOVE <id> <top|bottom|n>"
+        if name.startswith("QUEUE_"):
+            result = self.app.handle_queue_command(name, argument)
+            if not result.pop("ok", True):
+                return {"ok": False, "command": name, "status": "error", "error": result.get("error", "")}
+            return {"ok": True, "command": name, "status": "done", "result": result}
+
+        handlers = {
+            "OPEN_CONFIG_DIALOG": self.app.open_config_dialog,
+            "TOGGLE_LANGUAGE": self.app.toggle_language,
+            "START_RECORDING": self.app.start_recording,
+            "STOP_AND_TRANSCRIBE": self.app.stop_and_transcribe,
+            "TOGGLE_ENTER": self.app.toggle_enter,
+            "RESET_TRANSCRIPTION": self.app.reset_transcription,
+            "TRANSCRIBE_STATIC": self.app.transcribe_static,
+            "TOGGLE_REALTIME_TRANSCRIPTION": self.app.toggle_realtime_transcription,
+            "QUIT": self._quit,
+            "PROFILE_STOP": lambda: self.app.handle_profiling_command(name, argument),
+            "MEMSNAP": lambda: self.app.handle_profiling_command(name, argument),
+        }
+        handler = handlers.get(name)
+        if handler is None:
+            self.console.print(f"[red]Unknown command: '{command}'[/red]")
+            return {"ok": False, "command": name, "status": "error", "error": "unknown command"}
+
+        self.console.print(f"[italic cyan]Received command: '{command}'[/italic cyan]")
+        lane = self._lane(self.COMMAND_LANES[name])
+        if not lane.submit(name, handler):
+            return {"ok": False, "command": name, "status": "error",
+                    "error": f"busy: {lane.pending} commands pending in the '{lane.name}' lane"}
+        result = {"lane": lane.name, "pending": lane.pending}
+        if name in self.MODEL_COMMANDS and not self.app.transcriber.ready.is_set():
+            self.console.print("[yellow]The model is still loading: the transcription starts once it is ready[/yellow]")
+            result["model_ready"] = False
+        return {"ok": True, "command": name, "status": "accepted", "result": result}
+    
+    def _quit(self) -> None:
+        self.console.print("[bold red]Received QUIT command[/bold red]")
+        self.stop()
     
     def stop(self) -> None:
         """Stop the server and application."""
         self.keep_running = False
+        try:
+            self._wakeup_send.send(b"x")
+        except OSError:
+            pass
 
         # If a static transcription is in progress, request abort
         if hasattr(self.app, 'static_processor') and self.app.static_processor.is_transcribing():
             self.app.static_processor.request_abort()
 
-        self.app.shutdown()
+        try:
+            self.app.shutdown()
+        finally:
+            self.stopped.set()  # Lets the main thread return once shutdown has run
 
 # --------------------------------------------------------------------------------------
 # Main Application
@@ -261,7 +572,8 @@ class CommandServer:
 class STTApp:
     def __init__(self):
         self.console = Console()
-        self.config = Config.load_from_file()
+        with STARTUP.phase("configuration"):
+            self.config = Config.load_from_file()
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         self.ahk_pid = None
         
@@ -274,19 +586,67 @@ class STTApp:
             except Exception as e:
                 self.console.print(f"[red]Failed to create temp directory: {e}[/red]")
         
+        # Span tracing starts before the models load, so every session of this run is covered
+        if self.config.tracing_enabled:
+            trace_path = TRACER.start(self.config.tracing_dir or os.path.join(self.temp_dir, "traces"))
+            self.console.print(f"[blue]Tracing pipeline stages to {trace_path}[/blue]")
+        if self.config.trace_python_allocations:
+            tracemalloc.start()
+        self.profile_dir = self.config.profile_dir or os.path.join(self.temp_dir, "profiles")
+        self.profiler = SamplingProfiler(self.config.profile_interval_ms, self.config.profile_max_seconds)
+        
+        # The model loads (and warms up) in the background while everything else comes up;
+        # model calls made before it is ready wait for it
+        self.transcriber = Transcriber(self.config, self.console, model_id=self.config.longform_model, load=False)
+        self.transcriber.start_loading(warm_up=self.config.model_warmup)
+        
         # Initialize components
-        self.tray = TrayManager(self.console)
-        self.transcriber = Transcriber(self.config, self.console, model_id=self.config.longform_model)
-        self.recorder = LongFormAudioRecorder(self.config, self.console, self.transcriber, self.tray)
+        with STARTUP.phase("tray"):
+            self.tray = TrayManager(self.console)
+        # One PortAudio context and one capture per input device, shared by the recorder and the real-time lanes
+        with STARTUP.phase("audio"):
+            self.capture_hub = AudioCaptureHub(self.config, self.console)
+        with STARTUP.phase("pipelines"):
+            self._create_pipelines()
+    
+    def _create_pipelines(self) -> None:
+        """Pipelines, command server, job queue and the optional APIs (none of them needs the model yet)."""
+        self.recorder = LongFormAudioRecorder(self.config, self.console, self.transcriber, self.tray, self.capture_hub)
         self.static_processor = StaticFileProcessor(self.config, self.console, self.transcriber, self.tray)
-        self.realtime_handler = RealtimeTranscriptionHandler(self.config, self.console, self.transcriber, self.tray, model_name=self.config.realtime_model)
+        self.realtime_handler = RealtimeTranscriptionHandler(self.config, self.console, self.transcriber, self.tray,
+                                                             self.capture_hub, model_name=self.config.realtime_model)
+        self.level_meters = []
+        if self.config.input_level_meter:
+            devices = {self.config.input_device_index if self.config.longform_use_system_audio else None}
+            devices.update(device for _, device in self.realtime_handler._lane_sources())
+            for device in devices:
+                try:
+                    self.level_meters.append(LevelMeter(self.capture_hub, device))
+                except Exception as e:
+                    self.console.print(f"[red]No level meter for input {device}: {e}[/red]")
         self.config_dialog = UnifiedConfigDialog(self.config, self.console, self.realtime_handler, self.transcriber)
         self.server = CommandServer(self)
+        self.transcriber.scheduler.interactive_active = self._interactive_active
+        
+        # Background queue of static jobs (persists across restarts)
+        self.job_queue = JobQueue(os.path.join(self.temp_dir, "job_queue.sqlite3"))
+        self.queue_worker = JobQueueWorker(self.job_queue, self.static_processor, self.console)
+        folders = [f.strip() for f in self.config.job_queue_watch_folders.split(";") if f.strip()]
+        self.folder_watcher = FolderWatcher(folders, lambda path: self.queue_file(path, source="watch"),
+                                            self.job_queue.seen, self.console,
+                                            settle_seconds=self.config.job_queue_settle_seconds)
+        
+        # Optional HTTP API sharing the long-form model with other local tools
+        self.http_api = TranscriptionAPI(self.config, self.console, self.transcriber) if self.config.http_api_enabled else None
+        self.streaming_server = (StreamingServer(self.config, self.console, self.realtime_handler, self.transcriber)
+                                 if self.config.websocket_enabled else None)
+        REGISTRY.add_collector("app", self._collect_metrics)
     
     def _display_info(self) -> None:
         """Display startup information."""
         panel_content = (
-            f"[bold yellow]Model[/bold yellow]: {self.transcriber.model_id}\n"
+            f"[bold yellow]Model[/bold yellow]: {self.transcriber.model_id}"
+            f"{'' if self.transcriber.ready.is_set() else ' (loading in the background)'}\n"
             f"[bold yellow]Hotkeys[/bold yellow]: Controlled by AutoHotKey script '{self.config.hotkey_script}'\n"
             " F1  -> Open configuration dialog\n"
             " F2  -> Toggle live transcription\n"
@@ -301,7 +661,7 @@ class STTApp:
             f"  Audio Source: {'System Audio' if self.config.longform_use_system_audio else 'Microphone'}\n"
             f"[bold yellow]Real-time STT[/bold yellow]:\n"
             f"  Language: {self.config.realtime_language}\n"
-            f"  Audio Source: {'System Audio' if self.config.realtime_use_system_audio else 'Microphone'}\n"
+            f"  Audio Source: {'Microphone + System Audio' if self.config.realtime_dual_source else 'System Audio' if self.config.realtime_use_system_audio else 'Microphone'}\n"
             f"  Model: {self.realtime_handler.realtime_model_name}"
         )
         panel = Panel(panel_content, title="Information", border_style="green")
@@ -316,10 +676,7 @@ class STTApp:
         # Check if live recording is in progress
         if self.recorder.recording:
             self.console.print("[bold yellow]Stopping live transcription...[/bold yellow]")
-            self.recorder.recording = False
-            if self.recorder.recording_thread:
-                self.recorder.recording_thread.join()
-            self.recorder._cleanup_resources()
+            self.recorder.discard()
 
         # Check if real-time transcription is running
         if self.realtime_handler.is_running:
@@ -378,6 +735,11 @@ class STTApp:
                 self.console.print(f"[cyan]Real Time audio source changed to: {source_str}[/cyan]")
                 changes_made = True
 
+            if result["realtime_dual_source"] != self.config.realtime_dual_source:
+                self.config.realtime_dual_source = result["realtime_dual_source"]
+                self.console.print(f"[cyan]Real Time dual-source capture (microphone + system audio): {self.config.realtime_dual_source}[/cyan]")
+                changes_made = True
+
             # Apply model change
             if result["longform_model_name"] and result["longform_model_name"] != self.transcriber.model_id:
                 old_model = self.transcriber.model_id
@@ -451,16 +813,20 @@ class STTApp:
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                 pass
     
-    def _start_ahk_script(self) -> None:
-        """Launch the AHK script and track its PID."""
-        # Record existing AHK PIDs before launching
-        pre_pids = set()
+    def _ahk_pids(self) -> set:
+        pids = set()
         for proc in psutil.process_iter(['pid', 'name']):
             try:
                 if proc.info['name'] == 'AutoHotkeyU64.exe':
-                    pre_pids.add(proc.info['pid'])
+                    pids.add(proc.info['pid'])
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 pass
+        return pids
+    
+    def _start_ahk_script(self, timeout: float = 5.0) -> None:
+        """Launch the AHK script and track its PID."""
+        # Record existing AHK PIDs before launching
+        pre_pids = self._ahk_pids()
 
         # Launch the AHK script
         ahk_path = os.path.join(self.script_dir, self.config.hotkey_script)
@@ -471,20 +837,14 @@ class STTApp:
             shell=True
         )
 
-        # Give it a moment to start
-        time.sleep(1.0)
-        
-        # Find the new AHK process
-        post_pids = set()
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                if proc.info['name'] == 'AutoHotkeyU64.exe':
-                    post_pids.add(proc.info['pid'])
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
+        # Find the new AHK process as soon as it shows up (instead of a fixed pause)
+        new_pids = set()
+        deadline = time.monotonic() + timeout
+        while not new_pids and time.monotonic() < deadline:
+            time.sleep(0.05)
+            new_pids = self._ahk_pids() - pre_pids
 
         # Store the PID of the new process
-        new_pids = post_pids - pre_pids
         if len(new_pids) == 1:
             self.ahk_pid = new_pids.pop()
             self.console.print(f"[green]Detected new AHK script PID: {self.ahk_pid}[/green]")
@@ -495,18 +855,47 @@ class STTApp:
     def start(self) -> None:
         """Start the application."""
         self._display_info()
-        self._kill_leftover_ahk()
-        self._start_ahk_script()
+        # Listen before the hotkey script starts, so its first command finds the server
+        with STARTUP.phase("command server"):
+            self.server.start()
+            self.server.ready.wait(5.0)
+        STARTUP.mark("commands accepted")
+        with STARTUP.phase("hotkey script"):
+            self._kill_leftover_ahk()
+            self._start_ahk_script()
+        if self.ahk_pid is not None:
+            STARTUP.mark("hotkeys ready")
         self.tray.set_color('gray', self.config.send_enter)
-        self.server.start()
+        if self.config.job_queue_enabled:
+            self.queue_worker.start()
+            self.folder_watcher.start()
+            counts = self.job_queue.counts()
+            if counts["queued"]:
+                self.console.print(f"[blue]Job queue: {counts['queued']} file(s) waiting[/blue]")
+        if self.http_api is not None:
+            try:
+                self.http_api.start()
+            except OSError as e:
+                self.console.print(f"[red]Could not start the HTTP API on port {self.config.http_api_port}: {e}[/red]")
+                self.http_api = None
+        if self.streaming_server is not None:
+            self.streaming_server.start()
         
         # Keep the main thread alive
+        reported = False
         try:
-            while self.server.keep_running:
-                time.sleep(1)
+            while not self.server.stopped.wait(0.5):
+                if not reported and self.transcriber.ready.is_set():
+                    reported = True
+                    self._report_startup()
         except KeyboardInterrupt:
             self.shutdown()
     
+    def _report_startup(self) -> None:
+        """Print where the startup time went (once the model is ready) and trace it."""
+        self.console.print(Panel(STARTUP.render(), title="Startup", border_style="blue"))
+        STARTUP.trace()
+    
     # Command handler methods
     def toggle_language(self) -> None:
         """Toggle between Greek and English languages."""
@@ -514,17 +903,7 @@ class STTApp:
     
     def start_recording(self) -> None:
         """Start recording audio from the microphone."""
-        # Check if any transcription is already running
-        if self.realtime_handler.is_running:
-            self.console.print("[bold yellow]Cannot start recording while real-time transcription is running.[/bold yellow]")
-            self.tray.flash_white('gray', self.config.send_enter)
-            return
-
-        if self.static_processor.is_transcribing():
-            self.console.print("[bold yellow]Cannot start recording while static transcription is running.[/bold yellow]")
-            self.tray.flash_white('gray', self.config.send_enter)
-            return
-
+        # Runs alongside real-time and static transcription: static work gives way at segment boundaries
         self.recorder.start()
     
     def stop_and_transcribe(self) -> None:
@@ -560,17 +939,8 @@ class STTApp:
             self.tray.flash_white('gray', self.config.send_enter)
             
             self.console.print("[bold yellow]Resetting live transcription...[/bold yellow]")
-            # Stop recording without transcribing
-            self.recorder.recording = False
-            if self.recorder.recording_thread:
-                self.recorder.recording_thread.join()
-            
-            # Clean up resources
-            self.recorder._cleanup_resources()
-            
-            # Clear partial transcripts
-            self.recorder.partial_transcripts.clear()
-            self.recorder.buffer.clear()
+            # Stop recording without transcribing (earlier stopped recordings still get pasted)
+            self.recorder.discard()
 
             self.console.print("[green]Live transcription reset. Ready for new commands.[/green]")
         else:
@@ -587,17 +957,7 @@ class STTApp:
     def transcribe_static(self) -> None:
         """Transcribe a static audio file."""
 
-        # Check if any transcription is already running
-        if self.recorder.recording:
-            self.console.print("[bold yellow]Cannot start static transcription while recording is in progress.[/bold yellow]")
-            self.tray.flash_white('gray', self.config.send_enter)
-            return
-            
-        if self.realtime_handler.is_running:
-            self.console.print("[bold yellow]Cannot start static transcription while real-time transcription is running.[/bold yellow]")
-            self.tray.flash_white('gray', self.config.send_enter)
-            return
-
+        # Runs at background priority while recording or real-time transcription is active
         self.static_processor.transcribe_file()
     
     def toggle_realtime_transcription(self) -> None:
@@ -609,19 +969,165 @@ class STTApp:
             self.realtime_handler.stop()
             return
 
-        # Check if any other transcription is running
-        if self.recorder.recording:
-            self.console.print("[bold yellow]Cannot start real-time transcription while recording is in progress.[/bold yellow]")
-            self.tray.flash_white('gray', self.config.send_enter)
-            return
-
-        if self.static_processor.is_transcribing():
-            self.console.print("[bold yellow]Cannot start real-time transcription while static transcription is running.[/bold yellow]")
-            self.tray.flash_white('gray', self.config.send_enter)
-            return
-
         self.realtime_handler.toggle()
 
+    def _interactive_active(self) -> bool:
+        """Interactive pipelines that static work gives the model to (see model_scheduler.py)."""
+        return self.recorder.recording or self.recorder.finalizing or self.realtime_handler.is_running
+    
+    def queue_file(self, path: str, source: str = "command") -> dict:
+        """Add a file to the background job queue."""
+        path = path.strip().strip('"')
+        if not os.path.isfile(path):
+            self.console.print(f"[red]Cannot queue '{path}': file not found[/red]")
+            return {"ok": False, "error": f"file not found: {path}"}
+        job_id = self.job_queue.add(path, source)
+        self.console.print(f"[green]Queued job {job_id}: {path}[/green]")
+        self.queue_worker.notify()
+        return {"ok": True, "id": job_id}
+    
+    def handle_queue_command(self, name: str, argument: str) -> dict:
+        """QUEUE_ADD, QUEUE_STATUS, QUEUE_CANCEL and QUEUE_MOVE; returns the reply data."""
+        if name == "QUEUE_ADD":
+            return self.queue_file(argument)
+        elif name == "QUEUE_STATUS":
+            counts = self.job_queue.counts()
+            jobs = self.job_queue.jobs()
+            lines = [f"{job['id']:>5}  {job['status']:<9}  {job['path']}"
+                     + (f"  ({job['error']})" if job['error'] else "")
+                     for job in jobs]
+            summary = "  ".join(f"{state}: {n}" for state, n in counts.items())
+            self.console.print(Panel("\n".join([summary, ""] + lines), title="Job Queue", border_style="blue"))
+            return {"ok": True, "counts": counts,
+                    "jobs": [{k: job[k] for k in ("id", "path", "status", "source", "error")} for job in jobs]}
+        elif name == "QUEUE_CANCEL":
+            try:
+                status = self.queue_worker.cancel(int(argument))
+            except ValueError:
+                status = None
+            if status in ("queued", "running"):
+                self.console.print(f"[yellow]Cancelled job {argument}[/yellow]")
+                return {"ok": True, "previous_status": status}
+            self.console.print(f"[red]No queued or running job {argument}[/red]")
+            return {"ok": False, "error": f"no queued or running job {argument}"}
+        elif name == "QUEUE_MOVE":
+            job_id, _, where = argument.partition(" ")
+            try:
+                moved = self.job_queue.move(int(job_id), where.strip().lower() or "top")
+            except ValueError:
+                moved = False
+            if moved:
+                self.console.print(f"[cyan]Moved job {job_id} to {where.strip() or 'top'}[/cyan]")
+                return {"ok": True}
+            self.console.print(f"[red]Cannot move job {argument}: not queued[/red]")
+            return {"ok": False, "error": f"cannot move job {argument}: not queued"}
+        self.console.print(f"[red]Unknown queue command: {name}[/red]")
+        return {"ok": False, "error": f"unknown queue command: {name}"}
+    
+    def check_profiling_command(self, name: str, argument: str) -> Optional[dict]:
+        """Error reply for a profiling command that cannot run now (None if it can); fast enough to run inline."""
+        if name == "PROFILE_START":
+            try:
+                int(argument) if argument else None
+            except ValueError:
+                return {"ok": False, "error": f"invalid sampling interval: {argument}"}
+            if self.profiler.running:
+                return {"ok": False, "error": "the profiler is already running"}
+        elif name == "PROFILE_STOP":
+            if self.profiler.thread is None:
+                return {"ok": False, "error": "the profiler is not running"}
+        elif name == "MEMSNAP":
+            try:
+                int(argument) if argument else None
+            except ValueError:
+                return {"ok": False, "error": f"invalid allocator count: {argument}"}
+        return None
+
+    def handle_profiling_command(self, name: str, argument: str) -> dict:
+        """PROFILE_START, PROFILE_STOP and MEMSNAP; returns the reply data."""
+        if name == "PROFILE_START":
+            try:
+                interval_ms = int(argument) if argument else None
+            except ValueError:
+                return {"ok": False, "error": f"invalid sampling interval: {argument}"}
+            if not self.profiler.start(interval_ms):
+                return {"ok": False, "error": "the profiler is already running"}
+            self.console.print(f"[blue]Profiling all threads every {self.profiler.interval_ms} ms "
+                               "(PROFILE_STOP writes the profile)[/blue]")
+            return {"ok": True, "interval_ms": self.profiler.interval_ms}
+        elif name == "PROFILE_STOP":
+            summary = self.profiler.stop(self.profile_dir)
+            if summary is None:
+                return {"ok": False, "error": "the profiler is not running"}
+            busiest = "\n".join(f"{entry['seconds']:8.3f}s  {entry['function']}  ({entry['where']})"
+                                 for entry in summary["busiest"])
+            self.console.print(Panel(
+                f"{summary['seconds']} s, {summary['samples']} samples, {summary['threads']} threads"
+                + (" (stopped by itself at profile_max_seconds)" if summary["auto_stopped"] else "")
+                + f"\nBusiest functions:\n{busiest}\n\nWritten to {summary['path']} (open in speedscope)",
+                title="Profile", border_style="blue"))
+            return {"ok": True, **summary}
+        elif name == "MEMSNAP":
+            try:
+                top = int(argument) if argument else 15
+            except ValueError:
+                return {"ok": False, "error": f"invalid allocator count: {argument}"}
+            report = memory_snapshot(self.profile_dir, top, keep_tracing=self.config.trace_python_allocations)
+            lines = [f"RSS: {report['rss_mb']} MB" + (f", GPU in use: {report['gpu_used_mb']} MB"
+                                                      if report["gpu_used_mb"] is not None else "")]
+            for model in report["models"]:
+                lines.append(f"  {model['role']:<9} {model['model']}: RSS +{model['rss_mb']} MB"
+                             + (f", GPU +{model['gpu_mb']} MB" if model["gpu_mb"] is not None else ""))
+            python = report["python"]
+            if "note" in python:
+                lines.append(f"Python: {python['note']}")
+            else:
+                lines.append(f"Python allocations: {python['traced_mb']} MB (peak {python['peak_mb']} MB)")
+                lines.extend(f"  {entry['size_kb']:10.1f} KB {entry['count']:8d}  {entry['where']}"
+                             for entry in python["top"])
+            if "unattributed_rss_mb" in report:
+                lines.append(f"Not attributed (libraries, native buffers): {report['unattributed_rss_mb']} MB")
+            self.console.print(Panel("\n".join(lines + ["", f"Written to {report['path']}"]),
+                                     title="Memory", border_style="blue"))
+            return {"ok": True, **report}
+        return {"ok": False, "error": f"unknown profiling command: {name}"}
+    
+    def status(self) -> dict:
+        """Snapshot of what the app is doing (STATUS command)."""
+        current_job = self.queue_worker.current_job
+        return {
+            "recording": self.recorder.recording,
+            "finalizing": self.recorder.finalizing,
+            "realtime": self.realtime_handler.is_running,
+            "static": self.static_processor.is_transcribing(),
+            "longform_language": self.config.longform_language,
+            "realtime_language": self.config.realtime_language,
+            "send_enter": self.config.send_enter,
+            "model": self.transcriber.model_id,
+            "model_ready": self.transcriber.ready.is_set() and self.transcriber.load_error is None,
+            "startup": STARTUP.report(),
+            "queue": self.job_queue.counts(),
+            "queue_job": current_job["path"] if current_job else None,
+            "http_api": self.http_api.health() if self.http_api is not None else None,
+            "streaming_sessions": self.streaming_server.session_count if self.streaming_server is not None else None,
+            "profiling": self.profiler.running,
+            "tracing_python_allocations": tracemalloc.is_tracing(),
+        }
+    
+    def _collect_metrics(self) -> None:
+        """Sampled when metrics are exported: which pipelines run, and the job queue depth."""
+        active = {
+            "longform": self.recorder.recording,
+            "realtime": self.realtime_handler.is_running,
+            "static": self.static_processor.is_transcribing(),
+            "job_queue": self.queue_worker.current_job is not None,
+            "http_api": self.http_api is not None,
+            "websocket": self.streaming_server is not None and self.streaming_server.session_count > 0,
+        }
+        for pipeline, running in active.items():
+            PIPELINE_ACTIVE.set(1 if running else 0, pipeline=pipeline)
+        QUEUE_DEPTH.set(self.job_queue.counts().get("queued", 0), queue="job_queue")
+    
     def toggle_audio_source(self) -> None:
         """Toggle between system audio and microphone for real-time transcription."""
         self.console.print("[bold yellow]TOGGLE_AUDIO_SOURCE command received[/bold yellow]")
@@ -635,6 +1141,33 @@ class STTApp:
         if hasattr(self, 'realtime_handler'):
             self.realtime_handler.stop()
 
+        # Paste what stopped recordings are still being transcribed for (a recording in progress is dropped)
+        if hasattr(self, 'recorder'):
+            self.recorder.discard()
+            self.recorder.shutdown()
+
+        # Release the input devices and PortAudio
+        if hasattr(self, 'capture_hub'):
+            for meter in self.level_meters:
+                meter.close()
+            self.capture_hub.close()
+
+        # Stop the background queue; an interrupted job resumes on the next start
+        if hasattr(self, 'queue_worker'):
+            self.folder_watcher.stop()
+            self.queue_worker.stop()
+            self.job_queue.close()
+
+        if getattr(self, 'http_api', None) is not None:
+            self.http_api.stop()
+        if getattr(self, 'streaming_server', None) is not None:
+            self.streaming_server.stop()
+        TRACER.stop()
+        if getattr(self, 'profiler', None) is not None and self.profiler.thread is not None:
+            summary = self.profiler.stop(self.profile_dir)  # Don't lose a profile still being recorded
+            if summary is not None:
+                self.console.print(f"[blue]Profile written to {summary['path']}[/blue]")
+
         # Save configuration before exiting
         try:
             self.config.save_to_file()
@@ -0,0 +1,273 @@
+# metrics.py
+#
+# Process-wide pipeline metrics in the Prometheus text format
+#
+# This module:
+# - Provides thread-safe counters, gauges and histograms with labels
+# - Keeps one shared registry (REGISTRY) the pipelines record into, plus the
+#   metric definitions they use (transcription time, audio processed, queue
+#   wait, dropped input frames, VAD speech ratio, model load time, startup
+#   phases, ...)
+# - Runs collectors right before rendering, for values that are cheaper to
+#   sample than to track (resident memory, pipeline active state, queue depths)
+# - Renders everything in the Prometheus text exposition format, served by the
+#   METRICS command of the command server and GET /metrics of the HTTP API
+#
+# Recording is a dictionary update under a lock, cheap enough for the
+# per-chunk capture loops
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Seconds: from a few ms (short partials) to several minutes (long-form chunks)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.values.clear()
+
+    def _samples(self) -> List[str]:
+        with self.lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                    for key, value in sorted(self.values.items())]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self.lock:
+            return self.values.get(self._key(labels), 0.0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self.lock:
+            return self.values.get(self._key(labels), 0.0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels) -> Dict[str, float]:
+        with self.lock:
+            series = self.values.get(self._key(labels))
+            if series is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": series["count"], "sum": series["sum"]}
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: Dict[str, Callable[[], None]] = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, name: str, collect: Callable[[], None]) -> None:
+        """Run `collect` before every render (replaces a collector of the same name)."""
+        with self.lock:
+            self.collectors[name] = collect
+
+    def remove_collector(self, name: str) -> None:
+        with self.lock:
+            self.collectors.pop(name, None)
+
+    def render(self) -> str:
+        with self.lock:
+            collectors = list(self.collectors.values())
+            metrics = list(self.metrics.values())
+        for collect in collectors:
+            try:
+                collect()
+            except Exception:
+                pass  # A failing collector must not break the export
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+TRANSCRIPTION_SECONDS = REGISTRY.histogram(
+    "stt_transcription_duration_seconds", "Wall time of one transcription call (a chunk, utterance or batch)",
+    ["pipeline"])
+AUDIO_SECONDS = REGISTRY.counter(
+    "stt_audio_processed_seconds_total", "Seconds of audio transcribed", ["pipeline"])
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "stt_queue_wait_seconds", "Time work waited in a queue before transcription started", ["queue"])
+QUEUE_DEPTH = REGISTRY.gauge(
+    "stt_queue_depth", "Items currently waiting in a queue", ["queue"])
+DROPPED_FRAMES = REGISTRY.counter(
+    "stt_input_frames_dropped_total", "Audio frames lost by a capture stream (behind the audio clock)", ["source"])
+VAD_SPEECH_RATIO = REGISTRY.gauge(
+    "stt_vad_speech_ratio", "Share of capture chunks classified as speech since the lane started", ["lane"])
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "stt_model_load_seconds", "Time it took to load a model", ["role", "model"])
+STARTUP_PHASE_SECONDS = REGISTRY.gauge(
+    "stt_startup_phase_seconds", "Time a startup phase took", ["phase"])
+STARTUP_MILESTONE_SECONDS = REGISTRY.gauge(
+    "stt_startup_milestone_seconds", "Seconds from the process start until a startup milestone", ["milestone"])
+MEMORY_RSS_BYTES = REGISTRY.gauge(
+    "stt_process_resident_memory_bytes", "Resident memory of the process")
+PIPELINE_ACTIVE = REGISTRY.gauge(
+    "stt_pipeline_active", "1 while a pipeline is running", ["pipeline"])
+
+
+def _collect_memory() -> None:
+    if PSUTIL_AVAILABLE:
+        MEMORY_RSS_BYTES.set(psutil.Process().memory_info().rss)
+
+
+REGISTRY.add_collector("memory", _collect_memory)
+
+
+class CaptureClock:
+    """Counts frames a capture stream lost, by comparing frames read against the audio clock.
+
+    PyAudio reads with exception_on_overflow=False drop overflowed input
+    silently; over time the stream then delivers fewer frames than the clock
+    says it should have. A tolerance of a few buffers absorbs scheduling jitter.
+    """
+
+    def __init__(self, source: str, rate: int, chunk: int, tolerance_chunks: int = 4):
+        self.source = source
+        self.rate = rate
+        self.tolerance = tolerance_chunks * chunk
+        self.started: Optional[float] = None
+        self.frames = 0
+        self.dropped = 0
+
+    def read(self, frames: int) -> None:
+        now = time.monotonic()
+        if self.started is None:
+            # The first read returns whatever was buffered: start the clock after it
+            self.started = now
+            return
+        self.frames += frames
+        missing = int((now - self.started) * self.rate) - self.frames - self.tolerance
+        if missing > self.dropped:
+            DROPPED_FRAMES.inc(missing - self.dropped, source=self.source)
+            self.dropped = missing
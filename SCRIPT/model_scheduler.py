@@ -0,0 +1,97 @@
+# model_scheduler.py
+#
+# Shares the long-form model between pipelines running at the same time
+#
+# This module:
+# - Hands out the model's worker slots (model_num_workers) by priority:
+#   interactive calls (long-form chunks, HTTP requests, real-time fallback,
+#   WebSocket streams) always go first, background calls (static files,
+#   queued jobs) get what is left
+# - Keeps background work small while an interactive pipeline is active: one
+#   segment per model call, and one slot kept free when there is more than
+#   one, so dictation waits at most for one segment in flight (preemption at
+#   segment boundaries) while files keep being transcribed instead of
+#   pausing
+# - Splits the CPU threads between the model workers that can run at once
+#   (long-form workers plus the real-time model), so concurrent pipelines
+#   share the cores instead of oversubscribing them
+# - Picks the device the models run on by asking CTranslate2 for GPUs, which
+#   is instant, instead of importing torch (seconds at startup) for it
+#
+# Slots are held for one model call; a waiting interactive call gets the
+# next slot that is released
+
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Optional
+
+from metrics import REGISTRY, QUEUE_DEPTH
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+def model_cpu_threads(config) -> int:
+    """Intra-op CPU threads per model worker, so all workers together use model_cpu_threads cores (0: all)."""
+    total = config.model_cpu_threads or os.cpu_count() or 4
+    concurrent = max(1, config.model_num_workers) + 1  # The real-time model runs alongside
+    return max(1, total // concurrent)
+
+
+@lru_cache(maxsize=None)
+def inference_device() -> str:
+    """"cuda" when CTranslate2 sees a GPU, else "cpu"."""
+    try:
+        import ctranslate2
+    except ImportError:
+        return "cpu"
+    return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+
+class ModelScheduler:
+    def __init__(self, slots: int, interactive_active: Optional[Callable[[], bool]] = None):
+        self.slots = max(1, slots)
+        self.interactive_active = interactive_active or (lambda: False)
+        self.condition = threading.Condition()
+        self.in_use = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        REGISTRY.add_collector("model_scheduler", self._collect_metrics)
+
+    def interactive(self) -> bool:
+        """True while an interactive pipeline runs or uses the model: background batches shrink to one segment."""
+        return bool(self.waiting[INTERACTIVE] or self.in_use[INTERACTIVE] or self.interactive_active())
+
+    def _can_run(self, priority: int) -> bool:
+        if self.in_use[INTERACTIVE] + self.in_use[BACKGROUND] >= self.slots:
+            return False
+        if priority == INTERACTIVE:
+            return True
+        if self.waiting[INTERACTIVE]:
+            return False
+        limit = max(1, self.slots - 1) if self.interactive() else self.slots
+        return self.in_use[BACKGROUND] < limit
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE):
+        """Hold a model worker slot for the with-block (one model call)."""
+        with self.condition:
+            self.waiting[priority] += 1
+            try:
+                # Timed wait: a pipeline becoming active changes the background limit without a notify
+                while not self._can_run(priority):
+                    self.condition.wait(0.5)
+            finally:
+                self.waiting[priority] -= 1
+            self.in_use[priority] += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_use[priority] -= 1
+                self.condition.notify_all()
+
+    def _collect_metrics(self) -> None:
+        QUEUE_DEPTH.set(self.waiting[INTERACTIVE], queue="model_interactive")
+        QUEUE_DEPTH.set(self.waiting[BACKGROUND], queue="model_background")
@@ -0,0 +1,88 @@
+# parallel_vad.py
+#
+# Multi-core VAD for memory-mapped static files
+#
+# Classifying every 30 ms frame of a multi-hour recording is a noticeable
+# share of a static job when it runs on one core (WebRTC VAD is called once
+# per frame). For files that can be memory-mapped this module shards the
+# data into blocks and classifies them in a process pool:
+# - Workers map the file themselves, so no audio is pickled between processes
+# - Frames are strided views of the map (reshape, no copy)
+# - Each worker keeps one VAD backend per configuration and resets it for
+#   every shard, so the result does not depend on how shards are distributed
+# - A shard is classified from a warm-up point before its start (the energy
+#   backend's noise-floor history) and the warm-up flags are dropped, so the
+#   adaptive state at every block matches classifying the file in one pass
+# - Results come back in block order and are fed to StreamingSpeechPacker,
+#   which merges them into padded speech runs with hangover
+#
+# With the spawn start method (Windows) every worker re-imports the app's
+# entry module (main.py and everything it imports) before taking a shard, so
+# the pool takes a while to start and is only used for long files
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Tuple
+import numpy as np
+from voice_activity_detection import create_vad_backend
+
+# Per-process backend cache: (name, rate, aggressiveness, model_path) -> backend
+_worker_backends: Dict[Tuple, object] = {}
+
+
+def _classify_shard(task: Tuple) -> np.ndarray:
+    """Worker: VAD flags for samples [start, start + count) of a memory-mapped data chunk."""
+    path, offset, start, count, backend_key = task
+    backend = _worker_backends.get(backend_key)
+    if backend is None:
+        name, rate, aggressiveness, model_path = backend_key
+        backend = create_vad_backend(name, sample_rate=rate, aggressiveness=aggressiveness, model_path=model_path)
+        _worker_backends[backend_key] = backend
+    backend.reset()
+
+    # Warm the adaptive state up on the audio before the shard; those flags belong to the previous shard
+    warmup = start - backend.warmup_start(start)
+    samples = np.memmap(path, dtype='<i2', mode='r', offset=offset + (start - warmup) * 2, shape=(warmup + count,))
+    try:
+        if warmup:
+            backend.speech_flags(samples[:warmup])
+        return backend.speech_flags(samples[warmup:])
+    finally:
+        del samples
+
+
+def default_vad_workers() -> int:
+    """One worker per core, leaving one for decoding and transcription."""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+class ShardedVAD:
+    """Classifies the blocks of a memory-mapped WAV in a process pool."""
+
+    def __init__(self, vad, rate: int = 16000, aggressiveness: int = 2, model_path: str = "",
+                 workers: int = 0):
+        self.backend_key = (vad.name, rate, aggressiveness, model_path or "")
+        self.frame_samples = vad.frame_samples
+        self.workers = workers if workers > 0 else default_vad_workers()
+        self.pool = None
+
+    def flags(self, path: str, offset: int, n_samples: int, block_samples: int) -> Iterator[np.ndarray]:
+        """Raw VAD flags per block (blocks of block_samples, a multiple of the frame), in order."""
+        if block_samples % self.frame_samples:
+            raise ValueError("block_samples must be a multiple of the VAD frame")
+        tasks = [
+            (path, offset, start, min(block_samples, n_samples - start), self.backend_key)
+            for start in range(0, n_samples, block_samples)
+        ]
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            for flags in self.pool.map(_classify_shard, tasks, chunksize=2):
+                yield flags
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop the pool (pending shards are cancelled, e.g. on abort)."""
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
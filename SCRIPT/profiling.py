@@ -0,0 +1,284 @@
+# profiling.py
+#
+# On-demand profiling of the running app (PROFILE_START / PROFILE_STOP / MEMSNAP)
+#
+# This module:
+# - Runs a sampling profiler on a background thread: every few milliseconds
+#   it records the Python stack of every other thread (recorder, real-time
+#   capture/decode, transcription workers, command lanes, ...). Nothing is
+#   hooked into the profiled code, so the overhead is one stack walk per
+#   thread per sample
+# - Writes the samples in the speedscope file format (one sampled profile per
+#   thread; open the file at https://www.speedscope.app). Time spent in native
+#   code (CTranslate2 decoding, PyAudio reads, sleeps) shows up under the
+#   Python function that called it
+# - Takes memory snapshots: process RSS, the memory each loaded model added
+#   (RSS and GPU memory measured around the model load) and the top Python
+#   allocators from tracemalloc. Tracing every allocation slows the whole app
+#   down, so unless trace_python_allocations is set it only runs from one
+#   MEMSNAP to the next
+#
+# Model weights live in CTranslate2's native allocations, which tracemalloc
+# does not see; measuring around the load is what attributes them to a model.
+# GPU memory is read through NVML (pynvml, optional); torch is only used if
+# something else already imported it, since importing it takes seconds
+
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+try:
+    import pynvml
+    PYNVML_AVAILABLE = True
+except ImportError:
+    PYNVML_AVAILABLE = False
+
+from model_scheduler import inference_device
+
+MB = 1024 * 1024
+
+# Leaf functions of threads that are waiting rather than working (left out of the busiest-functions list)
+IDLE_FUNCTIONS = {"wait", "select", "poll", "sleep", "get", "acquire", "_wait_for_tstate_lock", "accept", "readinto",
+                  "recv", "read", "join"}
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads; stop() writes a speedscope file."""
+
+    def __init__(self, interval_ms: int = 10, max_seconds: float = 600.0):
+        self.interval_ms = interval_ms
+        self.max_seconds = max_seconds
+        self.thread = None
+        self.stop_event = threading.Event()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.frames: List[Tuple[str, str, int]] = []
+        self.frame_index: Dict[Tuple[str, str, int], int] = {}
+        self.threads: Dict[int, Dict] = {}    # ident -> {"name", "samples", "weights"}
+        self.sample_count = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.auto_stopped = False
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval_ms: Optional[int] = None) -> bool:
+        """Start sampling (False if already running)."""
+        if self.running:
+            return False
+        if interval_ms:
+            self.interval_ms = interval_ms
+        self._reset()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+        return True
+
+    def _stack(self, frame) -> Tuple[int, ...]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self.frame_index.get(key)
+            if index is None:
+                index = self.frame_index[key] = len(self.frames)
+                self.frames.append(key)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        interval = self.interval_ms / 1000.0
+        self.started = last = time.perf_counter()
+        next_sample = last + interval
+        while not self.stop_event.wait(max(0.0, next_sample - time.perf_counter())):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = self._stack(frame)
+                thread = self.threads.get(ident)
+                if thread is None:
+                    thread = self.threads[ident] = {"name": names.get(ident, f"thread-{ident}"),
+                                                    "samples": [], "weights": []}
+                # Consecutive identical stacks are merged (speedscope adds up the weights)
+                if thread["samples"] and thread["samples"][-1] == stack:
+                    thread["weights"][-1] += weight
+                else:
+                    thread["samples"].append(stack)
+                    thread["weights"].append(weight)
+            del frames, frame
+            self.sample_count += 1
+            next_sample += interval
+            if now - next_sample > interval * 10:
+                next_sample = now + interval  # Fell far behind (e.g. the GIL was held): don't burst
+            if now - self.started >= self.max_seconds:
+                self.auto_stopped = True
+                break
+        self.elapsed = time.perf_counter() - self.started
+
+    def stop(self, directory: str) -> Optional[Dict]:
+        """Stop sampling and write the speedscope file; returns a summary (None if nothing was sampled)."""
+        if self.thread is None:
+            return None
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        if not self.sample_count:
+            return None
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, time.strftime("profile-%Y%m%d-%H%M%S.speedscope.json"))
+        profiles = []
+        for thread in sorted(self.threads.values(), key=lambda t: -sum(t["weights"])):
+            total = sum(thread["weights"])
+            profiles.append({
+                "type": "sampled",
+                "name": thread["name"],
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(total, 6),
+                "samples": [list(stack) for stack in thread["samples"]],
+                "weights": [round(w, 6) for w in thread["weights"]],
+            })
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": os.path.basename(path),
+            "activeProfileIndex": 0,
+            "exporter": "LongFormSTT profiling.py",
+            "shared": {"frames": [{"name": name, "file": file, "line": line} for name, file, line in self.frames]},
+            "profiles": profiles,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f)
+
+        return {
+            "path": path,
+            "seconds": round(self.elapsed, 2),
+            "samples": self.sample_count,
+            "threads": len(self.threads),
+            "auto_stopped": self.auto_stopped,
+            "busiest": self._busiest(),
+        }
+
+    def _busiest(self, top: int = 10) -> List[Dict]:
+        """Leaf functions with the most samples, waits left out."""
+        totals: Dict[int, float] = {}
+        for thread in self.threads.values():
+            for stack, weight in zip(thread["samples"], thread["weights"]):
+                if stack and self.frames[stack[-1]][0] not in IDLE_FUNCTIONS:
+                    totals[stack[-1]] = totals.get(stack[-1], 0.0) + weight
+        ranked = sorted(totals.items(), key=lambda item: -item[1])[:top]
+        return [{"function": self.frames[index][0],
+                 "where": f"{os.path.basename(self.frames[index][1])}:{self.frames[index][2]}",
+                 "seconds": round(seconds, 3)} for index, seconds in ranked]
+
+
+# ---------------------------------------------------------------------------- memory
+
+MODEL_MEMORY: Dict[str, Dict] = {}   # role -> the model loaded for it (a reload replaces the entry)
+
+
+def _rss() -> Optional[int]:
+    return psutil.Process().memory_info().rss if PSUTIL_AVAILABLE else None
+
+
+def _gpu_used() -> Optional[int]:
+    """Memory in use on the GPU the models run on (device 0), or None if it can't be read cheaply."""
+    if inference_device() != "cuda":
+        return None
+    if PYNVML_AVAILABLE:
+        try:
+            pynvml.nvmlInit()
+            try:
+                return pynvml.nvmlDeviceGetMemoryInfo(pynvml.nvmlDeviceGetHandleByIndex(0)).used
+            finally:
+                pynvml.nvmlShutdown()
+        except pynvml.NVMLError:
+            pass
+    torch = sys.modules.get("torch")  # Never imported for this: it would delay the model load by seconds
+    if torch is not None and torch.cuda.is_available():
+        free, total = torch.cuda.mem_get_info()
+        return total - free
+    return None
+
+
+@contextmanager
+def track_model_memory(role: str, model: str):
+    """Attribute the RSS / GPU memory that appears while the with-block loads a model."""
+    rss_before, gpu_before = _rss(), _gpu_used()
+    yield
+    rss_after, gpu_after = _rss(), _gpu_used()
+    MODEL_MEMORY[role] = {
+        "role": role,
+        "model": model,
+        "rss_mb": round((rss_after - rss_before) / MB, 1) if rss_before is not None else None,
+        "gpu_mb": round((gpu_after - gpu_before) / MB, 1) if gpu_before is not None else None,
+    }
+
+
+def memory_snapshot(directory: str, top: int = 15, keep_tracing: bool = False) -> Dict:
+    """RSS, memory per loaded model and the top Python allocators; also written to a JSON file.
+
+    The first call starts tracemalloc, the next one reports what was allocated since and stops it again
+    (unless keep_tracing).
+    """
+    report = {"rss_mb": None, "gpu_used_mb": None, "models": list(MODEL_MEMORY.values()), "python": {}}
+    if PSUTIL_AVAILABLE:
+        report["rss_mb"] = round(psutil.Process().memory_info().rss / MB, 1)
+    gpu = _gpu_used()
+    if gpu is not None:
+        report["gpu_used_mb"] = round(gpu / MB, 1)
+
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        traced, peak = tracemalloc.get_traced_memory()
+        report["python"] = {
+            "traced_mb": round(traced / MB, 1),
+            "peak_mb": round(peak / MB, 1),
+            "top": [{"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                     "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:top]],
+        }
+        del snapshot
+        if not keep_tracing:
+            tracemalloc.stop()
+    else:
+        # Allocations made before tracing started are not attributed: report from the next snapshot on
+        tracemalloc.start()
+        report["python"] = {"note": "tracemalloc started now; the next MEMSNAP lists the allocations made since "
+                                    "and stops tracing"}
+
+    if report["rss_mb"] is not None:
+        attributed = sum(m["rss_mb"] or 0 for m in report["models"]) + report["python"].get("traced_mb", 0)
+        report["unattributed_rss_mb"] = round(report["rss_mb"] - attributed, 1)
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, time.strftime("memsnap-%Y%m%d-%H%M%S.json"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    report["path"] = path
+    return report
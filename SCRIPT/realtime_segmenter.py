@@ -0,0 +1,179 @@
+# realtime_segmenter.py
+#
+# Turns a stream of captured audio chunks into finished utterances
+#
+# One SpeechSegmenter holds all per-lane state of the real-time pipeline:
+# - Its own VAD backend instance (adaptive backends keep per-stream state)
+# - Adaptive endpointing (trailing silence adapted to the observed pauses)
+# - The context + current utterance audio with incrementally cached
+#   log-mel features
+# - Optional quick tail decode to finalize finished sentences early
+#
+# process() is fed one chunk at a time and returns an Utterance when the
+# end of speech is detected; snapshot() copies the utterance in progress (for
+# partial results) and flush() ends it when the stream stops. Utterances
+# carry a snapshot of their audio and features, so decoding can happen on
+# another thread (or in a batch with utterances from other lanes) while
+# capture continues.
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import numpy as np
+from realtime_endpointing import AdaptiveEndpointer
+from incremental_feature_extractor import IncrementalLogMelExtractor
+
+
+@dataclass
+class Utterance:
+    """A finished utterance ready for decoding."""
+    source: str                      # Lane that captured it (e.g. "mic", "system")
+    audio: np.ndarray                # float32 context + utterance audio
+    features: Optional[np.ndarray]   # Whisper log-mel features of `audio` (None without a model)
+    start_time: float                # Wall clock time of the first speech chunk
+    end_time: float                  # Wall clock time of the last speech chunk (end of speech)
+    speech_ms: float                 # Speech duration of the utterance
+    vad_ms: float = 0.0              # Time the VAD spent on the utterance's chunks
+    finalized: float = field(default_factory=time.perf_counter)  # When the end of speech was decided
+
+
+class SpeechSegmenter:
+    def __init__(self, source: str, vad_backend, endpointer: AdaptiveEndpointer, rate: int, chunk: int,
+                 feature_extractor=None, context_chunks: int = 20, early_finalize: bool = False,
+                 tail_decoder: Optional[Callable[[np.ndarray], str]] = None, tail_seconds: float = 2.5,
+                 console=None):
+        self.source = source
+        self.vad_backend = vad_backend
+        self.endpointer = endpointer
+        self.rate = rate
+        self.chunk = chunk
+        self.context_chunks = context_chunks
+        self.early_finalize = early_finalize
+        self.tail_decoder = tail_decoder
+        self.tail_seconds = tail_seconds
+        self.console = console
+
+        self.utterance_audio = IncrementalLogMelExtractor(feature_extractor)
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a fresh stream: drop buffered audio and per-stream detector state."""
+        self.vad_backend.reset()
+        self.utterance_audio.reset()
+        self.is_speech_active = False
+        self.segment_samples = 0    # Samples of the current utterance (after the context)
+        self.silence_ms = 0.0       # Trailing silence of the current utterance, on the audio clock
+        self.utterance_ms = 0.0     # Speech duration of the current utterance
+        self.tail_checked = False
+        self.start_time = 0.0
+        self.last_speech_time = 0.0
+        self.chunks = 0             # Chunks seen since the reset, and how many of them were speech
+        self.speech_chunks = 0
+        self.vad_seconds = 0.0      # VAD time spent on the current utterance
+
+    @property
+    def speech_ratio(self) -> float:
+        """Share of the chunks since reset() that the VAD classified as speech."""
+        return self.speech_chunks / self.chunks if self.chunks else 0.0
+
+    def _print(self, message: str) -> None:
+        if self.console is not None:
+            self.console.print(message)
+
+    def _append(self, data: bytes) -> None:
+        self.utterance_audio.append(np.frombuffer(data, dtype=np.int16) / 32768.0)
+        self.segment_samples += len(data) // 2
+
+    def _tail_looks_final(self) -> bool:
+        """Quickly decode the end of the current utterance and check whether it ends a sentence."""
+        tail_samples = min(self.segment_samples, int(self.tail_seconds * self.rate))
+        text = self.tail_decoder(self.utterance_audio.audio[-tail_samples:].copy())
+        return self.endpointer.looks_finished(text)
+
+    def process(self, data: bytes, now: Optional[float] = None) -> Optional[Utterance]:
+        """Feed one capture chunk; returns an Utterance when the end of speech is detected."""
+        now = now if now is not None else time.time()
+        chunk_ms = (len(data) // 2) / self.rate * 1000
+        self.chunks += 1
+
+        vad_start = time.perf_counter()
+        is_speech = self.vad_backend.chunk_is_speech(data, min_ratio=0.25)
+        vad_seconds = time.perf_counter() - vad_start
+
+        if is_speech:
+            self.speech_chunks += 1
+            if not self.is_speech_active:
+                self._print(f"[cyan]Speech detected ({self.source})[/cyan]")
+                self.is_speech_active = True
+                self.utterance_ms = 0.0
+                self.vad_seconds = 0.0
+                self.start_time = now
+            elif self.silence_ms > 0:
+                # The speaker resumed: this was a pause inside the utterance
+                self.endpointer.observe_pause(self.silence_ms)
+            self.silence_ms = 0.0
+            self.tail_checked = False
+            self.utterance_ms += chunk_ms
+            self.last_speech_time = now
+            self.vad_seconds += vad_seconds
+            self._append(data)
+            return None
+
+        if not self.is_speech_active:
+            return None
+
+        # Silence inside an active utterance
+        self.vad_seconds += vad_seconds
+        self.silence_ms += chunk_ms
+        self._append(data)
+
+        required_ms = self.endpointer.required_silence_ms(self.utterance_ms / 1000)
+        finalize = self.silence_ms >= required_ms
+
+        # Optionally finalize early if the tail already reads as a finished sentence
+        if (not finalize and self.early_finalize and self.tail_decoder is not None and not self.tail_checked
+                and self.silence_ms >= self.endpointer.min_silence_ms):
+            self.tail_checked = True
+            finalize = self._tail_looks_final()
+            if finalize:
+                self._print(f"[cyan]Early finalization after {self.silence_ms:.0f} ms of silence ({self.source})[/cyan]")
+
+        if not finalize:
+            return None
+
+        self._print(f"[cyan]End of speech segment detected ({self.source})[/cyan]")
+        return self._finalize()
+
+    def snapshot(self) -> Optional[np.ndarray]:
+        """Copy of the context + audio of the utterance in progress (None between utterances)."""
+        if not self.is_speech_active:
+            return None
+        return self.utterance_audio.audio.copy()
+
+    def flush(self) -> Optional[Utterance]:
+        """End of stream: finalize the utterance in progress, if any."""
+        if not self.is_speech_active:
+            return None
+        return self._finalize()
+
+    def _finalize(self) -> Utterance:
+        features = None
+        if self.utterance_audio.feature_extractor is not None:
+            features = self.utterance_audio.features()
+
+        utterance = Utterance(
+            source=self.source,
+            audio=self.utterance_audio.audio.copy(),
+            features=features,
+            start_time=self.start_time,
+            end_time=self.last_speech_time,
+            speech_ms=self.utterance_ms,
+            vad_ms=self.vad_seconds * 1000,
+        )
+
+        # Keep some audio for context (cached features of it are kept too)
+        self.utterance_audio.trim_to_last(self.context_chunks * self.chunk)
+        self.is_speech_active = False
+        self.segment_samples = 0
+        self.silence_ms = 0.0
+        return utterance
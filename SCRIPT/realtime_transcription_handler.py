@@ -3,9 +3,22 @@
 # Provides real-time speech-to-text transcription with immediate feedback
 #
 # This module:
-# - Captures and processes audio in real-time from microphone or system audio
-# - Detects speech segments using Voice Activity Detection (WebRTC VAD)
-# - Performs immediate transcription of detected speech
+# - Captures and processes audio in real-time from microphone or system audio,
+#   or from both at once in dual-source mode (e.g. both sides of a call),
+#   through subscriptions to the shared capture hub (no PortAudio set-up on start)
+# - Detects speech segments using a pluggable Voice Activity Detection backend
+#   (WebRTC VAD, NumPy energy/spectral detector or a local ONNX model),
+#   with independent VAD and endpointing state per audio lane
+# - Ends utterances with adaptive endpointing (trailing silence adapted to the
+#   speaker's pauses, optional quick tail decode for early finalization)
+# - Performs immediate transcription of detected speech, reusing cached
+#   log-mel features when overlapping audio is decoded again
+# - Decodes utterances that finish close together (across lanes) in one
+#   batched model call, and prints them interleaved by time and tagged by source
+# - Logs the median end-of-speech-to-text latency per session
+# - Records decode times, queue wait, dropped input frames, the VAD speech
+#   ratio per lane and the model load time (metrics), and traces capture,
+#   endpointing, queueing, decoding and output of every utterance
 # - Displays transcription results as they become available
 # - Manages real-time transcription models with lazy loading
 # - Handles translation differently based on model capabilities:
@@ -17,54 +30,60 @@
 # The real-time mode offers lower latency at the cost of potentially
 # reduced accuracy compared to the long-form transcription
 
-import collections
-import numpy as np
+import queue
 import time
 import threading
-import torch
-import pyaudio
 from rich.panel import Panel
-from faster_whisper import WhisperModel
-
-# Optional dependencies
-try:
-    import webrtcvad
-    WEBRTC_VAD_AVAILABLE = True
-except ImportError:
-    WEBRTC_VAD_AVAILABLE = False
+from voice_activity_detection import create_vad_backend
+from realtime_endpointing import AdaptiveEndpointer, LatencyStats
+from realtime_segmenter import SpeechSegmenter
+from batched_decoding import BatchedWhisperDecoder
+from incremental_feature_extractor import install_feature_cache, log_mel_features
+from metrics import (REGISTRY, TRANSCRIPTION_SECONDS, AUDIO_SECONDS, QUEUE_WAIT_SECONDS, QUEUE_DEPTH,
+                     VAD_SPEECH_RATIO, MODEL_LOAD_SECONDS)
+from tracing import TRACER
+from profiling import track_model_memory
+from model_scheduler import model_cpu_threads, inference_device
 
 class RealtimeTranscriptionHandler:
-    def __init__(self, config, console, transcriber, tray, model_name=None):
+    def __init__(self, config, console, transcriber, tray, capture_hub, model_name=None):
         self.config = config
         self.console = console
         self.transcriber = transcriber
         self.tray = tray
+        self.capture_hub = capture_hub
         
         # Real-time transcription state
         self.is_running = False
-        self.thread = None
+        self.threads = []
         self.stop_event = threading.Event()
         self.beam_size_realtime = 3  # NEW: attribute to avoid "no attribute" errors
-        self.audio_buffer_lock = threading.Lock()
         
-        # Audio buffers
-        self.audio_buffer = collections.deque(maxlen=50)
-        self.frames = []
+        # Audio lanes: one per capture source, each with its own subscription and segmenter
+        self.lanes = []
+        self.utterance_queue = queue.Queue()
+        self.batch_window_ms = config.realtime_batch_window_ms  # Wait for other lanes' utterances this long
+        self.context_chunks = 20  # Chunks of previous speech kept as decoding context
         
         # Silence detection
-        self.webrtc_vad_model = None if not WEBRTC_VAD_AVAILABLE else webrtcvad.Vad(3)  # Aggression level 3 (least sensitive)
         self.silence_threshold_ms = 500  # Silent period to consider speech finished (milliseconds)
-        self.is_speech_active = False
-        self.last_speech_time = 0
+        self.tail_decode_seconds = 2.5  # Audio decoded when checking for early finalization
+        self.latency_stats = LatencyStats()
+        self.trace_session = None
         
         # Real-time model
         self.realtime_model = None
         self.realtime_model_loaded = False
         self.realtime_model_name = model_name if model_name else "deepdml/faster-whisper-large-v3-turbo-ct2"
-        
-        # Audio input stream
-        self.audio = None
-        self.stream = None
+        self.feature_provider = None
+        self.batch_decoder = None
+        REGISTRY.add_collector("realtime", self._collect_metrics)
+    
+    def _collect_metrics(self):
+        """Sampled when metrics are exported: per-lane VAD speech ratio and the utterance queue."""
+        for lane in list(self.lanes):
+            VAD_SPEECH_RATIO.set(lane["segmenter"].speech_ratio, lane=lane["source"])
+        QUEUE_DEPTH.set(self.utterance_queue.qsize(), queue="realtime_utterances")
     
     def _is_turbo_model(self):
         """Check if the current real-time model is a turbo model."""
@@ -76,8 +95,10 @@ class RealtimeTranscriptionHandler:
             self.console.print(f"[bold green]Loading real-time transcription model: {self.realtime_model_name}[/bold green]")
             
             try:
-                device = "cuda" if torch.cuda.is_available() else "cpu"
+                from faster_whisper import WhisperModel  # Imported on first use: it's slow and not needed at startup
+                device = inference_device()
                 compute_type = "float16" if device == "cuda" else "float32"
+                load_start = time.perf_counter()
 
                 # Normalize the model name if it's in the wrong format
                 model_name = self.realtime_model_name
@@ -89,12 +110,17 @@ class RealtimeTranscriptionHandler:
                 else:
                     model_name = self.realtime_model_name
                 
-                self.realtime_model = WhisperModel(
-                    model_name,
-                    device=device,
-                    compute_type=compute_type
-                )
+                with track_model_memory("realtime", model_name):
+                    self.realtime_model = WhisperModel(
+                        model_name,
+                        device=device,
+                        compute_type=compute_type,
+                        cpu_threads=model_cpu_threads(self.config)  # Shares the cores with the long-form model
+                    )
                 self.realtime_model_loaded = True
+                MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start, role="realtime", model=model_name)
+                self.feature_provider = install_feature_cache(self.realtime_model)
+                self.batch_decoder = BatchedWhisperDecoder(self.realtime_model, lexicon=self.transcriber.lexicon)
                 self.console.print("[bold green]Real-time model successfully loaded![/bold green]")
             except Exception as e:
                 self.console.print(f"[bold red]Failed to load real-time model: {e}[/bold red]")
@@ -104,79 +130,82 @@ class RealtimeTranscriptionHandler:
                 
         return True
     
-    def _process_text(self, text):
+    def _process_text(self, text, source=None, timestamp=None):
         """Display real-time transcription results."""
-        panel = Panel(
-            f"[bold magenta]Live Transcription:[/bold magenta] {text}",
-            title="Real-time",
-            border_style="cyan"
-        )
+        if source is None:
+            panel = Panel(
+                f"[bold magenta]Live Transcription:[/bold magenta] {text}",
+                title="Real-time",
+                border_style="cyan"
+            )
+        else:
+            clock = time.strftime("%H:%M:%S", time.localtime(timestamp)) if timestamp else ""
+            panel = Panel(
+                f"[bold magenta]{source.title()} [{clock}]:[/bold magenta] {text}",
+                title=f"Real-time ({source})",
+                border_style="cyan" if source == "mic" else "green"
+            )
         self.console.print(panel)
     
+    def _lane_sources(self):
+        """Capture sources as (name, input_device_index) pairs for the current configuration."""
+        if self.config.realtime_dual_source:
+            return [("mic", None), ("system", self.config.input_device_index)]
+        if self.config.realtime_use_system_audio:
+            return [("system", self.config.input_device_index)]
+        return [("mic", None)]
+    
+    def _create_lane(self, source, subscription):
+        """Create the per-lane state: its capture subscription plus an independent VAD/endpointing segmenter."""
+        vad_backend = create_vad_backend(
+            self.config.vad_backend,
+            sample_rate=self.config.rate,
+            aggressiveness=3,  # Aggression level 3 (least sensitive)
+            model_path=self.config.vad_onnx_model_path,
+            console=self.console
+        )
+        endpointer = AdaptiveEndpointer(
+            default_silence_ms=self.silence_threshold_ms,
+            adaptive=self.config.realtime_adaptive_endpointing
+        )
+        segmenter = SpeechSegmenter(
+            source,
+            vad_backend,
+            endpointer,
+            rate=self.config.rate,
+            chunk=self.config.chunk,
+            feature_extractor=self.realtime_model.feature_extractor if self.realtime_model_loaded else None,
+            context_chunks=self.context_chunks,
+            early_finalize=self.config.realtime_early_finalize_decode,
+            tail_decoder=lambda audio: self._transcribe_audio(audio, beam_size=1),
+            tail_seconds=self.tail_decode_seconds,
+            console=self.console
+        )
+        return {"source": source, "subscription": subscription, "segmenter": segmenter}
+    
     def _initialize_audio(self):
-        """Initialize the audio input stream."""
-        self.audio = pyaudio.PyAudio()
+        """Subscribe one lane per capture source to the capture hub."""
+        self.lanes = []
 
-        # Set up audio parameters
-        stream_params = {
-            'format': self.config.format,
-            'channels': self.config.channels,
-            'rate': self.config.rate,
-            'input': True,
-            'frames_per_buffer': self.config.chunk,
-            'input_device_index': self.config.input_device_index if self.config.realtime_use_system_audio else None
-        }
+        for source, device_index in self._lane_sources():
+            try:
+                subscription = self.capture_hub.subscribe(device_index, f"realtime-{source}")
+            except Exception as e:
+                self.console.print(f"[bold red]Failed to open {source} audio stream: {e}[/bold red]")
+                continue
+            self.lanes.append(self._create_lane(source, subscription))
 
-        self.stream = self.audio.open(**stream_params)
-        return True
+        return len(self.lanes) > 0
     
     def _cleanup_audio(self):
-        """Clean up audio resources."""
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-            self.stream = None
-            
-        if self.audio:
-            self.audio.terminate()
-            self.audio = None
+        """Release the lanes' capture subscriptions (the hub closes devices nobody else uses)."""
+        for lane in self.lanes:
+            if lane["subscription"] is not None:
+                lane["subscription"].close()
+                lane["subscription"] = None
     
-    def _is_speech(self, audio_chunk):
-        """Detect if audio chunk contains speech using WebRTC VAD."""
-        if not WEBRTC_VAD_AVAILABLE or not self.webrtc_vad_model:
-            return True  # If VAD not available, treat all audio as speech
-        
-        # WebRTC VAD expects specific frame durations (10, 20, or 30ms)
-        # We need to ensure our chunk size is compatible
-        frame_duration_ms = 30  # 30ms frames work well for WebRTC VAD
-        
-        # Calculate required sample size for given duration
-        required_samples = int(self.config.rate * frame_duration_ms / 1000)
-        
-        # Skip if chunk is too small
-        if len(audio_chunk) < required_samples * 2:  # *2 because 16-bit = 2 bytes per sample
-            return False
-        
-        # Process in 30ms frames
-        frames_to_check = []
-        for i in range(0, len(audio_chunk) - required_samples * 2, required_samples * 2):
-            frames_to_check.append(audio_chunk[i:i + required_samples * 2])
-            
-        # Consider chunk to contain speech if at least 25% of frames have speech
-        speech_frames = 0
-        for frame in frames_to_check:
-            if len(frame) == required_samples * 2:  # Ensure correct frame size
-                try:
-                    if self.webrtc_vad_model.is_speech(frame, self.config.rate):
-                        speech_frames += 1
-                except Exception:
-                    continue
-        
-        speech_ratio = speech_frames / len(frames_to_check) if frames_to_check else 0
-        return speech_ratio > 0.25  # At least 25% of frames contain speech
-        
     def start(self):
-        """Start real-time transcription in a separate thread."""
+        """Start real-time transcription in separate capture and decode threads."""
         if self.is_running:
             self.console.print("[bold yellow]Real-time transcription already running![/bold yellow]")
             return
@@ -193,19 +222,29 @@ class RealtimeTranscriptionHandler:
         # Initialize audio
         if not self._initialize_audio():
             self.console.print("[bold red]Failed to initialize audio input.[/bold red]")
+            self._cleanup_audio()
+            self.tray.set_color('gray', self.config.send_enter)
             return
         
         # Reset state
-        self.is_speech_active = False
-        self.last_speech_time = 0
+        self.latency_stats.reset()
+        self.trace_session = TRACER.new_session("realtime")
+        self.batch_window_ms = self.config.realtime_batch_window_ms
+        self.utterance_queue = queue.Queue()
         
-        # Start the transcription thread
+        # Start one capture thread per lane and a shared decode thread
         self.is_running = True
         self.stop_event.clear()
-        self.thread = threading.Thread(target=self._transcription_loop, daemon=True)
-        self.thread.start()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, args=(lane,), daemon=True)
+            for lane in self.lanes
+        ]
+        self.threads.append(threading.Thread(target=self._decode_loop, daemon=True))
+        for t in self.threads:
+            t.start()
         
-        self.console.print("[bold green]Real-time transcription started![/bold green]")
+        sources = " + ".join(lane["source"] for lane in self.lanes)
+        self.console.print(f"[bold green]Real-time transcription started! ({sources})[/bold green]")
     
     def stop(self):
         """Stop real-time transcription."""
@@ -215,21 +254,24 @@ class RealtimeTranscriptionHandler:
         
         self.console.print("[bold yellow]Stopping real-time transcription...[/bold yellow]")
         
-        # Signal the thread to stop
+        # Signal the threads to stop
         self.is_running = False
         self.stop_event.set()
         
-        # Clean up audio resources
+        # Wait for the capture threads (they queue the utterance in progress), then let the decode
+        # thread finish everything queued before the end marker, then release the streams
+        capture_threads, decode_thread = self.threads[:-1], self.threads[-1]
+        for t in capture_threads:
+            t.join(timeout=2)
+        self.utterance_queue.put(None)
+        decode_thread.join()
+        self.threads = []
         self._cleanup_audio()
         
-        # Wait for the thread to finish
-        if self.thread:
-            self.thread.join(timeout=2)
-            self.thread = None
-        
         # Update tray icon
         self.tray.set_color('gray', self.config.send_enter)
         
+        self.console.print(f"[cyan]End-of-speech-to-text latency: {self.latency_stats.summary()}[/cyan]")
         self.console.print("[bold green]Real-time transcription stopped.[/bold green]")
     
     def toggle(self):
@@ -249,108 +291,162 @@ class RealtimeTranscriptionHandler:
         # Update the tray icon to reflect the change
         self.tray.flash_white('gray', self.config.send_enter)
     
-    def _transcription_loop(self):
-        """Main loop for real-time transcription."""
+    def _transcription_task(self):
+        """Determine the transcription task based on language."""
+        if self.config.realtime_language not in ["en", "el"]:
+            return "translate"
+        return "transcribe"
+    
+    def _uses_realtime_model(self):
+        """Whether utterances are decoded by the real-time model (rather than the long-form fallback)."""
+        # Turbo models can't translate, so translation is delegated to the long-form model
+        if self._is_turbo_model() and self._transcription_task() != "transcribe":
+            return False
+        return self.realtime_model_loaded
+    
+    def _transcribe_audio(self, audio_float, beam_size=None, features=None):
+        """Transcribe a float32 audio buffer with the real-time model (or the main model as fallback).
+
+        `features` are precomputed log-mel features of exactly `audio_float`; when
+        given they are reused instead of recomputing the spectrogram.
+        """
+        beam_size = beam_size if beam_size else self.beam_size_realtime
+
+        if not self._uses_realtime_model():
+            return self.transcriber.transcribe_audio_data(audio_float)
+
         try:
-            accumulated_speech = []
-            current_segment = []
-            silence_start_time = 0
-            
-            while self.is_running and not self.stop_event.is_set():
-                # Read audio data
-                try:
-                    data = self.stream.read(self.config.chunk, exception_on_overflow=False)
-                    
-                    # Check if this chunk contains speech
-                    contains_speech = self._is_speech(data)
-                    current_time = time.time()
-                    
-                    if contains_speech:
-                        # Speech detected
-                        if not self.is_speech_active:
-                            self.console.print("[cyan]Speech detected[/cyan]")
-                            self.is_speech_active = True
-                            silence_start_time = 0
-                        with self.audio_buffer_lock:
-                            current_segment.append(data)
-                    else:
-                        # No speech in this chunk
-                        if self.is_speech_active:
-                            if silence_start_time == 0:
-                                silence_start_time = current_time
-                            with self.audio_buffer_lock:
-                                current_segment.append(data)
-                            
-                            if (current_time - silence_start_time) * 1000 >= self.silence_threshold_ms:
-                                self.console.print("[cyan]End of speech segment detected[/cyan]")
-                                self.is_speech_active = False
-                                
-                                if current_segment:
-                                    with self.audio_buffer_lock:
-                                        accumulated_speech.extend(current_segment)
-                                        current_segment = []
-                                    
-                                    # Convert audio data to float32 format
-                                    audio_data = np.frombuffer(b''.join(accumulated_speech), dtype=np.int16)
-                                    audio_float = audio_data.astype(np.float32) / 32768.0
-                                    
-                                    # Determine the transcription task based on language
-                                    transcription_task = "transcribe"
-                                    if self.config.realtime_language not in ["en", "el"]:
-                                        transcription_task = "translate"
+            if features is None:
+                features = log_mel_features(self.realtime_model.feature_extractor, audio_float)
+
+            with self.feature_provider.provide(audio_float, features):
+                segments, info = self.realtime_model.transcribe(
+                    audio_float,
+                    language=self.config.realtime_language,
+                    beam_size=beam_size,
+                    task=self._transcription_task(),
+                    suppress_tokens=self.batch_decoder.suppress_tokens_for()
+                )
+                return "".join(segment.text for segment in segments)
+        except Exception as e:
+            self.console.print(f"[red]Real-time model transcription error: {e}[/red]")
+            # Fallback to long-form model on error
+            return self.transcriber.transcribe_audio_data(audio_float)
+    
+    def _transcribe_utterances(self, utterances):
+        """Decode a group of utterances, batching them into one model call when possible."""
+        if len(utterances) == 1 or not self._uses_realtime_model():
+            return [self._transcribe_audio(u.audio, features=u.features) for u in utterances]
 
-                                    if self._is_turbo_model():
-                                        # Turbo models can't translate, so only use them for transcription
-                                        if transcription_task == "transcribe" and self.realtime_model_loaded:
-                                            try:
-                                                segments, info = self.realtime_model.transcribe(
-                                                    audio_float,
-                                                    language=self.config.realtime_language,
-                                                    beam_size=self.beam_size_realtime,
-                                                    task="transcribe"  # Explicitly set for transcription
-                                                )
-                                                text = "".join(segment.text for segment in segments)
-                                            except Exception as e:
-                                                self.console.print(f"[red]Real-time model transcription error: {e}[/red]")
-                                                # Fallback to long-form model on error
-                                                text = self.transcriber.transcribe_audio_data(audio_float)
-                                        else:
-                                            # Use long-form model for translation since turbo doesn't support it
-                                            text = self.transcriber.transcribe_audio_data(audio_float)
-                                    else:
-                                        # Non-turbo models can handle both transcription and translation
-                                        if self.realtime_model_loaded:
-                                            try:
-                                                segments, info = self.realtime_model.transcribe(
-                                                    audio_float,
-                                                    language=self.config.realtime_language,
-                                                    beam_size=self.beam_size_realtime,
-                                                    task=transcription_task
-                                                )
-                                                text = "".join(segment.text for segment in segments)
-                                            except Exception as e:
-                                                self.console.print(f"[red]Real-time model transcription error: {e}[/red]")
-                                                # Fallback to main transcriber on error
-                                                text = self.transcriber.transcribe_audio_data(audio_float)
-                                        else:
-                                            # Use main transcriber as fallback
-                                            text = self.transcriber.transcribe_audio_data(audio_float)
-                                    
-                                    if text:
-                                        self._process_text(text)
-                                    
-                                    # Keep some frames for context
-                                    keep_frames = min(20, len(accumulated_speech))
-                                    with self.audio_buffer_lock:
-                                        accumulated_speech = accumulated_speech[-keep_frames:] if keep_frames > 0 else []
-                    
-                    time.sleep(0.01)
-                    
-                except Exception as e:
-                    self.console.print(f"[bold red]Error reading audio: {e}[/bold red]")
-                    time.sleep(0.1)
+        try:
+            results = self.batch_decoder.transcribe_batch(
+                [u.audio for u in utterances],
+                features=[u.features for u in utterances],
+                language=self.config.realtime_language,
+                task=self._transcription_task(),
+                beam_size=self.beam_size_realtime
+            )
+            return [r.text for r in results]
+        except Exception as e:
+            self.console.print(f"[red]Batched real-time transcription error: {e}. Decoding one by one.[/red]")
+            return [self._transcribe_audio(u.audio, features=u.features) for u in utterances]
+    
+    def _capture_loop(self, lane):
+        """Read one lane's stream and queue every finished utterance for decoding."""
+        segmenter = lane["segmenter"]
+        segmenter.reset()
+        subscription = lane["subscription"]
+
+        while self.is_running and not self.stop_event.is_set():
+            # Read audio data
+            try:
+                data = subscription.read()
+                if data is None:
+                    if subscription.closed:
+                        self.console.print(f"[bold red]The {lane['source']} input stopped.[/bold red]")
+                        break
+                    continue
+                utterance = segmenter.process(data, now=time.time())
+                if utterance is not None:
+                    self._queue_utterance(lane, utterance)
                 
+            except Exception as e:
+                if not self.is_running:
+                    break
+                self.console.print(f"[bold red]Error reading {lane['source']} audio: {e}[/bold red]")
+                time.sleep(0.1)
+
+        # Stopped or the input ended: speech still in progress is decoded too
+        try:
+            utterance = segmenter.flush()
         except Exception as e:
-            self.console.print(f"[bold red]Error in real-time transcription: {e}[/bold red]")
-        finally:
-            self._cleanup_audio()
\ No newline at end of file
+            self.console.print(f"[bold red]Error finishing the {lane['source']} utterance: {e}[/bold red]")
+            utterance = None
+        if utterance is not None:
+            self._queue_utterance(lane, utterance)
+
+    def _queue_utterance(self, lane, utterance):
+        """Hand a finished utterance to the decode thread."""
+        if TRACER.enabled:
+            finalized = time.time()
+            TRACER.record("capture", utterance.start_time, utterance.end_time, "realtime", self.trace_session,
+                          source=lane["source"], speech_ms=round(utterance.speech_ms),
+                          vad_ms=round(utterance.vad_ms, 2))
+            # Trailing silence until the end of speech was decided
+            TRACER.record("endpoint", utterance.end_time, finalized, "realtime", self.trace_session,
+                          source=lane["source"])
+        self.utterance_queue.put(utterance)
+    
+    def _decode_loop(self):
+        """Decode queued utterances, batching those that finish within the batch window.
+
+        Runs until stop() queues None: the utterances queued before it are still decoded.
+        """
+        dual = len(self.lanes) > 1
+        finished = False
+
+        while not finished:
+            batch = [self.utterance_queue.get()]
+            if batch[0] is None:
+                break
+
+            # Give the other lanes a moment to finish their utterances too
+            if dual:
+                deadline = time.time() + self.batch_window_ms / 1000
+                while len(batch) < len(self.lanes) * 2:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        utterance = self.utterance_queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if utterance is None:
+                        finished = True  # Decode this batch, then stop
+                        break
+                    batch.append(utterance)
+
+            decode_start = time.perf_counter()
+            wall_start = time.time()
+            for utterance in batch:
+                QUEUE_WAIT_SECONDS.observe(decode_start - utterance.finalized, queue="realtime_utterances")
+                TRACER.record("queue", wall_start - (decode_start - utterance.finalized), wall_start, "realtime",
+                              self.trace_session, source=utterance.source)
+            try:
+                with TRACER.span("decode", "realtime", self.trace_session, items=len(batch)):
+                    texts = self._transcribe_utterances(batch)
+                TRANSCRIPTION_SECONDS.observe(time.perf_counter() - decode_start, pipeline="realtime")
+                AUDIO_SECONDS.inc(sum(len(u.audio) for u in batch) / self.config.rate, pipeline="realtime")
+            except Exception as e:
+                self.console.print(f"[bold red]Error in real-time transcription: {e}[/bold red]")
+                continue
+
+            # Interleave by time, tagged by source when several lanes are active
+            with TRACER.span("output", "realtime", self.trace_session, items=len(batch)):
+                for utterance, text in sorted(zip(batch, texts), key=lambda pair: pair[0].start_time):
+                    if text:
+                        if dual:
+                            self._process_text(text, source=utterance.source, timestamp=utterance.start_time)
+                        else:
+                            self._process_text(text)
+                    self.latency_stats.record(time.time() - utterance.end_time)
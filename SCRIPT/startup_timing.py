@@ -0,0 +1,107 @@
+# startup_timing.py
+#
+# Where the time goes between launching the app and the first hotkey working
+#
+# This module:
+# - Times the startup phases (imports, configuration, tray, model load and
+#   warm-up, audio, command server, hotkey script, ...) on whichever thread
+#   runs them: the model loads in the background while the rest comes up, so
+#   phases overlap and the report shows their start offsets
+# - Marks milestones: commands accepted, hotkeys ready, model ready
+# - Reports as text (printed once the model is ready), as a dict (STATUS
+#   command) and as metrics; with tracing enabled the phases are also written
+#   as the spans of a "startup" session
+#
+# Offsets are seconds since the process started (from psutil), so the
+# interpreter start and the imports main.py runs before this module are
+# counted too; without psutil they count from the import of this module
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+from metrics import STARTUP_PHASE_SECONDS, STARTUP_MILESTONE_SECONDS
+from tracing import TRACER
+
+
+class StartupTimer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.origin_wall = time.time()
+        self.process_start = self.origin_wall
+        if PSUTIL_AVAILABLE:
+            try:
+                self.process_start = min(psutil.Process().create_time(), self.origin_wall)
+            except psutil.Error:
+                pass
+        self.phases: List[Dict] = []
+        self.milestones: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.traced = False
+
+    def _offset(self, perf: float) -> float:
+        """Seconds since the process started for a time.perf_counter() value."""
+        return (self.origin_wall - self.process_start) + (perf - self.origin)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the with-block as a startup phase (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.phases.append({"phase": name, "start": round(self._offset(start), 3),
+                                    "seconds": round(seconds, 3), "thread": threading.current_thread().name})
+            STARTUP_PHASE_SECONDS.set(seconds, phase=name)
+
+    def mark(self, milestone: str) -> None:
+        """Record that a milestone was reached now (the first time counts)."""
+        at = self._offset(time.perf_counter())
+        with self.lock:
+            if milestone in self.milestones:
+                return
+            self.milestones[milestone] = round(at, 3)
+        STARTUP_MILESTONE_SECONDS.set(at, milestone=milestone)
+
+    def report(self) -> Dict:
+        with self.lock:
+            phases = sorted(self.phases, key=lambda p: p["start"])
+            milestones = dict(self.milestones)
+        before = round(self._offset(self.origin), 3)
+        if before > 0:
+            phases.insert(0, {"phase": "interpreter", "start": 0.0, "seconds": before, "thread": "MainThread"})
+        return {"phases": phases, "milestones": milestones}
+
+    def render(self) -> str:
+        """The report as aligned text lines (phases in start order, then the milestones)."""
+        report = self.report()
+        lines = [f"{'start':>8} {'duration':>9}  {'phase':<24} thread"]
+        for p in report["phases"]:
+            lines.append(f"{p['start']:7.3f}s {p['seconds']:8.3f}s  {p['phase']:<24} {p['thread']}")
+        lines.append("")
+        for milestone, at in sorted(report["milestones"].items(), key=lambda item: item[1]):
+            lines.append(f"{milestone.capitalize()} after {at:.2f} s")
+        return "\n".join(lines)
+
+    def trace(self) -> None:
+        """Write the phases as spans of one "startup" session (once, if tracing is enabled)."""
+        if not TRACER.enabled or self.traced:
+            return
+        self.traced = True
+        session = TRACER.new_session("startup")
+        for p in self.report()["phases"]:
+            start = self.process_start + p["start"]
+            TRACER.record(p["phase"], start, start + p["seconds"], pipeline="startup", session=session,
+                          thread=p["thread"])
+
+
+STARTUP = StartupTimer()
@@ -0,0 +1,320 @@
+# static_audio_stream.py
+#
+# Bounded-memory audio sources and streaming segmentation for static files
+#
+# This module:
+# - Decodes any media file through an ffmpeg pipe (16 kHz mono s16le) and
+#   yields fixed-size blocks, without writing an intermediate WAV file
+# - Memory-maps WAV files that are already 16 kHz mono 16-bit and yields
+#   views of the map (no copy, no temp file, even for multi-GB recordings)
+# - Runs VAD on each block as it arrives (carrying partial frames across
+#   block boundaries), pads speech runs and bridges short pauses, and packs
+#   the speech into ~30 s segments that are emitted as soon as they are
+#   complete
+#
+# Only the current block and the segment under construction are held in
+# memory, so peak memory is constant and transcription of the first segments
+# can start while the rest of the file is still being decoded
+
+import os
+import itertools
+import struct
+import subprocess
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from static_segmentation import SpeechSegment, SpeechFlagSmoother, quietest_cut
+
+
+class FFmpegPCMReader:
+    """Decodes a media file to 16-bit mono PCM through an ffmpeg pipe."""
+
+    def __init__(self, path: str, rate: int = 16000, block_samples: int = 160000):
+        self.path = path
+        self.rate = rate
+        self.block_samples = block_samples
+        self.process = None
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        """Yield int16 blocks of block_samples (the last one may be shorter)."""
+        process = subprocess.Popen(
+            ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", self.path,
+             "-vn", "-ac", "1", "-ar", str(self.rate), "-f", "s16le", "-"],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self.process = process
+        block_bytes = self.block_samples * 2
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+
+            stderr = process.stderr.read().decode("utf-8", errors="replace").strip()
+            if process.wait() != 0 and self.process is process:
+                raise RuntimeError(f"ffmpeg failed: {stderr or 'unknown error'}")
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop decoding (also used to abort a job from another thread)."""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def wav_data_layout(path: str, rate: int = 16000) -> Optional[Tuple[int, int]]:
+    """(byte offset, sample count) of the data chunk of a 16-bit mono PCM WAV at `rate`, else None.
+
+    Walks the RIFF chunks directly (the wave module cannot report the data
+    offset), so the samples can be memory-mapped in place.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                return None
+            file_size = os.fstat(f.fileno()).st_size
+            conforming = False
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, chunk_size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+                if chunk_id == b'fmt ':
+                    fmt = f.read(chunk_size)
+                    audio_format, channels, sample_rate = struct.unpack('<HHI', fmt[:8])
+                    bits = struct.unpack('<H', fmt[14:16])[0]
+                    if audio_format == 0xFFFE and len(fmt) >= 26:
+                        audio_format = struct.unpack('<H', fmt[24:26])[0]  # WAVE_FORMAT_EXTENSIBLE sub-format
+                    conforming = audio_format == 1 and channels == 1 and sample_rate == rate and bits == 16
+                    if chunk_size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    if not conforming:
+                        return None
+                    offset = f.tell()
+                    # Recorders that were cut off may leave a size larger than the file
+                    data_bytes = min(chunk_size, file_size - offset)
+                    return offset, data_bytes // 2
+                else:
+                    f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def is_conforming_wav(path: str, rate: int = 16000) -> bool:
+    """True if the file is a WAV that can be used without conversion."""
+    return wav_data_layout(path, rate) is not None
+
+
+class MappedWavReader:
+    """Memory-maps the data chunk of a conforming WAV and yields views of it (no copies, no temp files)."""
+
+    def __init__(self, path: str, rate: int = 16000, block_samples: int = 160000):
+        layout = wav_data_layout(path, rate)
+        if layout is None:
+            raise ValueError(f"Not a {rate} Hz mono 16-bit PCM WAV file: {path}")
+        offset, n_samples = layout
+        self.path = path
+        self.rate = rate
+        self.block_samples = block_samples
+        self.data_offset = offset
+        self.samples = np.memmap(path, dtype='<i2', mode='r', offset=offset, shape=(n_samples,)) \
+            if n_samples else np.zeros(0, dtype=np.int16)
+        self.closed = False
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        samples = self.samples
+        for start in range(0, len(samples), self.block_samples):
+            if self.closed:
+                break
+            yield samples[start:start + self.block_samples]
+
+    def close(self) -> None:
+        # The map is released once the last view of it (queued segments) is gone
+        self.closed = True
+
+
+class StreamingSpeechPacker:
+    """Runs VAD block by block and emits ~30 s speech segments as soon as they are complete.
+
+    Frame decisions are padded and short pauses bridged (SpeechFlagSmoother),
+    so audio is only committed pad + hangover frames behind the input; the
+    uncommitted tail is kept as views of the input blocks.
+    """
+
+    def __init__(self, vad=None, rate: int = 16000, target_seconds: float = 30.0,
+                 pad_ms: float = 0.0, hangover_ms: float = 0.0):
+        self.vad = vad                                    # None keeps all audio (no speech found / no VAD)
+        self.rate = rate
+        self.max_samples = int(target_seconds * rate)
+        self.frame = vad.frame_samples if vad is not None else rate // 100
+
+        frame_ms = self.frame / rate * 1000
+        self.smoother = SpeechFlagSmoother(int(round(pad_ms / frame_ms)), int(round(hangover_ms / frame_ms)))
+
+        self.total_samples = 0                            # Samples consumed so far (original timeline)
+        self.remainder = np.zeros(0, dtype=np.int16)      # Partial frame carried to the next block
+        self.held = []                                    # Views of full frames not yet committed
+        self.held_start = 0                               # Sample position of held[0]
+        self.committed_frames = 0
+        self.next_index = 0
+
+        # Segment under construction: closed runs plus the currently open run
+        self.pending_ranges = []
+        self.pending_audio = []
+        self.pending_samples = 0
+        self.open_start = None
+        self.open_audio = []
+        self.open_samples = 0
+
+    def _emit(self, ranges, audio_parts) -> SpeechSegment:
+        # Convert straight from the (possibly memory-mapped) int16 views into one float32 buffer
+        audio = np.empty(sum(len(part) for part in audio_parts), dtype=np.float32)
+        position = 0
+        for part in audio_parts:
+            np.multiply(part, 1.0 / 32768.0, out=audio[position:position + len(part)], casting='unsafe')
+            position += len(part)
+        segment = SpeechSegment(index=self.next_index, ranges=list(ranges), audio=audio)
+        self.next_index += 1
+        return segment
+
+    def _flush_pending(self, out: List[SpeechSegment]) -> None:
+        if self.pending_ranges:
+            out.append(self._emit(self.pending_ranges, self.pending_audio))
+        self.pending_ranges, self.pending_audio, self.pending_samples = [], [], 0
+
+    def _close_run(self, end: int, out: List[SpeechSegment]) -> None:
+        """The open run ended at sample `end`: add it to the pending segment."""
+        if self.open_start is None:
+            return
+        if self.pending_samples + self.open_samples > self.max_samples:
+            self._flush_pending(out)
+        self.pending_ranges.append((self.open_start, end))
+        self.pending_audio.extend(self.open_audio)
+        self.pending_samples += self.open_samples
+        self.open_start, self.open_audio, self.open_samples = None, [], 0
+
+    def _split_open_run(self, out: List[SpeechSegment]) -> None:
+        """An uninterrupted run grew past one segment: cut it at a quiet point."""
+        self._flush_pending(out)
+        audio = np.concatenate(self.open_audio)
+        while len(audio) > self.max_samples:
+            cut = quietest_cut(audio, self.max_samples, self.rate)
+            out.append(self._emit([(self.open_start, self.open_start + cut)], [audio[:cut]]))
+            self.open_start += cut
+            audio = audio[cut:]
+        self.open_audio, self.open_samples = [audio], len(audio)
+
+    def _take(self, start: int, end: int) -> List[np.ndarray]:
+        """Views of the held audio covering samples [start, end)."""
+        parts = []
+        position = self.held_start
+        for view in self.held:
+            lo, hi = max(start, position), min(end, position + len(view))
+            if lo < hi:
+                parts.append(view[lo - position:hi - position])
+            position += len(view)
+            if position >= end:
+                break
+        return parts
+
+    def _release(self, upto: int) -> None:
+        """Drop held views that lie entirely before sample `upto`."""
+        while self.held and self.held_start + len(self.held[0]) <= upto:
+            self.held_start += len(self.held.pop(0))
+
+    def _advance(self, flags: np.ndarray) -> List[SpeechSegment]:
+        """Commit the next smoothed frame decisions: extend, close or open speech runs."""
+        out = []
+        first = self.committed_frames * self.frame
+        n_frames = len(flags)
+        padded = np.concatenate([[self.open_start is not None], flags, [False]]).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded)).tolist()
+        was_open = self.open_start is not None
+        position = 0
+        for edge in edges:
+            if was_open:
+                # Speech from `position` up to this edge belongs to the open run
+                start, end = first + position * self.frame, first + edge * self.frame
+                for part in self._take(start, end):
+                    self.open_audio.append(part)
+                    self.open_samples += len(part)
+                # Split first: the run may have grown past one segment and ended in the same block
+                if self.open_samples > self.max_samples:
+                    self._split_open_run(out)
+                if edge < n_frames:
+                    self._close_run(end, out)
+                    was_open = False
+            else:
+                self.open_start = first + edge * self.frame
+                was_open = True
+            position = edge
+
+        self.committed_frames += n_frames
+        self._release(self.committed_frames * self.frame)
+        return out
+
+    def feed(self, block: np.ndarray, flags: Optional[np.ndarray] = None) -> List[SpeechSegment]:
+        """Consume one int16 block; returns the segments completed by it.
+
+        `flags` are the raw VAD decisions of the block's full frames when they
+        were computed elsewhere (e.g. by ShardedVAD); otherwise VAD runs here.
+        """
+        samples = np.concatenate([self.remainder, block]) if len(self.remainder) else block
+        n_frames = len(samples) // self.frame
+        if flags is None:
+            if self.vad is not None:
+                flags = self.vad.speech_flags(samples[:n_frames * self.frame])
+            else:
+                flags = np.ones(n_frames, dtype=bool)
+        if n_frames:
+            self.held.append(samples[:n_frames * self.frame])
+        self.remainder = samples[n_frames * self.frame:].copy()
+        self.total_samples += len(block)
+        return self._advance(self.smoother.push(flags))
+
+    def finish(self) -> List[SpeechSegment]:
+        """Flush the remaining speech at the end of the stream."""
+        out = self._advance(self.smoother.finish())
+        if self.vad is None and len(self.remainder):
+            # Without VAD the partial last frame is audio too
+            if self.open_start is None:
+                self.open_start = self.total_samples - len(self.remainder)
+            self.open_audio.append(self.remainder)
+            self.open_samples += len(self.remainder)
+            self.remainder = self.remainder[:0]
+        if self.open_start is not None:
+            if self.open_samples > self.max_samples:
+                self._split_open_run(out)
+            self._close_run(self.open_start + self.open_samples, out)
+        self._flush_pending(out)
+        return out
+
+    def stream(self, blocks: Iterator[np.ndarray],
+               flags: Optional[Iterator[np.ndarray]] = None) -> Iterator[SpeechSegment]:
+        """Convenience generator: feed all blocks (with precomputed flags, if given) and yield every segment."""
+        flags = flags if flags is not None else itertools.repeat(None)
+        for block, block_flags in zip(blocks, flags):
+            for segment in self.feed(block, block_flags):
+                yield segment
+        for segment in self.finish():
+            yield segment
+
+
+def open_block_reader(path: str, rate: int = 16000, block_seconds: float = 10.0, align: int = 1):
+    """Pick the cheapest bounded-memory reader for a file.
+
+    Blocks are a multiple of `align` samples (the VAD frame), so no partial
+    frame has to be copied across block boundaries.
+    """
+    block_samples = max(align, int(rate * block_seconds) // align * align)
+    if is_conforming_wav(path, rate):
+        return MappedWavReader(path, rate, block_samples)
+    return FFmpegPCMReader(path, rate, block_samples)
@@ -4,36 +4,63 @@
 #
 # This module:
 # - Handles selecting audio/video files via a file dialog
-# - Converts various media formats to 16kHz mono WAV using FFmpeg
-# - Applies Voice Activity Detection (WebRTC VAD) to remove silence
-# - Transcribes the processed audio using the transcription engine
-# - Saves transcription results alongside the original file
-# - Manages temporary files and resource cleanup
-# - Provides methods to abort transcription in progress
+# - Streams any media format as 16kHz mono PCM from an FFmpeg pipe (or reads
+#   conforming WAV files directly) in bounded blocks, without temp files
+# - Applies Voice Activity Detection (pluggable VAD backend) block by block,
+#   sharded across a process pool for memory-mapped WAV files, with padding
+#   and hangover around the speech runs
+# - Cuts the speech into ~30 s segments at VAD boundaries and transcribes them
+#   while decoding continues (batched model calls across the model's workers)
+# - Runs at background priority next to recording and real-time transcription:
+#   while one of them is active, each model call takes a single segment, so the
+#   interactive pipeline gets the model at the next segment boundary
+# - Reassembles the segment texts in order and reports the real-time factor
+# - Saves transcription results alongside the original file as text and,
+#   on request, as SRT/VTT/JSON with timestamps mapped back to the original
+#   file time through the VAD segment map
+# - Checkpoints finished segments so a crashed or reset job resumes where
+#   it stopped when the same file is submitted again
+# - Cleans up temporary files left by older versions
+# - Cancels transcription in progress cooperatively on every platform
+#   (cancellation token checked between blocks and model calls)
 # - Updates system tray to indicate transcription status
+# - Records batch transcription times, segment queue wait and audio
+#   processed (metrics), and traces reading + VAD per segment, queueing,
+#   transcription per batch and writing the outputs (one trace session per job)
 #
 # This component allows transcription of existing media files
 # rather than just real-time microphone input
 
 import os
-import sys
 import threading
-import subprocess
-import shutil
-import wave
-import ctypes
+import queue
 import time
-from typing import Optional
-import tkinter
-from tkinter import filedialog
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from rich.panel import Panel
+from voice_activity_detection import create_vad_backend
+from static_segmentation import SpeechSegment
+from static_audio_stream import FFmpegPCMReader, MappedWavReader, StreamingSpeechPacker, open_block_reader
+from parallel_vad import ShardedVAD
+from transcript_formats import TIMED_FORMATS, TimedText, parse_formats, write_transcripts
+from job_control import CancellationToken
+from job_checkpoint import JobCheckpoint
+from metrics import TRANSCRIPTION_SECONDS, AUDIO_SECONDS, QUEUE_WAIT_SECONDS
+from model_scheduler import BACKGROUND
+from tracing import TRACER
+
+
+@dataclass
+class StaticJobResult:
+    """Outcome of one transcribed file."""
+    file_path: str
+    text: str
+    outputs: List[str]
+    audio_seconds: float
+    speech_seconds: float
+    elapsed: float
+    segments: int
 
-# Optional dependencies
-try:
-    import webrtcvad
-    WEBRTC_VAD_AVAILABLE = True
-except ImportError:
-    WEBRTC_VAD_AVAILABLE = False
 
 class StaticFileProcessor:
     def __init__(self, config, console, transcriber, tray):
@@ -56,71 +83,42 @@ class StaticFileProcessor:
 
         self.transcription_thread = None
         self.static_transcription_lock = threading.Lock()
-        self.abort_static_transcription = False
+        self.cancel_token = None  # CancellationToken of the running job
+    
+    def _set_tray(self, color: str) -> None:
+        """Show static progress on the tray unless recording/real-time (which own the icon) is active."""
+        if not self.transcriber.scheduler.interactive_active():
+            self.tray.set_color(color, self.config.send_enter)
     
     def is_transcribing(self) -> bool:
-        """Check if a static transcription is currently in progress."""
-        return self.transcription_thread is not None and self.transcription_thread.is_alive()
-
-    def _terminate_thread(self, thread):
-        """Force terminate a thread using ctypes (Windows-specific solution)."""
-        if not thread.is_alive():
-            return
-            
-        # Use ctypes to terminate thread (Windows-specific)
-        if sys.platform == "win32":
-            thread_id = thread.ident
-            if thread_id:
-                res = ctypes.pythonapi.PyThreadState_SetAsyncExc(
-                    ctypes.c_long(thread_id), 
-                    ctypes.py_object(SystemExit)
-                )
-                if res > 1:
-                    # If more than one thread was affected, undo the damage
-                    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_long(thread_id), None)
-                    self.console.print("[red]Failed to terminate thread correctly.[/red]")
-                return
-        
-        self.console.print("[red]Thread termination not supported on this platform.[/red]")
+        """Check if a static transcription is currently in progress (a cancelled job no longer counts)."""
+        return (self.transcription_thread is not None and self.transcription_thread.is_alive()
+                and not (self.cancel_token is not None and self.cancel_token.cancelled))
     
     def request_abort(self) -> None:
-        """Immediately abort any in-progress static transcription."""
+        """Cancel any in-progress static transcription (takes effect after the model call in flight)."""
         with self.static_transcription_lock:
             if not self.is_transcribing():
                 self.console.print("[yellow]No static transcription in progress to abort.[/yellow]")
                 return
-                
-            # Set the abort flag
-            self.abort_static_transcription = True
             
             # Immediately set the tray icon to gray to indicate we're stopping
-            self.tray.flash_white('gray', self.config.send_enter)
+            if not self.transcriber.scheduler.interactive_active():
+                self.tray.flash_white('gray', self.config.send_enter)
             
-            # Store a reference to the thread for forced termination
-            thread_to_terminate = self.transcription_thread
+            thread = self.transcription_thread
+            token = self.cancel_token
         
         self.console.print("[bold yellow]Static transcription abort requested.[/bold yellow]")
-        self.console.print("[bold yellow]Forcing immediate termination of transcription...[/bold yellow]")
         
-        # First try to terminate the thread forcibly
-        self._terminate_thread(thread_to_terminate)
+        # Stops decoding and VAD right away; transcription workers stop before their next batch
+        token.cancel("reset")
         
         # Give it a short grace period
-        grace_period = 0.5  # seconds
-        start_time = time.time()
-        # Use a copy of the thread reference to avoid race conditions
-        thread_ref = thread_to_terminate
-        while time.time() - start_time < grace_period and self.is_transcribing():
-            time.sleep(0.1)
-        
-        # If the thread is still running, we'll try to clean up as much as possible
-        if self.is_transcribing():
-            self.console.print("[red]Could not terminate transcription thread gracefully.[/red]")
-            self.console.print("[yellow]Cleaning up resources and marking transcription as complete.[/yellow]")
-            
-            with self.static_transcription_lock:
-                # Force the thread to be marked as None so is_transcribing() returns False
-                self.transcription_thread = None
+        thread.join(timeout=0.5)
+        if thread.is_alive():
+            self.console.print("[yellow]Transcription will stop after the model call in progress; "
+                               "new jobs can start now.[/yellow]")
         else:
             self.console.print("[green]Transcription aborted successfully![/green]")
         
@@ -128,91 +126,154 @@ class StaticFileProcessor:
         self._cleanup_temp_files()
         
         # Ensure tray icon is reset to gray
-        self.tray.set_color('gray', self.config.send_enter)
+        self._set_tray('gray')
         
         self.console.print("[green]Reset complete. Ready for new commands.[/green]")
 
-    def _transcribe_in_thread(self, file_path: str) -> None:
+    def _transcribe_in_thread(self, file_path: str, token: Optional[CancellationToken] = None) -> None:
         """Perform transcription in a separate thread."""
+        token = token or CancellationToken()
         try:
-            # Reset abort flag at start
+            self.run_job(file_path, token)
+        except Exception as e:
+            self.console.print(f"[bold red]Static transcription failed: {e}[/bold red]")
+        finally:
             with self.static_transcription_lock:
-                self.abort_static_transcription = False
-            
-            # Check for abort frequently
-            def should_abort():
-                with self.static_transcription_lock:
-                    return self.abort_static_transcription
-            
-            # Step 1: Convert to WAV format if needed
-            wav_path = self._ensure_wav_format(file_path)
-            if not wav_path or not os.path.exists(wav_path):
-                self.console.print("[bold red]Failed to convert audio file. Aborting.[/bold red]")
-                self.tray.set_color('gray', self.config.send_enter)
-                return
+                # A cancelled job may finish after the next one started: leave that one alone
+                if self.cancel_token is token:
+                    self._set_tray('gray')
+                    self.transcription_thread = None
+                    self.cancel_token = None
+
+    def create_vad(self, rate: int = 16000):
+        """VAD backend for the block-wise speech detection (None if no backend can be created)."""
+        try:
+            return create_vad_backend(
+                self.config.vad_backend,
+                sample_rate=rate,
+                aggressiveness=2,
+                model_path=self.config.vad_onnx_model_path,
+                console=self.console
+            )
+        except Exception as e:
+            self.console.print(f"[red]No VAD backend available ({e}). Skipping VAD.[/red]")
+            return None
+
+    def job_parameters(self, vad_name: str, timed: bool) -> Dict:
+        """Every setting that changes the segments or the text of a job (checkpoints, batch manifests)."""
+        return {
+            "model": getattr(self.transcriber, "model_id", ""),
+            "language": self.config.longform_language,
+            "vad": vad_name,
+            "segment_seconds": self.config.static_segment_seconds,
+            "block_seconds": self.config.static_block_seconds,
+            "vad_padding_ms": self.config.static_vad_padding_ms,
+            "vad_hangover_ms": self.config.static_vad_hangover_ms,
+            "timed": timed,
+        }
+
+    def run_job(self, file_path: str, token: CancellationToken, workspace: Optional[str] = None,
+                output_dir: Optional[str] = None, transcribe_gate: Optional[threading.Event] = None,
+                show_transcript: bool = True) -> Optional[StaticJobResult]:
+        """Transcribe one file and write its outputs; returns None if the job was cancelled.
+
+        workspace:        directory for the job's checkpoint (default: temp_audio/checkpoints)
+        output_dir:       where the outputs go (default: next to the source file)
+        transcribe_gate:  decoding and VAD start right away, transcription waits until it is set
+                          (lets a batch run prefetch the next file)
+        """
+        should_abort = token
+        checkpoint = None
+        trace_session = TRACER.new_session("static")
+        try:
+            job_start = time.time()
+            rate = 16000
             
-            # Check abort flag after conversion
-            if should_abort():
-                self.console.print("[bold yellow]Static transcription aborted after conversion.[/bold yellow]")
-                self.tray.set_color('gray', self.config.send_enter)
-                return
+            # Step 1: VAD backend for the block-wise speech detection
+            vad = self.create_vad(rate)
             
-            # Step 2: Apply VAD to remove non-speech sections
-            voice_wav = self._apply_vad(wav_path, aggressiveness=2)
+            # Timestamps are only decoded when a subtitle/JSON output is requested
+            formats = parse_formats(self.config.static_output_formats)
+            timed = any(fmt in TIMED_FORMATS for fmt in formats)
             
-            # Check abort flag after VAD
-            if should_abort():
-                self.console.print("[bold yellow]Static transcription aborted after VAD.[/bold yellow]")
-                self.tray.set_color('gray', self.config.send_enter)
-                return
+            # Resume from an earlier run of the same file with the same settings
+            if self.config.static_checkpoints:
+                checkpoint = self._open_checkpoint(file_path, vad, timed,
+                                                   workspace or os.path.join(self.temp_dir, "checkpoints"))
             
-            # Step 3: Transcribe the processed audio
-            self.console.print("[blue]Beginning transcription with voice-only data...[/blue]")
+            # Step 2: Decode, VAD and transcribe as one pipeline
+            self.console.print("[blue]Beginning streaming transcription of voice-only segments...[/blue]")
+            with TRACER.span("pipeline", "static", trace_session):
+                result = self._run_pipeline(file_path, vad, rate, should_abort, timed, checkpoint, transcribe_gate)
             
-            # Check if we should abort before starting transcription
-            if should_abort():
-                self.console.print("[bold yellow]Static transcription aborted before starting.[/bold yellow]")
-                self.tray.set_color('gray', self.config.send_enter)
-                return
-                
-            final_text = self.transcriber.transcribe(voice_wav)
+            # No speech found: transcribe the original audio instead
+            if result is not None and vad is not None and not result[0]:
+                self.console.print("[red]VAD found no voice frames. Using original audio.[/red]")
+                with TRACER.span("pipeline", "static", trace_session, vad=False):
+                    result = self._run_pipeline(file_path, None, rate, should_abort, timed)
             
             # Check abort flag after transcription
-            if should_abort():
+            if result is None or should_abort():
                 self.console.print("[bold yellow]Static transcription completed but results discarded due to abort request.[/bold yellow]")
-                self.tray.set_color('gray', self.config.send_enter)
-                return
+                return None
             
-            # Display results
-            panel = Panel(
-                f"[bold magenta]Static File Transcription:[/bold magenta] {final_text}",
-                title="Static Transcription",
-                border_style="yellow"
+            segments, texts, cues, audio_samples = result
+            if vad is not None:
+                self.console.print(f"[yellow]VAD processing complete ({vad.name}): Only voice frames retained.[/yellow]")
+            final_text = " ".join(texts[seg.index].strip() for seg in segments if texts[seg.index].strip())
+            
+            # Report speed relative to the length of the original audio
+            elapsed = time.time() - job_start
+            audio_seconds = audio_samples / rate
+            speech_seconds = sum(seg.num_samples for seg in segments) / rate
+            rtf = elapsed / audio_seconds if audio_seconds else 0.0
+            self.console.print(
+                f"[cyan]Transcribed {audio_seconds:.0f} s of audio ({speech_seconds:.0f} s of speech) "
+                f"in {elapsed:.1f} s - real-time factor {rtf:.3f}[/cyan]"
             )
-            self.console.print(panel)
             
-            # Save .txt alongside the original file
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            dir_name = os.path.dirname(file_path)
-            out_txt_path = os.path.join(dir_name, base_name + ".txt")
+            # Display results
+            if show_transcript:
+                panel = Panel(
+                    f"[bold magenta]Static File Transcription:[/bold magenta] {final_text}",
+                    title="Static Transcription",
+                    border_style="yellow"
+                )
+                self.console.print(panel)
+            
+            # Save the requested formats (.txt, .srt, .vtt, .json) alongside the original file
+            base_path = os.path.splitext(file_path)[0]
+            if output_dir:
+                base_path = os.path.join(output_dir, os.path.basename(base_path))
+            all_cues = [cue for seg in segments for cue in cues.get(seg.index, [])]
+            metadata = {
+                "source": os.path.abspath(file_path),
+                "duration": round(audio_seconds, 3),
+                "speech_duration": round(speech_seconds, 3),
+                "language": self.config.longform_language,
+            }
+            with TRACER.span("output", "static", trace_session, formats=len(formats)):
+                outputs = write_transcripts(base_path, final_text, all_cues, formats, metadata)
+            for out_path in outputs:
+                self.console.print(f"[green]Saved transcription to: {out_path}[/green]")
             
-            with open(out_txt_path, "w", encoding="utf-8") as f:
-                f.write(final_text)
+            # The outputs are complete: the checkpoint is no longer needed
+            if checkpoint is not None:
+                checkpoint.remove()
+                checkpoint = None
             
-            self.console.print(f"[green]Saved transcription to: {out_txt_path}[/green]")
-        
-        except SystemExit:
-            self.console.print("[yellow]Transcription thread was terminated by user request.[/yellow]")
-        except Exception as e:
-            self.console.print(f"[bold red]Static transcription failed: {e}[/bold red]")
+            TRACER.record("job", job_start, time.time(), "static", trace_session, file=os.path.basename(file_path),
+                          audio_seconds=round(audio_seconds, 1), segments=len(segments))
+            return StaticJobResult(file_path, final_text, outputs, audio_seconds, speech_seconds, elapsed,
+                                   len(segments))
         
         finally:
-            self.tray.set_color('gray', self.config.send_enter)
-            with self.static_transcription_lock:
-                self.transcription_thread = None
+            # Kept on abort or failure so the next run of this file resumes
+            if checkpoint is not None:
+                checkpoint.close()
 
     def _cleanup_temp_files(self) -> None:
-        """Remove temporary files used for static transcription."""
+        """Remove temporary files left behind by older versions of the static pipeline."""
         temp_files = [
             os.path.join(self.temp_dir, "temp_static_file.wav"),
             os.path.join(self.temp_dir, "temp_static_silence_removed.wav")
@@ -225,124 +286,208 @@ class StaticFileProcessor:
                     self.console.print(f"[yellow]Deleted temp file: {os.path.basename(f)}[/yellow]")
                 except Exception as e:
                     self.console.print(f"[red]Failed to delete {os.path.basename(f)}: {e}[/red]")
-    
-    def _ensure_wav_format(self, input_path: str) -> Optional[str]:
-        """Convert input file (audio or video) to 16kHz mono WAV."""
-        temp_wav = os.path.join(self.temp_dir, "temp_static_file.wav")
-
-        # Check if the file is already a WAV in the correct format
-        try:
-            with wave.open(input_path, 'rb') as wf:
-                channels = wf.getnchannels()
-                rate = wf.getframerate()
-                if channels == 1 and rate == 16000:
-                    self.console.print("[blue]No conversion needed, copying to temp file.[/blue]")
-                    shutil.copy(input_path, temp_wav)
-                    return temp_wav
-        except wave.Error:
-            # Not a valid WAV file, needs conversion
-            pass
-        except Exception as e:
-            self.console.print(f"[yellow]File check error: {e}. Will try conversion.[/yellow]")
-
-        # Get file extension to determine if it's video or audio
-        _, ext = os.path.splitext(input_path)
-        ext = ext.lower()
-
-        # Common video extensions
-        video_exts = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm']
-        is_video = ext in video_exts
 
-        # Convert using FFmpeg
-        if is_video:
-            self.console.print(f"[cyan]Converting video file '{input_path}' to 16kHz mono WAV[/cyan]")
+    def _open_reader(self, file_path: str, rate: int, align: int = 1):
+        """Open a bounded-memory block reader (memory-mapped WAV or an FFmpeg pipe)."""
+        reader = open_block_reader(file_path, rate, block_seconds=self.config.static_block_seconds, align=align)
+        if isinstance(reader, FFmpegPCMReader):
+            _, ext = os.path.splitext(file_path)
+            video_exts = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm']
+            kind = "video" if ext.lower() in video_exts else "audio"
+            self.console.print(f"[cyan]Decoding {kind} file '{file_path}' through an FFmpeg pipe[/cyan]")
         else:
-            self.console.print(f"[cyan]Converting audio file '{input_path}' to 16kHz mono WAV[/cyan]")
+            self.console.print("[blue]No conversion needed, memory-mapping the WAV file.[/blue]")
+        return reader
 
+    def _open_checkpoint(self, file_path: str, vad, timed: bool, directory: str) -> Optional[JobCheckpoint]:
+        """Checkpoint keyed by the file content and every setting that changes the segments or text."""
+        params = self.job_parameters(vad.name if vad is not None else "", timed)
         try:
-            subprocess.run([
-                "ffmpeg",
-                "-y",              # Overwrite output file if it exists
-                "-i", input_path,  # Input file
-                "-vn",             # Skip video stream (needed for video files)
-                "-ac", "1",        # Mono
-                "-ar", "16000",    # 16kHz
-                temp_wav
-            ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-            self.console.print("[cyan]Conversion successful.[/cyan]")
-            return temp_wav
+            checkpoint = JobCheckpoint(directory, file_path, params)
+            reusable = checkpoint.load()
+            checkpoint.open()
         except Exception as e:
-            self.console.print(f"[bold red]FFmpeg conversion error: {e}[/bold red]")
+            self.console.print(f"[yellow]Checkpointing disabled for this job: {e}[/yellow]")
             return None
+        if reusable:
+            self.console.print(f"[blue]Resuming from checkpoint: {reusable} segments already transcribed[/blue]")
+        return checkpoint
     
-    def _apply_vad(self, in_wav_path: str, aggressiveness: int = 2) -> str:
-        """Apply Voice Activity Detection to keep only speech frames."""
-        if not WEBRTC_VAD_AVAILABLE:
-            self.console.print("[red]webrtcvad not installed. Skipping VAD.[/red]")
-            return in_wav_path
-
-        out_wav = os.path.join(self.temp_dir, "temp_static_silence_removed.wav")
-
-        try:
-            # Open and read input file
-            wf_in = wave.open(in_wav_path, 'rb')
-            channels = wf_in.getnchannels()
-            rate = wf_in.getframerate()
-            
-            # Check if file format is compatible with VAD
-            if channels != 1:
-                self.console.print("[red]VAD requires mono audio. Skipping VAD.[/red]")
-                wf_in.close()
-                return in_wav_path
-                
-            if rate not in [8000, 16000, 32000, 48000]:
-                self.console.print("[red]VAD requires specific sample rates. Skipping VAD.[/red]")
-                wf_in.close()
-                return in_wav_path
-
-            # Read all audio data
-            audio_data = wf_in.readframes(wf_in.getnframes())
-            wf_in.close()
-
-            # Initialize VAD
-            vad = webrtcvad.Vad(aggressiveness)
-
-            # Process audio in 30ms frames
-            frame_ms = 30
-            frame_bytes = int(rate * 2 * (frame_ms/1000.0))  # 16-bit samples = 2 bytes each
-            
-            voiced_bytes = bytearray()
-            idx = 0
-
-            # Process each frame
-            while idx + frame_bytes <= len(audio_data):
-                frame = audio_data[idx:idx+frame_bytes]
-                is_speech = vad.is_speech(frame, rate)
-                if is_speech:
-                    voiced_bytes.extend(frame)
-                idx += frame_bytes
-
-            # Check if we found any speech
-            if len(voiced_bytes) == 0:
-                self.console.print("[red]VAD found no voice frames. Using original audio.[/red]")
-                return in_wav_path
-
-            # Write out the speech-only audio
-            wf_out = wave.open(out_wav, 'wb')
-            wf_out.setnchannels(1)
-            wf_out.setsampwidth(2)  # 16-bit
-            wf_out.setframerate(rate)
-            wf_out.writeframes(voiced_bytes)
-            wf_out.close()
-
-            self.console.print("[yellow]VAD processing complete: Only voice frames retained.[/yellow]")
-            return out_wav
-            
-        except Exception as e:
-            self.console.print(f"[red]VAD processing error: {e}[/red]")
-            return in_wav_path
+    def _remap_cues(self, segment: SpeechSegment, timed_segments, rate: int) -> List[TimedText]:
+        """Model timestamps (relative to the speech-only audio of a segment) -> original-file cues."""
+        time_map = segment.time_map(rate)
+        return [
+            TimedText(time_map.to_original(start), time_map.to_original(end, is_end=True), text)
+            for start, end, text in timed_segments
+        ]
     
+    def _run_pipeline(self, file_path: str, vad, rate: int, should_abort: CancellationToken, timed: bool = False,
+                      checkpoint: Optional[JobCheckpoint] = None,
+                      transcribe_gate: Optional[threading.Event] = None) -> Optional[Tuple[List[SpeechSegment], Dict[int, str], Dict[int, List[TimedText]], int]]:
+        """Decode + VAD on a producer thread, batched transcription of finished segments on worker threads.
+        
+        Returns (segments, texts and cues by segment index, samples decoded), or None if aborted.
+        """
+        if vad is not None:
+            vad.reset()
+        packer = StreamingSpeechPacker(vad, rate, target_seconds=self.config.static_segment_seconds,
+                                       pad_ms=self.config.static_vad_padding_ms,
+                                       hangover_ms=self.config.static_vad_hangover_ms)
+        reader = self._open_reader(file_path, rate, align=packer.frame)
+        
+        # Memory-mapped files can be classified in a process pool ahead of the packer
+        # (short files are not worth the pool start-up)
+        sharded_vad = None
+        if (vad is not None and isinstance(reader, MappedWavReader) and self.config.static_vad_workers != 1
+                and len(reader.samples) >= 6 * reader.block_samples):
+            sharded_vad = ShardedVAD(vad, rate, aggressiveness=2, model_path=self.config.vad_onnx_model_path,
+                                     workers=self.config.static_vad_workers)
+            self.console.print(f"[blue]Running VAD ({vad.name}) on {sharded_vad.workers} processes[/blue]")
+            should_abort.on_cancel(sharded_vad.close)
+        
+        # Cancelling the job kills the FFmpeg pipe / stops reading right away
+        should_abort.on_cancel(reader.close)
+        batch_size = max(1, self.config.static_batch_size)
+        workers = self.transcriber.num_workers
+        scheduler = self.transcriber.scheduler
+        
+        # Bounded so decoding never runs far ahead of transcription (constant memory)
+        segment_queue = queue.Queue(maxsize=batch_size * workers * 2)
+        done_marker = object()
+        segments: List[SpeechSegment] = []
+        texts: Dict[int, str] = {}
+        cues: Dict[int, List[TimedText]] = {}
+        errors = []
+        state_lock = threading.Lock()
+        queued_at: Dict[int, float] = {}  # Segment index -> when it entered the queue
+        trace_context = TRACER.context()  # The worker threads trace into the job's session
+        
+        def put(item) -> bool:
+            while not should_abort() and not errors:
+                try:
+                    if item is not done_marker:
+                        queued_at[item.index] = time.time()
+                    segment_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                flags = None
+                if sharded_vad is not None:
+                    flags = sharded_vad.flags(reader.path, reader.data_offset, len(reader.samples),
+                                              reader.block_samples)
+                read_start = time.time()
+                for segment in packer.stream(reader.blocks(), flags):
+                    # Decoding the input, VAD and packing up to this segment
+                    TRACER.record("read_vad", read_start, time.time(), segment=segment.index, **trace_context)
+                    record = checkpoint.reusable(segment.index, segment.ranges) if checkpoint is not None else None
+                    with state_lock:
+                        segments.append(segment)
+                        if record is not None:
+                            # Transcribed by an earlier run: no need to queue it
+                            texts[segment.index] = record["text"]
+                            cues[segment.index] = [TimedText(*cue) for cue in record["cues"]]
+                    if record is not None:
+                        segment.audio = None
+                        continue
+                    if not put(segment):
+                        break
+                    read_start = time.time()
+            except Exception as e:
+                if not should_abort():
+                    errors.append(e)
+            finally:
+                reader.close()
+                if sharded_vad is not None:
+                    sharded_vad.close()
+                put(done_marker)
+        
+        def consume():
+            # Prefetch mode: the queue fills up (decode + VAD) while transcription waits for its turn
+            while transcribe_gate is not None and not transcribe_gate.wait(0.1):
+                if should_abort():
+                    return
+            finished = False
+            while not finished and not should_abort() and not errors:
+                # One segment per call while dictation/real-time is active: it waits for one segment at most
+                limit = 1 if scheduler.interactive() else batch_size
+                # Wait for one segment, then take whatever else is already queued for the batch
+                try:
+                    item = segment_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                batch = []
+                while True:
+                    if item is done_marker:
+                        segment_queue.put(done_marker)  # Let the other workers see it too
+                        finished = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= limit:
+                        break
+                    try:
+                        item = segment_queue.get(timeout=0.02)
+                    except queue.Empty:
+                        break
+                if not batch:
+                    continue
+                batch_start = time.time()
+                waits = [queued_at.pop(seg.index, batch_start) for seg in batch]
+                for queued in waits:
+                    QUEUE_WAIT_SECONDS.observe(batch_start - queued, queue="static_segments")
+                TRACER.record("queue", min(waits), batch_start, segments=len(batch), **trace_context)
+                try:
+                    with TRACER.span("transcribe", segments=len(batch), **trace_context):
+                        audios = [seg.audio for seg in batch]
+                        if timed:
+                            results = self.transcriber.transcribe_batch_timed(audios, priority=BACKGROUND)
+                            batch_texts = [r.text for r in results]
+                            batch_cues = [self._remap_cues(seg, r.segments, rate) for seg, r in zip(batch, results)]
+                        else:
+                            batch_texts = self.transcriber.transcribe_batch(audios, priority=BACKGROUND)
+                            batch_cues = [[] for _ in batch]
+                except Exception as e:
+                    errors.append(e)
+                    return
+                TRANSCRIPTION_SECONDS.observe(time.time() - batch_start, pipeline="static")
+                AUDIO_SECONDS.inc(sum(len(a) for a in audios) / rate, pipeline="static")
+                # Only ranges and text are kept: a transcribed segment's audio is released right away
+                del audios
+                for seg in batch:
+                    seg.audio = None
+                with state_lock:
+                    for seg, text, seg_cues in zip(batch, batch_texts, batch_cues):
+                        texts[seg.index] = text
+                        cues[seg.index] = seg_cues
+                    done = len(texts)
+                    if checkpoint is not None:
+                        checkpoint.append([
+                            {"index": seg.index, "ranges": seg.ranges, "text": text,
+                             "cues": [[c.start, c.end, c.text] for c in seg_cues]}
+                            for seg, text, seg_cues in zip(batch, batch_texts, batch_cues)
+                        ])
+                decoded = packer.total_samples / rate
+                self.console.print(f"[blue]Transcribed {done} segments ({decoded:.0f} s of audio decoded so far)[/blue]")
+        
+        producer = threading.Thread(target=produce, daemon=True)
+        consumers = [threading.Thread(target=consume, daemon=True) for _ in range(workers)]
+        producer.start()
+        for thread in consumers:
+            thread.start()
+        for thread in consumers:
+            thread.join()
+        reader.close()
+        producer.join()
+        
+        if errors:
+            raise errors[0]
+        if should_abort():
+            return None
+        return segments, texts, cues, packer.total_samples
+
     def transcribe_file(self) -> None:
         """Transcribe a static audio file selected by the user."""
         self.console.print("[bold yellow]TRANSCRIBE_STATIC command received[/bold yellow]")
@@ -352,11 +497,14 @@ class StaticFileProcessor:
             self.console.print("[bold yellow]Already transcribing a file. Please wait or reset.[/bold yellow]")
             return
 
-        self.tray.set_color('yellow', self.config.send_enter)
+        self._set_tray('yellow')
 
         self._cleanup_temp_files()
         
         # Open file dialog
+        import tkinter
+        from tkinter import filedialog
+
         root = tkinter.Tk()
         root.withdraw()
         file_path = filedialog.askopenfilename(
@@ -367,16 +515,17 @@ class StaticFileProcessor:
 
         if not file_path:
             self.console.print("[red]No file selected. Aborting static transcription.[/red]")
-            self.tray.set_color('gray', self.config.send_enter)
+            self._set_tray('gray')
             return
 
         self.console.print(f"[green]Selected file: {file_path}[/green]")
 
         # Start transcription in a separate thread
         with self.static_transcription_lock:
+            self.cancel_token = CancellationToken()
             self.transcription_thread = threading.Thread(
                 target=self._transcribe_in_thread,
-                args=(file_path,),
+                args=(file_path, self.cancel_token),
                 daemon=True
             )
             self.transcription_thread.start()
\ No newline at end of file
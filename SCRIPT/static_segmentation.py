@@ -0,0 +1,199 @@
+# static_segmentation.py
+#
+# Splits the speech of a long file into independently decodable segments
+#
+# This module:
+# - Converts per-frame VAD decisions into speech runs (sample ranges of the
+#   original audio), using vectorized run-length detection
+# - Pads speech runs and bridges short pauses (hangover), on whole arrays or
+#   on a stream of decisions with a fixed delay
+# - Packs consecutive runs into segments of roughly 30 s of speech, cutting
+#   only at VAD boundaries (long uninterrupted runs are split at the quietest
+#   point near the limit)
+# - Gathers the speech audio of a segment from the original samples
+# - Maps times in a segment's speech-only audio back to original-file time,
+#   so model timestamps survive the removal of silence
+#
+# Segments never exceed one Whisper window, so they can be transcribed in
+# parallel (across model workers or in batches) and reassembled in order
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+@dataclass
+class SpeechSegment:
+    """Speech of one decoding unit, as sample ranges of the original audio."""
+    index: int
+    ranges: List[Tuple[int, int]] = field(default_factory=list)
+    audio: Optional[np.ndarray] = None  # float32 speech audio, when produced by a streaming source
+
+    @property
+    def num_samples(self) -> int:
+        return sum(end - start for start, end in self.ranges)
+
+    @property
+    def start_sample(self) -> int:
+        return self.ranges[0][0]
+
+    @property
+    def end_sample(self) -> int:
+        return self.ranges[-1][1]
+
+    def time_map(self, rate: int = 16000) -> "SegmentTimeMap":
+        return SegmentTimeMap(self.ranges, rate)
+
+
+class SegmentTimeMap:
+    """Maps time in the speech-only audio of a segment back to time in the original file."""
+
+    def __init__(self, ranges: List[Tuple[int, int]], rate: int = 16000):
+        self.rate = rate
+        self.original_starts = np.array([start for start, _ in ranges], dtype=np.int64)
+        self.lengths = np.array([end - start for start, end in ranges], dtype=np.int64)
+        self.speech_starts = np.concatenate([[0], np.cumsum(self.lengths)[:-1]]).astype(np.int64)
+
+    def to_original(self, seconds: float, is_end: bool = False) -> float:
+        """Original-file time (s) of a time in the speech-only audio.
+
+        A time exactly on the cut between two runs maps to the end of the
+        earlier run for end times and to the start of the later run otherwise.
+        """
+        if not len(self.lengths):
+            return seconds
+        sample = int(round(seconds * self.rate))
+        side = 'left' if is_end else 'right'
+        i = int(np.clip(np.searchsorted(self.speech_starts, sample, side=side) - 1, 0, len(self.lengths) - 1))
+        offset = min(max(sample - self.speech_starts[i], 0), self.lengths[i])
+        return float(self.original_starts[i] + offset) / self.rate
+
+
+def speech_runs(flags: np.ndarray, frame_samples: int) -> List[Tuple[int, int]]:
+    """Sample ranges [start, end) of consecutive speech frames."""
+    if len(flags) == 0:
+        return []
+    padded = np.concatenate([[False], flags.astype(bool), [False]])
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    return [(int(s) * frame_samples, int(e) * frame_samples) for s, e in zip(starts, ends)]
+
+
+def smooth_speech_flags(flags: np.ndarray, pad_frames: int = 0, hangover_frames: int = 0) -> np.ndarray:
+    """Extend every speech run by pad_frames on both sides, then bridge gaps shorter than hangover_frames.
+
+    Each output frame only depends on input frames within pad_frames +
+    hangover_frames of it, which is what lets SpeechFlagSmoother apply this
+    to a stream with a fixed delay.
+    """
+    flags = np.asarray(flags, dtype=bool)
+    if len(flags) == 0 or (pad_frames <= 0 and hangover_frames <= 0):
+        return flags.copy()
+
+    # Padding: dilate the speech frames with a running-sum window
+    if pad_frames > 0:
+        counts = np.concatenate([[0], np.cumsum(flags, dtype=np.int64)])
+        index = np.arange(len(flags))
+        lo = np.maximum(index - pad_frames, 0)
+        hi = np.minimum(index + pad_frames + 1, len(flags))
+        flags = (counts[hi] - counts[lo]) > 0
+
+    # Hangover: fill silence gaps between two speech runs that are too short to be a real pause
+    if hangover_frames > 0:
+        padded = np.concatenate([[True], flags, [True]]).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        gap_starts, gap_ends = edges[0::2], edges[1::2]
+        inner = (gap_starts > 0) & (gap_ends < len(flags)) & (gap_ends - gap_starts < hangover_frames)
+        if inner.any():
+            marks = np.zeros(len(flags) + 1, dtype=np.int64)
+            np.add.at(marks, gap_starts[inner], 1)
+            np.add.at(marks, gap_ends[inner], -1)
+            flags = flags | (np.cumsum(marks[:-1]) > 0)
+    return flags
+
+
+class SpeechFlagSmoother:
+    """Applies smooth_speech_flags to a stream of frame decisions, delayed by pad + hangover frames."""
+
+    def __init__(self, pad_frames: int = 0, hangover_frames: int = 0):
+        self.pad_frames = max(0, pad_frames)
+        self.hangover_frames = max(0, hangover_frames)
+        self.radius = self.pad_frames + self.hangover_frames
+        self.history = np.zeros(0, dtype=bool)  # Raw flags from history_start on
+        self.history_start = 0
+        self.committed = 0                      # Frames already returned
+
+    def _commit(self, end: int) -> np.ndarray:
+        if end <= self.committed:
+            return np.zeros(0, dtype=bool)
+        smoothed = smooth_speech_flags(self.history, self.pad_frames, self.hangover_frames)
+        out = smoothed[self.committed - self.history_start:end - self.history_start]
+        self.committed = end
+
+        # Keep `radius` frames of context before the first uncommitted frame
+        keep_from = max(self.history_start, self.committed - self.radius)
+        self.history = self.history[keep_from - self.history_start:]
+        self.history_start = keep_from
+        return out
+
+    def push(self, flags: np.ndarray) -> np.ndarray:
+        """Add raw flags; returns the smoothed flags that can no longer change."""
+        self.history = np.concatenate([self.history, np.asarray(flags, dtype=bool)])
+        return self._commit(self.history_start + len(self.history) - self.radius)
+
+    def finish(self) -> np.ndarray:
+        """Smoothed flags of the remaining frames at the end of the stream."""
+        return self._commit(self.history_start + len(self.history))
+
+
+def quietest_cut(audio: np.ndarray, max_samples: int, rate: int) -> int:
+    """Index at which to cut audio longer than max_samples: the quietest 100 ms in the last 5 s."""
+    window = rate // 10
+    search = min(5 * rate, max_samples // 2)
+    lo = max_samples - search
+    region = audio[lo:max_samples].astype(np.float32)
+    usable = (len(region) // window) * window
+    if not usable:
+        return max_samples
+    energy = np.mean(region[:usable].reshape(-1, window) ** 2, axis=1)
+    return lo + int(np.argmin(energy)) * window + window // 2
+
+
+def _split_long_run(samples: np.ndarray, start: int, end: int, max_samples: int,
+                    rate: int) -> List[Tuple[int, int]]:
+    """Split a run longer than max_samples into pieces, each cut at a quiet point."""
+    pieces = []
+    while end - start > max_samples:
+        cut = start + quietest_cut(samples[start:start + max_samples], max_samples, rate)
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def plan_segments(runs: List[Tuple[int, int]], samples: np.ndarray, rate: int = 16000,
+                  target_seconds: float = 30.0) -> List[SpeechSegment]:
+    """Pack speech runs into segments of at most target_seconds of speech, in order."""
+    max_samples = int(target_seconds * rate)
+    segments = []
+    current = SpeechSegment(index=0)
+
+    for start, end in runs:
+        for piece in _split_long_run(samples, start, end, max_samples, rate):
+            piece_len = piece[1] - piece[0]
+            if current.ranges and current.num_samples + piece_len > max_samples:
+                segments.append(current)
+                current = SpeechSegment(index=len(segments))
+            current.ranges.append(piece)
+
+    if current.ranges:
+        segments.append(current)
+    return segments
+
+
+def gather_segment_audio(samples: np.ndarray, segment: SpeechSegment) -> np.ndarray:
+    """float32 speech audio of a segment (ranges concatenated)."""
+    if segment.audio is not None:
+        return segment.audio
+    parts = [samples[start:end] for start, end in segment.ranges]
+    return np.concatenate(parts).astype(np.float32) / 32768.0
@@ -0,0 +1,147 @@
+# tracing.py
+#
+# Lightweight span tracing of the pipeline stages, written as JSONL
+#
+# Every span is one line in temp_audio/traces/trace-<date>.jsonl:
+#   {"id": 12, "parent": 7, "name": "transcribe", "pipeline": "longform",
+#    "session": "longform-1712345678-3", "ts": 1712345690.12, "dur": 2.31,
+#    "thread": "Thread-5", "attrs": {"chunk": 2}}
+#
+# This module:
+# - Provides span() (a context manager) and record() (for spans whose times
+#   are known afterwards, e.g. the capture of a real-time utterance)
+# - Nests spans per thread: a span opened inside another one on the same
+#   thread gets it as parent and inherits its pipeline and session, so helpers
+#   deep in the stack (e.g. hallucination filtering) need no extra arguments
+# - Names a session per recording, real-time run and static job, so an
+#   offline report ("test & utility scripts/trace_report.py") can rebuild the
+#   timeline of each session, its critical path and a Chrome trace
+# - Writes on a background thread: a span costs a dictionary and a queue put
+#   when tracing is enabled, and almost nothing when it is not
+#
+# Times are wall clock seconds (time.time()), so spans from all threads and the
+# capture timestamps of the real-time pipeline share one time base
+
+import os
+import json
+import time
+import queue
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.records: "queue.SimpleQueue[Optional[Dict]]" = queue.SimpleQueue()
+        self.ids = itertools.count(1)
+        self.sessions = itertools.count(1)
+        self.local = threading.local()
+        self.writer = None
+
+    def start(self, directory: str) -> str:
+        """Start writing spans to a new JSONL file in `directory`; returns its path."""
+        if self.enabled:
+            return self.path
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, time.strftime("trace-%Y%m%d-%H%M%S.jsonl"))
+        self.writer = threading.Thread(target=self._write, args=(self.path,), name="trace-writer", daemon=True)
+        self.writer.start()
+        self.enabled = True
+        return self.path
+
+    def stop(self) -> None:
+        """Stop tracing and write out everything recorded so far."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.records.put(None)
+        self.writer.join(timeout=5.0)
+        self.writer = None
+
+    def _write(self, path: str) -> None:
+        with open(path, "a", encoding="utf-8") as f:
+            while True:
+                record = self.records.get()
+                if record is None:
+                    return
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                # Write out whatever else is waiting, then flush once
+                while True:
+                    try:
+                        record = self.records.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        return
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+
+    def new_session(self, pipeline: str) -> str:
+        """Id for one recording / real-time run / static job."""
+        return f"{pipeline}-{int(time.time())}-{next(self.sessions)}"
+
+    def _stack(self) -> list:
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def context(self) -> Dict[str, Optional[str]]:
+        """Pipeline and session of the innermost open span on this thread, to pass on to worker threads."""
+        stack = getattr(self.local, "stack", None)
+        if not stack:
+            return {"pipeline": None, "session": None}
+        return {"pipeline": stack[-1][1], "session": stack[-1][2]}
+
+    def _emit(self, span_id: int, parent: Optional[int], name: str, pipeline: Optional[str], session: Optional[str],
+              start: float, end: float, attrs: Dict) -> None:
+        self.records.put({
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "pipeline": pipeline,
+            "session": session,
+            "ts": round(start, 6),
+            "dur": round(max(0.0, end - start), 6),
+            "thread": threading.current_thread().name,
+            "attrs": attrs,
+        })
+
+    @contextmanager
+    def span(self, name: str, pipeline: Optional[str] = None, session: Optional[str] = None, **attrs):
+        """Trace the with-block; pipeline/session default to those of the enclosing span on this thread."""
+        if not self.enabled:
+            yield
+            return
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            pipeline = pipeline or parent[1]
+            session = session or parent[2]
+        span_id = next(self.ids)
+        stack.append((span_id, pipeline, session))
+        start = time.time()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self._emit(span_id, parent[0] if parent else None, name, pipeline, session, start, time.time(), attrs)
+
+    def record(self, name: str, start: float, end: float, pipeline: Optional[str] = None,
+               session: Optional[str] = None, **attrs) -> None:
+        """Add a span after the fact (start/end in time.time() seconds)."""
+        if not self.enabled:
+            return
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            pipeline = pipeline or parent[1]
+            session = session or parent[2]
+        self._emit(next(self.ids), parent[0] if parent else None, name, pipeline, session, start, end, attrs)
+
+
+TRACER = Tracer()
@@ -0,0 +1,87 @@
+# transcript_formats.py
+#
+# Timed transcript output for static files
+#
+# This module:
+# - Holds timed transcript cues (start/end in original-file seconds)
+# - Formats them as SubRip (.srt), WebVTT (.vtt) or JSON
+# - Writes the requested formats alongside the original file
+#
+# Cue times come from the model's timestamp tokens, remapped through the
+# VAD time map of each segment (see static_segmentation.SegmentTimeMap)
+
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+TIMED_FORMATS = ("srt", "vtt", "json")
+ALL_FORMATS = ("txt",) + TIMED_FORMATS
+
+
+@dataclass
+class TimedText:
+    """One transcript cue, in seconds of the original file."""
+    start: float
+    end: float
+    text: str
+
+
+def parse_formats(value: str) -> List[str]:
+    """'txt, srt,vtt' -> ['txt', 'srt', 'vtt'] (unknown names are ignored, txt is the fallback)."""
+    formats = [f.strip().lower().lstrip(".") for f in (value or "").split(",")]
+    formats = [f for f in ALL_FORMATS if f in formats]
+    return formats or ["txt"]
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    millis = int(round(max(seconds, 0.0) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def format_srt(cues: Sequence[TimedText]) -> str:
+    blocks = []
+    for number, cue in enumerate(cues, start=1):
+        blocks.append(f"{number}\n{_timestamp(cue.start, ',')} --> {_timestamp(cue.end, ',')}\n{cue.text}\n")
+    return "\n".join(blocks)
+
+
+def format_vtt(cues: Sequence[TimedText]) -> str:
+    blocks = ["WEBVTT\n"]
+    for cue in cues:
+        blocks.append(f"{_timestamp(cue.start, '.')} --> {_timestamp(cue.end, '.')}\n{cue.text}\n")
+    return "\n".join(blocks)
+
+
+def format_json(cues: Sequence[TimedText], text: str, metadata: Dict = None) -> str:
+    data = dict(metadata or {})
+    data["text"] = text
+    data["segments"] = [
+        {"start": round(c.start, 3), "end": round(c.end, 3), "text": c.text} for c in cues
+    ]
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def write_transcripts(base_path: str, text: str, cues: Sequence[TimedText], formats: Sequence[str],
+                      metadata: Dict = None) -> List[str]:
+    """Write <base_path>.<format> for every requested format; returns the written paths."""
+    written = []
+    for fmt in formats:
+        if fmt == "txt":
+            content = text
+        elif fmt == "srt":
+            content = format_srt(cues)
+        elif fmt == "vtt":
+            content = format_vtt(cues)
+        elif fmt == "json":
+            content = format_json(cues, text, metadata)
+        else:
+            continue
+        path = base_path + "." + fmt
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        written.append(path)
+    return written
+
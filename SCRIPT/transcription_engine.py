@@ -8,31 +8,155 @@
 # This module:
 # - Loads and manages Whisper models for audio transcription
 # - Provides methods to transcribe both audio files and raw audio data
+# - Transcribes many short segments at once in batches (static files)
 # - Handles language selection and task type (transcribe vs. translate)
-# - Cleans up transcription results and removes known hallucinations
+# - Keeps known hallucination phrases out while decoding (token-level lexicon)
+#   and removes any that slip through from the results
 # - Supports toggling between languages (e.g., Greek and English)
 # - Automatically selects appropriate task based on language:
 #   * For English and Greek: Uses "transcribe" task
 #   * For other languages: Uses "translate" task (to English)
+# - Schedules model calls by priority (model_scheduler.py): interactive
+#   callers first, static work with the capacity left over
+# - Records how long the model took to load (metrics) and traces its decode
+#   and filter stages (spans nest under the caller's span)
+# - Loads the model on a background thread at app startup (start_loading),
+#   followed by one warm-up decode; model calls made meanwhile wait for it
+#   instead of failing, and faster-whisper is only imported by the loader
 #
 
-import torch
+import time
+import threading
+import numpy as np
+from typing import List, Optional
 from rich.console import Console
-from faster_whisper import WhisperModel
+from batched_decoding import BatchedWhisperDecoder, BatchItemResult
+from hallucination_lexicon import HallucinationLexicon
+from metrics import MODEL_LOAD_SECONDS
+from tracing import TRACER
+from profiling import track_model_memory
+from model_scheduler import ModelScheduler, INTERACTIVE, model_cpu_threads, inference_device
+from startup_timing import STARTUP
 
 class Transcriber:
-    def __init__(self, config, console: Console, model_id: str = None):
+    def __init__(self, config, console: Console, model_id: str = None, load: bool = True):
         self.config = config
         self.console = console
-        
-        # Initialize the model
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model_id = model_id if model_id else "Systran/faster-whisper-large-v3"
-        self.model = WhisperModel(
-            self.model_id, 
-            device=self.device, 
-            compute_type="float16" if self.device == "cuda" else "float32"
-        )
+        self.num_workers = max(1, config.model_num_workers)
+        self.device = None
+        self.model = None
+        self.batch_decoder = None
+        self.ready = threading.Event()          # Set once loading finished (or failed: see load_error)
+        self.load_error: Optional[Exception] = None
+        self.lexicon = HallucinationLexicon(
+            config.hallucination_phrases if config.decode_time_hallucination_filter else [])
+        # One slot per model worker; the app tells it when an interactive pipeline is active
+        self.scheduler = ModelScheduler(self.num_workers)
+        if load:
+            self.load_model()
+    
+    def load_model(self, warm_up: bool = False) -> None:
+        """Load the model (raises on failure); callers waiting in wait_until_loaded() go on afterwards."""
+        try:
+            with STARTUP.phase("faster-whisper import"):
+                from faster_whisper import WhisperModel  # Pulls in CTranslate2, tokenizers and PyAV
+            with STARTUP.phase("model load"):
+                self.device = inference_device()
+                load_start = time.perf_counter()
+                with track_model_memory("longform", self.model_id):
+                    self.model = WhisperModel(
+                        self.model_id, 
+                        device=self.device, 
+                        compute_type="float16" if self.device == "cuda" else "float32",
+                        num_workers=self.num_workers,  # Parallel model calls from several threads
+                        cpu_threads=model_cpu_threads(self.config)
+                    )
+                MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start, role="longform", model=self.model_id)
+                self.batch_decoder = BatchedWhisperDecoder(self.model, lexicon=self.lexicon)
+            if warm_up:
+                with STARTUP.phase("model warm-up"):
+                    self._warm_up()
+            STARTUP.mark("model ready")
+        except Exception as e:
+            self.load_error = e
+            raise
+        finally:
+            self.ready.set()
+    
+    def _warm_up(self) -> None:
+        """Decode a second of silence: the first real call no longer pays for kernel and allocator setup."""
+        language = self.config.longform_language or "en"
+        task = "transcribe" if language in ["en", "el"] else "translate"
+        self.batch_decoder.transcribe_batch([np.zeros(16000, dtype=np.float32)], language=language, task=task)
+    
+    def start_loading(self, warm_up: bool = True) -> threading.Thread:
+        """Load the model on a background thread; model calls made in the meantime wait for it."""
+        def load():
+            try:
+                self.load_model(warm_up)
+                self.console.print(f"[bold green]Model {self.model_id} ready on {self.device}[/bold green]")
+            except Exception as e:
+                self.console.print(f"[bold red]Failed to load model {self.model_id}: {e}[/bold red]")
+
+        thread = threading.Thread(target=load, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+    
+    def wait_until_loaded(self) -> None:
+        """Block until the model is loaded; raises if loading failed."""
+        self.ready.wait()
+        if self.load_error is not None:
+            raise RuntimeError(f"model {self.model_id} failed to load: {self.load_error}")
+    
+    def clean_text(self, text: str) -> str:
+        """Remove known hallucinations and the leading space from decoded text."""
+        for pattern in self.config.hallucinations_regex:
+            text = pattern.sub("", text)
+
+        if text and text[0].isspace():
+            text = text[1:]
+
+        return text
+    
+    def transcribe_batch(self, audios, use_realtime_language: bool = False, beam_size: int = 5,
+                         language: Optional[str] = None, priority: int = INTERACTIVE) -> List[str]:
+        """Transcribe several float32 buffers (each up to 30 s) in one batched model call."""
+        if language is None:
+            language = self.config.realtime_language if use_realtime_language else self.config.longform_language
+        task = "transcribe"
+        if language not in ["en", "el"]:
+            task = "translate"  # Translates to English automatically
+
+        self.wait_until_loaded()
+        with self.scheduler.slot(priority), TRACER.span("decode", items=len(audios)):
+            results = self.batch_decoder.transcribe_batch(audios, language=language, task=task, beam_size=beam_size)
+        with TRACER.span("filter"):
+            return [self.clean_text(r.text) for r in results]
+
+    def transcribe_batch_timed(self, audios, beam_size: int = 5, language: Optional[str] = None,
+                               priority: int = INTERACTIVE) -> List[BatchItemResult]:
+        """Like transcribe_batch, but keeps timestamp tokens: segment times are relative to each buffer."""
+        language = language or self.config.longform_language
+        task = "transcribe"
+        if language not in ["en", "el"]:
+            task = "translate"  # Translates to English automatically
+
+        self.wait_until_loaded()
+        with self.scheduler.slot(priority), TRACER.span("decode", items=len(audios), timed=True):
+            results = self.batch_decoder.transcribe_batch(audios, language=language, task=task, beam_size=beam_size,
+                                                          without_timestamps=False)
+        with TRACER.span("filter"):
+            for audio, result in zip(audios, results):
+                duration = len(audio) / 16000
+                segments = []
+                for start, end, text in result.segments:
+                    text = self.clean_text(text).strip()
+                    if text:
+                        segments.append((start, min(end if end is not None else duration, duration), text))
+                result.segments = segments
+                result.text = self.clean_text(result.text)
+        return results
     
     def transcribe_audio_data(self, audio):
         """Transcribe audio data directly."""
@@ -49,24 +173,19 @@ class Transcriber:
                 stt_task = "translate"
 
             # Now just call transcribe without translate_to=...
-            segments, info = self.model.transcribe(
-                audio,
-                language=stt_language,
-                task=stt_task
-            )
-
-            # Combine segments and clean up
-            text = "".join(s.text for s in segments)
-
-            # Remove known hallucinations
-            for pattern in self.config.hallucinations_regex:
-                text = pattern.sub("", text)
-
-            # Clean up leading whitespace
-            if text and text[0].isspace():
-                text = text[1:]
-
-            return text
+            self.wait_until_loaded()
+            with self.scheduler.slot(INTERACTIVE), TRACER.span("decode"):
+                segments, info = self.model.transcribe(
+                    audio,
+                    language=stt_language,
+                    task=stt_task,
+                    suppress_tokens=self.batch_decoder.suppress_tokens_for()
+                )
+                text = "".join(s.text for s in segments)  # Segments are decoded lazily
+
+            # Remove known hallucinations and leading whitespace
+            with TRACER.span("filter"):
+                return self.clean_text(text)
         except Exception as e:
             self.console.print(f"[bold red]Transcription failed: {e}[/bold red]")
             return ""
@@ -97,21 +216,18 @@ class Transcriber:
             if language not in ["en", "el"]:
                 task = "translate"  # Translates to English automatically
 
-            segments, info = self.model.transcribe(
-                audio_path,
-                language=language,
-                task=task
-            )
-
-            text = "".join(s.text for s in segments)
-
-            for pattern in self.config.hallucinations_regex:
-                text = pattern.sub("", text)
-
-            if text and text[0].isspace():
-                text = text[1:]
-
-            return text
+            self.wait_until_loaded()
+            with self.scheduler.slot(INTERACTIVE), TRACER.span("decode"):
+                segments, info = self.model.transcribe(
+                    audio_path,
+                    language=language,
+                    task=task,
+                    suppress_tokens=self.batch_decoder.suppress_tokens_for()
+                )
+                text = "".join(s.text for s in segments)  # Segments are decoded lazily
+
+            with TRACER.span("filter"):
+                return self.clean_text(text)
         except Exception as e:
             self.console.print(f"[bold red]Transcription failed for {audio_path}: {e}[/bold red]")
             return ""
\ No newline at end of file
@@ -402,12 +402,17 @@ class UnifiedConfigDialog:
         longform_audio_dropdown.pack(side="left", padx=5)
 
         # Real Time audio source dropdown
-        realtime_audio_var = tk.StringVar(value="Microphone" if not self.config.realtime_use_system_audio else "System Audio")
+        if self.config.realtime_dual_source:
+            realtime_audio_value = "Both"
+        else:
+            realtime_audio_value = "Microphone" if not self.config.realtime_use_system_audio else "System Audio"
+        realtime_audio_var = tk.StringVar(value=realtime_audio_value)
         realtime_audio_dropdown = tk.OptionMenu(
             audio_row, 
             realtime_audio_var, 
             "Microphone", 
-            "System Audio"
+            "System Audio",
+            "Both"
         )
         realtime_audio_dropdown.config(
             bg=entry_bg, 
@@ -622,6 +627,7 @@ class UnifiedConfigDialog:
             "realtime_language": None,
             "longform_use_system_audio": None,
             "realtime_use_system_audio": None,
+            "realtime_dual_source": None,
             "longform_model_name": None,
             "realtime_model_name": None,
             "send_enter": None
@@ -666,7 +672,11 @@ class UnifiedConfigDialog:
             result["longform_language"] = longform_selection
             result["realtime_language"] = realtime_selection
             result["longform_use_system_audio"] = (longform_audio_var.get() == "System Audio")
-            result["realtime_use_system_audio"] = (realtime_audio_var.get() == "System Audio")
+            if realtime_audio_var.get() == "Both":
+                result["realtime_use_system_audio"] = self.config.realtime_use_system_audio
+            else:
+                result["realtime_use_system_audio"] = (realtime_audio_var.get() == "System Audio")
+            result["realtime_dual_source"] = (realtime_audio_var.get() == "Both")
             result["longform_model_name"] = longform_model_var.get()
             result["realtime_model_name"] = realtime_model_var.get()
             result["send_enter"] = enter_var.get()
@@ -0,0 +1,302 @@
+# voice_activity_detection.py
+#
+# Pluggable Voice Activity Detection (VAD) backends shared by all pipelines
+#
+# This module:
+# - Defines a common backend interface used by the real-time handler and the
+#   static file processor (frame-level and chunk-level speech decisions)
+# - Wraps WebRTC VAD when `webrtcvad` is installed
+# - Ships a pure NumPy energy + spectral-flatness detector that needs no extra
+#   dependencies, so missing packages never turn every block into "speech"
+# - Optionally runs a local Silero-style ONNX model through onnxruntime
+# - Selects a backend by name with a graceful fallback chain
+#   (onnx -> webrtc -> energy)
+#
+# All backends consume 16-bit little-endian mono PCM, either as raw bytes
+# (one frame at a time) or as an int16 NumPy array (many frames at once)
+
+import os
+from collections import deque
+import numpy as np
+
+# Optional dependencies
+try:
+    import webrtcvad
+    WEBRTC_VAD_AVAILABLE = True
+except ImportError:
+    WEBRTC_VAD_AVAILABLE = False
+
+try:
+    import onnxruntime
+    ONNX_RUNTIME_AVAILABLE = True
+except ImportError:
+    ONNX_RUNTIME_AVAILABLE = False
+
+
+class VADBackend:
+    """Base class for frame-based voice activity detectors."""
+
+    name = "base"
+
+    def __init__(self, sample_rate: int = 16000, frame_samples: int = None, frame_ms: int = 30):
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples if frame_samples else int(sample_rate * frame_ms / 1000)
+        self.frame_bytes = self.frame_samples * 2  # 16-bit samples = 2 bytes each
+
+    @property
+    def frame_duration(self) -> float:
+        """Duration of one analysis frame in seconds."""
+        return self.frame_samples / self.sample_rate
+
+    def is_speech(self, frame: bytes) -> bool:
+        """Classify a single frame of exactly `frame_bytes` bytes."""
+        raise NotImplementedError
+
+    def speech_flags(self, samples: np.ndarray) -> np.ndarray:
+        """Classify every full frame of an int16 sample array (trailing partial frame is ignored)."""
+        n_frames = len(samples) // self.frame_samples
+        frames = np.asarray(samples[:n_frames * self.frame_samples], dtype=np.int16).reshape(n_frames, self.frame_samples)
+        return np.fromiter((self.is_speech(frame.tobytes()) for frame in frames), dtype=bool, count=n_frames)
+
+    def chunk_is_speech(self, chunk: bytes, min_ratio: float = 0.25) -> bool:
+        """Decide whether a capture chunk contains speech (more than `min_ratio` of its frames)."""
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        if len(samples) < self.frame_samples:
+            return False
+
+        flags = self.speech_flags(samples)
+        return flags.size > 0 and flags.mean() > min_ratio
+
+    def reset(self) -> None:
+        """Forget any adaptive state (called when a new stream starts)."""
+        pass
+
+    def warmup_start(self, start: int) -> int:
+        """Where to start feeding audio so the adaptive state at `start` matches a run from sample 0.
+
+        Used when a file is classified in shards; backends without adaptive state return `start`.
+        """
+        return start
+
+
+class WebRTCVADBackend(VADBackend):
+    """WebRTC VAD (GMM based, 10/20/30 ms frames)."""
+
+    name = "webrtc"
+
+    def __init__(self, sample_rate: int = 16000, aggressiveness: int = 3, frame_ms: int = 30):
+        if not WEBRTC_VAD_AVAILABLE:
+            raise RuntimeError("webrtcvad is not installed")
+        if sample_rate not in (8000, 16000, 32000, 48000):
+            raise ValueError(f"WebRTC VAD does not support a sample rate of {sample_rate} Hz")
+        if frame_ms not in (10, 20, 30):
+            raise ValueError("WebRTC VAD only supports 10, 20 or 30 ms frames")
+
+        super().__init__(sample_rate, frame_ms=frame_ms)
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame: bytes) -> bool:
+        try:
+            return self.vad.is_speech(frame, self.sample_rate)
+        except Exception:
+            return False
+
+
+class EnergySpectralVADBackend(VADBackend):
+    """Dependency-free detector combining frame energy with spectral flatness.
+
+    A frame is speech when its energy rises far enough above an adaptive noise
+    floor AND its spectrum in the voice band is "peaky" (low flatness), which
+    rejects steady broadband noise such as fans or hiss.
+
+    The noise floor is the quietest frame of the last HISTORY_SECONDS
+    (minimum statistics), kept as one minimum per sub-window. Speech only
+    raises it after it went on without a single quiet frame for that long,
+    however small the blocks it arrives in.
+    """
+
+    name = "energy"
+
+    # Indexed by aggressiveness (0 = most permissive, 3 = strictest), mirroring WebRTC VAD
+    MARGIN_DB = (6.0, 9.0, 12.0, 15.0)
+    MAX_FLATNESS = (0.55, 0.45, 0.35, 0.30)
+    HISTORY_SECONDS = 10.0
+    SUBWINDOW_SECONDS = 0.5
+
+    def __init__(self, sample_rate: int = 16000, aggressiveness: int = 3, frame_ms: int = 30,
+                 min_energy_db: float = -55.0):
+        super().__init__(sample_rate, frame_ms=frame_ms)
+        level = min(max(int(aggressiveness), 0), 3)
+        self.margin_db = self.MARGIN_DB[level]
+        self.max_flatness = self.MAX_FLATNESS[level]
+        self.min_energy_db = min_energy_db
+        self.subwindow_frames = max(1, int(round(self.SUBWINDOW_SECONDS / self.frame_duration)))
+        self.history = deque(maxlen=max(1, int(round(self.HISTORY_SECONDS / self.SUBWINDOW_SECONDS))))
+        self.reset()
+
+        # Precompute the analysis window and the voice band (100 Hz - 4 kHz) bins
+        self.window = np.hanning(self.frame_samples).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_samples, d=1.0 / sample_rate)
+        self.band = (freqs >= 100.0) & (freqs <= 4000.0)
+
+    def reset(self) -> None:
+        self.noise_floor_db = None
+        self.history.clear()
+        self.subwindow_min = float("inf")   # Quietest frame of the sub-window being filled
+        self.subwindow_count = 0
+
+    def frame_features(self, frames: np.ndarray):
+        """Return (energy_db, spectral_flatness) for a 2-D block of int16 frames."""
+        x = frames.astype(np.float32) / 32768.0
+        energy = np.mean(x * x, axis=1)
+        energy_db = 10.0 * np.log10(energy + 1e-12)
+
+        power = np.abs(np.fft.rfft(x * self.window, axis=1))[:, self.band] ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        return energy_db, flatness
+
+    def _update_noise_floor(self, energy_db: np.ndarray) -> float:
+        """Add this block's frames to the history; the floor is its quietest frame."""
+        position = 0
+        while position < len(energy_db):
+            take = min(len(energy_db) - position, self.subwindow_frames - self.subwindow_count)
+            self.subwindow_min = min(self.subwindow_min, float(energy_db[position:position + take].min()))
+            self.subwindow_count += take
+            position += take
+            if self.subwindow_count == self.subwindow_frames:
+                self.history.append(self.subwindow_min)
+                self.subwindow_min, self.subwindow_count = float("inf"), 0
+        self.noise_floor_db = min(min(self.history, default=self.subwindow_min), self.subwindow_min)
+        return self.noise_floor_db
+
+    def warmup_start(self, start: int) -> int:
+        # A full history of sub-windows, aligned with the sub-windows of a run from sample 0
+        subwindow_samples = self.subwindow_frames * self.frame_samples
+        return max(0, (start - self.history.maxlen * subwindow_samples) // subwindow_samples * subwindow_samples)
+
+    def classify_frames(self, frames: np.ndarray) -> np.ndarray:
+        """Classify a 2-D block of int16 frames with a single vectorized pass."""
+        if len(frames) == 0:
+            return np.zeros(0, dtype=bool)
+
+        energy_db, flatness = self.frame_features(frames)
+        floor = self._update_noise_floor(energy_db)
+        threshold = max(floor + self.margin_db, self.min_energy_db)
+        return (energy_db > threshold) & (flatness < self.max_flatness)
+
+    def speech_flags(self, samples: np.ndarray) -> np.ndarray:
+        n_frames = len(samples) // self.frame_samples
+        frames = np.asarray(samples[:n_frames * self.frame_samples], dtype=np.int16).reshape(n_frames, self.frame_samples)
+        return self.classify_frames(frames)
+
+    def is_speech(self, frame: bytes) -> bool:
+        frames = np.frombuffer(frame, dtype=np.int16).reshape(1, -1)
+        return bool(self.classify_frames(frames)[0])
+
+
+class OnnxVADBackend(VADBackend):
+    """Silero-style ONNX VAD model loaded from a local file (v4 and v5 signatures)."""
+
+    name = "onnx"
+
+    # Speech probability thresholds indexed by aggressiveness
+    THRESHOLDS = (0.3, 0.4, 0.5, 0.6)
+
+    def __init__(self, model_path: str, sample_rate: int = 16000, aggressiveness: int = 3):
+        if not ONNX_RUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed")
+        if not model_path or not os.path.isfile(model_path):
+            raise FileNotFoundError(f"ONNX VAD model not found: {model_path}")
+        if sample_rate not in (8000, 16000):
+            raise ValueError(f"ONNX VAD does not support a sample rate of {sample_rate} Hz")
+
+        # Silero models use 512-sample windows at 16 kHz and 256 at 8 kHz
+        super().__init__(sample_rate, frame_samples=512 if sample_rate == 16000 else 256)
+        self.threshold = self.THRESHOLDS[min(max(int(aggressiveness), 0), 3)]
+
+        options = onnxruntime.SessionOptions()
+        options.inter_op_num_threads = 1
+        options.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                    providers=["CPUExecutionProvider"])
+        input_names = {i.name for i in self.session.get_inputs()}
+        self.is_v5 = "state" in input_names
+        self.context_samples = 64 if sample_rate == 16000 else 32
+        self.reset()
+
+    def reset(self) -> None:
+        if self.is_v5:
+            self.state = np.zeros((2, 1, 128), dtype=np.float32)
+            self.context = np.zeros((1, self.context_samples), dtype=np.float32)
+        else:
+            self.h = np.zeros((2, 1, 64), dtype=np.float32)
+            self.c = np.zeros((2, 1, 64), dtype=np.float32)
+
+    def speech_probability(self, frame: np.ndarray) -> float:
+        """Run the model on one int16 frame and return its speech probability."""
+        x = (frame.astype(np.float32) / 32768.0).reshape(1, -1)
+        sr = np.array(self.sample_rate, dtype=np.int64)
+
+        if self.is_v5:
+            x_in = np.concatenate([self.context, x], axis=1)
+            out, self.state = self.session.run(None, {"input": x_in, "state": self.state, "sr": sr})
+            self.context = x_in[:, -self.context_samples:]
+        else:
+            out, self.h, self.c = self.session.run(None, {"input": x, "sr": sr, "h": self.h, "c": self.c})
+        return float(np.ravel(out)[0])
+
+    def is_speech(self, frame: bytes) -> bool:
+        return self.speech_probability(np.frombuffer(frame, dtype=np.int16)) >= self.threshold
+
+    def speech_flags(self, samples: np.ndarray) -> np.ndarray:
+        n_frames = len(samples) // self.frame_samples
+        frames = np.asarray(samples[:n_frames * self.frame_samples], dtype=np.int16).reshape(n_frames, self.frame_samples)
+        return np.fromiter((self.speech_probability(f) >= self.threshold for f in frames), dtype=bool, count=n_frames)
+
+
+VAD_BACKENDS = {
+    WebRTCVADBackend.name: WebRTCVADBackend,
+    EnergySpectralVADBackend.name: EnergySpectralVADBackend,
+    OnnxVADBackend.name: OnnxVADBackend,
+}
+
+
+def available_vad_backends() -> list:
+    """Names of the backends that can be constructed in this environment."""
+    names = []
+    if ONNX_RUNTIME_AVAILABLE:
+        names.append(OnnxVADBackend.name)
+    if WEBRTC_VAD_AVAILABLE:
+        names.append(WebRTCVADBackend.name)
+    names.append(EnergySpectralVADBackend.name)
+    return names
+
+
+def create_vad_backend(name: str = "webrtc", sample_rate: int = 16000, aggressiveness: int = 3,
+                       model_path: str = None, console=None) -> VADBackend:
+    """Create the requested VAD backend, falling back to the next available one on failure."""
+    chain = {
+        "onnx": ["onnx", "webrtc", "energy"],
+        "webrtc": ["webrtc", "energy"],
+        "energy": ["energy"],
+    }.get((name or "webrtc").lower(), ["webrtc", "energy"])
+
+    for candidate in chain:
+        try:
+            if candidate == "onnx":
+                backend = OnnxVADBackend(model_path, sample_rate, aggressiveness)
+            elif candidate == "webrtc":
+                backend = WebRTCVADBackend(sample_rate, aggressiveness)
+            else:
+                backend = EnergySpectralVADBackend(sample_rate, aggressiveness)
+        except Exception as e:
+            if console is not None:
+                console.print(f"[yellow]VAD backend '{candidate}' unavailable ({e}). Trying next fallback.[/yellow]")
+            continue
+
+        if console is not None and candidate != chain[0]:
+            console.print(f"[yellow]Using '{candidate}' VAD backend instead of '{name}'.[/yellow]")
+        return backend
+
+    # The energy backend has no dependencies, so this is only reached on invalid parameters
+    raise RuntimeError(f"No VAD backend could be created for sample rate {sample_rate} Hz")
@@ -0,0 +1,392 @@
+# websocket_streaming.py
+#
+# WebSocket endpoint for streaming transcription with the real-time pipeline
+#
+# Local clients stream 16 kHz mono 16-bit PCM to ws://127.0.0.1:<port>/v1/stream
+# (optionally ?language=el) and receive JSON messages as results are produced:
+#   {"type": "ready", "session": id}
+#   {"type": "partial", "utterance": n, "text": ...}        while speech goes on
+#   {"type": "final", "utterance": n, "text": ..., "start": s, "end": s, "latency_ms": ms}
+#   {"type": "done"}                                        after {"type": "end"} from the client
+#
+# This module:
+# - Gives every session its own SpeechSegmenter (VAD backend, adaptive
+#   endpointing, cached features), driven by the audio clock of the stream
+#   instead of a PyAudio device
+# - Decodes all sessions on one shared model (the real-time model, or the
+#   long-form model as for local real-time transcription) through a fair
+#   scheduler: sessions are served round-robin, one item each per batch,
+#   finals before partials, and a newer partial replaces an older one
+# - Applies backpressure: a session that sends faster than real time (beyond a
+#   short burst) or has too many finals waiting stops being read, so TCP flow
+#   control slows the client down
+#
+# Needs the optional 'websockets' package; disabled unless websocket_enabled is set
+
+import json
+import time
+import asyncio
+import threading
+import collections
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from voice_activity_detection import create_vad_backend
+from realtime_endpointing import AdaptiveEndpointer
+from realtime_segmenter import SpeechSegmenter
+from metrics import TRANSCRIPTION_SECONDS, AUDIO_SECONDS, QUEUE_WAIT_SECONDS
+from model_scheduler import INTERACTIVE
+
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class DecodeJob:
+    """One partial or final decode of a session's utterance."""
+    session_id: int
+    kind: str                        # "partial" or "final"
+    utterance: int
+    audio: np.ndarray
+    features: Optional[np.ndarray]
+    language: str
+    beam_size: int
+    deliver: Callable[[str], None]
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+class FairDecodeScheduler:
+    """Shares one model between sessions: round-robin batches, finals first, partials coalesced."""
+
+    def __init__(self, decode: Callable[[List[DecodeJob]], List[str]], console, max_batch: int = 4):
+        self.decode = decode
+        self.console = console
+        self.max_batch = max(1, max_batch)
+        self.cond = threading.Condition()
+        self.order: Deque[int] = collections.deque()     # Sessions in round-robin order
+        self.finals: Dict[int, Deque[DecodeJob]] = {}
+        self.partials: Dict[int, DecodeJob] = {}
+        self.outstanding: Dict[int, int] = {}            # Finals submitted but not yet delivered
+        self.keep_running = True
+        self.thread = threading.Thread(target=self._run, name="stream-decoder", daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        with self.cond:
+            self.keep_running = False
+            self.cond.notify_all()
+
+    def add_session(self, session_id: int) -> None:
+        with self.cond:
+            self.order.append(session_id)
+            self.finals[session_id] = collections.deque()
+            self.outstanding[session_id] = 0
+
+    def remove_session(self, session_id: int) -> None:
+        with self.cond:
+            if session_id in self.order:
+                self.order.remove(session_id)
+            self.finals.pop(session_id, None)
+            self.partials.pop(session_id, None)
+            self.outstanding.pop(session_id, None)
+
+    def pending_finals(self, session_id: int) -> int:
+        """Finals of the session that are queued or being decoded."""
+        with self.cond:
+            return self.outstanding.get(session_id, 0)
+
+    def submit(self, job: DecodeJob) -> None:
+        with self.cond:
+            if job.session_id not in self.finals:
+                return
+            if job.kind == "final":
+                self.finals[job.session_id].append(job)
+                self.outstanding[job.session_id] += 1
+                self.partials.pop(job.session_id, None)  # Superseded by the final
+            else:
+                self.partials[job.session_id] = job
+            self.cond.notify()
+
+    def _has_work(self) -> bool:
+        return bool(self.partials) or any(self.finals.values())
+
+    def _next_batch(self) -> List[DecodeJob]:
+        """At most one job per session, starting after the session served last."""
+        with self.cond:
+            while self.keep_running and not self._has_work():
+                self.cond.wait()
+            batch = []
+            for _ in range(len(self.order)):
+                session_id = self.order[0]
+                self.order.rotate(-1)
+                if self.finals[session_id]:
+                    batch.append(self.finals[session_id].popleft())
+                elif session_id in self.partials:
+                    batch.append(self.partials.pop(session_id))
+                if len(batch) >= self.max_batch:
+                    break
+            return batch
+
+    def _run(self) -> None:
+        while self.keep_running:
+            batch = self._next_batch()
+            # One model call per language/beam size
+            groups: Dict[tuple, List[DecodeJob]] = {}
+            for job in batch:
+                groups.setdefault((job.language, job.beam_size), []).append(job)
+            for group in groups.values():
+                start = time.perf_counter()
+                for job in group:
+                    QUEUE_WAIT_SECONDS.observe(start - job.enqueued, queue=f"websocket_{job.kind}s")
+                try:
+                    texts = self.decode(group)
+                    TRANSCRIPTION_SECONDS.observe(time.perf_counter() - start, pipeline="websocket")
+                    AUDIO_SECONDS.inc(sum(len(job.audio) for job in group) / SAMPLE_RATE, pipeline="websocket")
+                except Exception as e:
+                    self.console.print(f"[red]Streaming decode failed: {e}[/red]")
+                    texts = [""] * len(group)
+                for job, text in zip(group, texts):
+                    job.deliver(text)
+                    if job.kind == "final":
+                        with self.cond:
+                            if job.session_id in self.outstanding:
+                                self.outstanding[job.session_id] -= 1
+
+
+class StreamingSession:
+    """Per-client state: segmenter on the stream's audio clock, utterance numbering, pacing."""
+
+    def __init__(self, session_id: int, segmenter: SpeechSegmenter, language: str, chunk: int):
+        self.id = session_id
+        self.segmenter = segmenter
+        self.language = language
+        self.chunk_bytes = chunk * 2
+        self.pending = bytearray()
+        self.samples = 0                 # Audio received so far
+        self.started = time.monotonic()
+        self.utterance = 0               # Index of the utterance in progress
+        self.last_partial_samples = 0
+        self.partial_in_flight = False
+        self.sends = []                  # Result messages scheduled from the decoder thread
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.samples / SAMPLE_RATE
+
+
+class StreamingServer:
+    def __init__(self, config, console, realtime_handler, transcriber):
+        self.config = config
+        self.console = console
+        self.realtime_handler = realtime_handler
+        self.transcriber = transcriber
+        self.scheduler = FairDecodeScheduler(self._decode, console, max_batch=config.websocket_max_batch)
+        self.sessions: Dict[int, StreamingSession] = {}
+        self.next_session_id = 1
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.port = config.websocket_port
+        self.burst_seconds = 2.0            # Audio a client may send ahead of real time
+        self.max_pending_finals = 4         # Finals waiting for the model before reading pauses
+
+    # ------------------------------------------------------------------ model
+    def _decode(self, jobs: List[DecodeJob]) -> List[str]:
+        handler = self.realtime_handler
+        use_realtime = handler.realtime_model_loaded and not (
+            handler._is_turbo_model() and jobs[0].language not in ("en", "el"))
+        if not use_realtime:
+            self.transcriber.wait_until_loaded()
+        decoder = handler.batch_decoder if use_realtime else self.transcriber.batch_decoder
+        task = "transcribe" if jobs[0].language in ("en", "el") else "translate"
+        features = [job.features for job in jobs] if all(job.features is not None for job in jobs) else None
+        if use_realtime:
+            results = decoder.transcribe_batch([job.audio for job in jobs], features=features,
+                                               language=jobs[0].language, task=task, beam_size=jobs[0].beam_size)
+        else:
+            # The long-form model is shared with the other pipelines
+            with self.transcriber.scheduler.slot(INTERACTIVE):
+                results = decoder.transcribe_batch([job.audio for job in jobs], features=features,
+                                                   language=jobs[0].language, task=task, beam_size=jobs[0].beam_size)
+        return [self.transcriber.clean_text(r.text).strip() for r in results]
+
+    def _create_segmenter(self, session_id: int) -> SpeechSegmenter:
+        handler = self.realtime_handler
+        vad_backend = create_vad_backend(self.config.vad_backend, sample_rate=SAMPLE_RATE, aggressiveness=3,
+                                         model_path=self.config.vad_onnx_model_path, console=self.console)
+        endpointer = AdaptiveEndpointer(default_silence_ms=handler.silence_threshold_ms,
+                                        adaptive=self.config.realtime_adaptive_endpointing)
+        # No early-finalize tail decode: it would run the model on the event loop
+        return SpeechSegmenter(f"ws-{session_id}", vad_backend, endpointer, rate=SAMPLE_RATE, chunk=self.config.chunk,
+                               feature_extractor=handler.realtime_model.feature_extractor if handler.realtime_model_loaded else None,
+                               context_chunks=handler.context_chunks)
+
+    # ------------------------------------------------------------------ server
+    def start(self) -> None:
+        if not WEBSOCKETS_AVAILABLE:
+            self.console.print("[red]WebSocket streaming needs the 'websockets' package (pip install websockets)[/red]")
+            return
+        # Sessions decode with the real-time model, like local real-time transcription
+        self.realtime_handler._load_realtime_model()
+        self.scheduler.start()
+        self.thread = threading.Thread(target=self._serve, name="websocket-server", daemon=True)
+        self.thread.start()
+        self.ready.wait(5.0)
+
+    async def _open_server(self):
+        # Created inside the running loop (newer websockets versions require it)
+        return await websockets.serve(self._handle, "127.0.0.1", self.port, max_size=2 ** 20, max_queue=8)
+
+    def _serve(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            server = self.loop.run_until_complete(self._open_server())
+            self.port = server.sockets[0].getsockname()[1]
+            self.console.print(f"[bold yellow]WebSocket streaming on ws://127.0.0.1:{self.port}/v1/stream[/bold yellow]")
+            self.ready.set()
+            self.loop.run_forever()
+            server.close()
+            self.loop.run_until_complete(server.wait_closed())
+        except Exception as e:
+            self.console.print(f"[bold red]WebSocket server error: {e}[/bold red]")
+        finally:
+            self.ready.set()
+            self.loop.close()
+
+    def stop(self) -> None:
+        self.scheduler.stop()
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+
+    @property
+    def session_count(self) -> int:
+        return len(self.sessions)
+
+    # ------------------------------------------------------------------ sessions
+    def _send_threadsafe(self, websocket, session: StreamingSession, payload: Dict) -> None:
+        """Results are produced on the decoder thread; sending happens on the event loop."""
+        async def send():
+            try:
+                await websocket.send(json.dumps(payload, ensure_ascii=False))
+            except websockets.ConnectionClosed:
+                pass
+        if self.loop is not None and self.loop.is_running():
+            session.sends = [f for f in session.sends if not f.done()]
+            session.sends.append(asyncio.run_coroutine_threadsafe(send(), self.loop))
+
+    def _submit_final(self, websocket, session: StreamingSession, utterance) -> None:
+        index = session.utterance
+        session.utterance += 1
+        session.partial_in_flight = False
+        job = None
+
+        def deliver(text: str):
+            # From end-of-utterance detection to the result (queueing + decoding)
+            latency_ms = (time.perf_counter() - job.enqueued) * 1000
+            self._send_threadsafe(websocket, session, {"type": "final", "utterance": index, "text": text,
+                                              "start": round(utterance.start_time, 2), "end": round(utterance.end_time, 2),
+                                              "latency_ms": round(latency_ms, 1)})
+
+        job = DecodeJob(session.id, "final", index, utterance.audio, utterance.features,
+                        session.language, self.realtime_handler.beam_size_realtime, deliver)
+        self.scheduler.submit(job)
+
+    def _submit_partial(self, websocket, session: StreamingSession) -> None:
+        audio = session.segmenter.snapshot()
+        if audio is None:
+            return
+        index = session.utterance
+        session.partial_in_flight = True
+        session.last_partial_samples = session.samples
+
+        def deliver(text: str):
+            session.partial_in_flight = False
+            # A partial that arrives after its utterance was finalized is dropped
+            if index == session.utterance and text:
+                self._send_threadsafe(websocket, session, {"type": "partial", "utterance": index, "text": text})
+
+        self.scheduler.submit(DecodeJob(session.id, "partial", index, audio, None, session.language, 1, deliver))
+
+    def _feed(self, websocket, session: StreamingSession, data: bytes) -> None:
+        """Cut the client's frames into capture chunks and run them through the segmenter."""
+        session.pending += data
+        while len(session.pending) >= session.chunk_bytes:
+            chunk = bytes(session.pending[:session.chunk_bytes])
+            del session.pending[:session.chunk_bytes]
+            session.samples += len(chunk) // 2
+            utterance = session.segmenter.process(chunk, now=session.audio_seconds)
+            if utterance is not None:
+                self._submit_final(websocket, session, utterance)
+            elif (session.segmenter.is_speech_active and not session.partial_in_flight
+                  and session.samples - session.last_partial_samples
+                  >= self.config.websocket_partial_interval_ms * SAMPLE_RATE // 1000):
+                self._submit_partial(websocket, session)
+
+    async def _throttle(self, session: StreamingSession) -> None:
+        """Backpressure: stop reading while the client is ahead of real time or its finals queue up."""
+        max_speed = max(self.config.websocket_max_speed, 0.01)
+        ahead = session.audio_seconds / max_speed - (time.monotonic() - session.started)
+        if ahead > self.burst_seconds:
+            await asyncio.sleep(ahead - self.burst_seconds)
+        while self.scheduler.pending_finals(session.id) >= self.max_pending_finals:
+            await asyncio.sleep(0.05)
+
+    async def _handle(self, websocket, path: Optional[str] = None):
+        request = getattr(websocket, "request", None)
+        path = path or (request.path if request is not None else getattr(websocket, "path", "/"))
+        url = urlparse(path)
+        if url.path != "/v1/stream":
+            await websocket.close(code=4404, reason="unknown path")
+            return
+        if len(self.sessions) >= self.config.websocket_max_sessions:
+            await websocket.close(code=1013, reason="too many sessions")
+            return
+
+        language = parse_qs(url.query).get("language", [self.config.realtime_language])[0]
+        session_id = self.next_session_id
+        self.next_session_id += 1
+        session = StreamingSession(session_id, self._create_segmenter(session_id), language, self.config.chunk)
+        self.sessions[session_id] = session
+        self.scheduler.add_session(session_id)
+        self.console.print(f"[cyan]WebSocket session {session_id} started ({language})[/cyan]")
+
+        try:
+            await websocket.send(json.dumps({"type": "ready", "session": session_id}))
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    await self._throttle(session)
+                    self._feed(websocket, session, message)
+                    continue
+                try:
+                    command = json.loads(message)
+                except json.JSONDecodeError:
+                    command = {}
+                if command.get("type") == "end":
+                    utterance = session.segmenter.flush()
+                    if utterance is not None:
+                        self._submit_final(websocket, session, utterance)
+                    # Wait for the outstanding finals, then say goodbye
+                    while self.scheduler.pending_finals(session_id):
+                        await asyncio.sleep(0.05)
+                    for future in list(session.sends):
+                        await asyncio.wrap_future(future)  # Results go out before "done"
+                    await websocket.send(json.dumps({"type": "done"}))
+                    break
+                await websocket.send(json.dumps({"type": "error", "error": "expected binary PCM or {\"type\": \"end\"}"}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.scheduler.remove_session(session_id)
+            self.sessions.pop(session_id, None)
+            self.console.print(f"[cyan]WebSocket session {session_id} closed ({session.audio_seconds:.0f} s of audio)[/cyan]")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# command_rtt_benchmark.py
+#
+# Round-trip latency of the command server under concurrent senders
+#
+# Every sender thread sends PING (or STATUS) commands and waits for each JSON
+# reply, either over one persistent connection or with a new connection per
+# command (the way the AHK hotkeys talk to the app). Optionally a slow command
+# is fired while the senders run, to check that it does not hold up the others.
+#
+# Reported:
+# - Round-trip percentiles (p50/p90/p99/max) in milliseconds
+# - Commands per second over all senders
+# - Errors (refused connections, error replies)
+#
+# Usage:
+#   python command_rtt_benchmark.py [--host 127.0.0.1] [--port 34909] [--senders 8] [--commands 500]
+#                                   [--command PING] [--one-shot] [--slow-command OPEN_CONFIG_DIALOG]
+#                                   [--self-host]
+#
+# --self-host starts a CommandServer in this process against a stand-in app
+# (its OPEN_CONFIG_DIALOG sleeps for 2 s), so the server can be measured
+# without loading any models.
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import numpy as np
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCRIPT")
+sys.path.insert(0, os.path.abspath(SCRIPT_DIR))
+
+
+class PrintConsole:
+    def print(self, *args, **kwargs):
+        pass
+
+
+class StandInApp:
+    """Just enough of STTApp for the command server; the dialog blocks like a Tk mainloop."""
+
+    console = PrintConsole()
+
+    def status(self):
+        return {"recording": False, "realtime": False, "static": False}
+
+    def handle_queue_command(self, name, argument):
+        return {"ok": True}
+
+    def open_config_dialog(self):
+        time.sleep(2.0)
+
+    def shutdown(self):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def send_persistent(host, port, command, count, latencies, errors):
+    with socket.create_connection((host, port)) as sock:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = sock.makefile('rwb')
+        for _ in range(count):
+            start = time.perf_counter()
+            stream.write((command + "\n").encode('utf-8'))
+            stream.flush()
+            reply = stream.readline()
+            latencies.append(time.perf_counter() - start)
+            if not reply or not json.loads(reply).get("ok"):
+                errors.append(reply)
+
+
+def send_one_shot(host, port, command, count, latencies, errors):
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((host, port)) as sock:
+                sock.sendall((command + "\n").encode('utf-8'))
+                sock.shutdown(socket.SHUT_WR)
+                reply = sock.makefile('rb').readline()
+        except OSError as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+        if not reply or not json.loads(reply).get("ok"):
+            errors.append(reply)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure command server round-trip latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=34909)
+    parser.add_argument("--senders", type=int, default=8, help="Concurrent sender threads")
+    parser.add_argument("--commands", type=int, default=500, help="Commands per sender")
+    parser.add_argument("--command", default="PING", help="Command to time (PING or STATUS)")
+    parser.add_argument("--one-shot", action="store_true", help="New connection per command (like the AHK hotkeys)")
+    parser.add_argument("--slow-command", default=None, help="Send this command once while the senders run")
+    parser.add_argument("--self-host", action="store_true", help="Run a CommandServer in-process against a stand-in app")
+    args = parser.parse_args()
+
+    server = None
+    if args.self_host:
+        from main import CommandServer
+        server = CommandServer(StandInApp(), host=args.host, port=0)
+        server.start()
+        server.ready.wait()
+        args.port = server.port
+
+    sender = send_one_shot if args.one_shot else send_persistent
+    latencies, errors = [], []
+    threads = [threading.Thread(target=sender, args=(args.host, args.port, args.command, args.commands, latencies, errors))
+               for _ in range(args.senders)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    if args.slow_command:
+        slow_latencies, slow_errors = [], []
+        send_persistent(args.host, args.port, args.slow_command, 1, slow_latencies, slow_errors)
+        print(f"Slow command {args.slow_command} acknowledged in {slow_latencies[0] * 1000:.2f} ms")
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    mode = "one connection per command" if args.one_shot else "persistent connections"
+    print(f"{len(ms)} x {args.command} from {args.senders} senders ({mode}) in {wall:.2f} s "
+          f"-> {len(ms) / wall:.0f} commands/s")
+    if len(ms):
+        print(f"Round trip: p50 {np.percentile(ms, 50):.3f} ms   p90 {np.percentile(ms, 90):.3f} ms   "
+              f"p99 {np.percentile(ms, 99):.3f} ms   max {ms.max():.3f} ms")
+    print(f"Errors: {len(errors)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# hallucination_report.py
+#
+# Measures what the decode-time hallucination lexicon saves
+#
+# Cuts an audio file (by default the WER test audio) into 30 s windows - plus
+# the same number of near-silent windows, where Whisper hallucinates most -
+# and decodes them twice with the batched decoder:
+# - without the lexicon (regex filters only, the old behaviour)
+# - with the lexicon (single-token phrases suppressed, phrase-free beam
+#   hypotheses preferred, matched tokens cut as a last resort)
+#
+# Reported per run:
+# - Decode wall time and generated text tokens
+# - Hallucination hits the regex safety net still had to remove
+# - Lexicon statistics: hallucinated tokens, rerouted/stripped/emptied items
+#   and the decode time the model spent on hallucinated tokens
+#
+# Usage:
+#   python hallucination_report.py [audio_file] [--model NAME] [--language el] [--beam-size 5]
+#                                  [--windows 16] [--output report.json]
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+import torch
+from faster_whisper import WhisperModel
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCRIPT")
+sys.path.insert(0, os.path.abspath(SCRIPT_DIR))
+
+from main import Config  # noqa: E402
+from batched_decoding import BatchedWhisperDecoder  # noqa: E402
+from hallucination_lexicon import HallucinationLexicon  # noqa: E402
+
+DEFAULT_AUDIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WER testing", "test3.mp3")
+SAMPLE_RATE = 16000
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+
+
+def load_audio(path: str) -> np.ndarray:
+    """Decode any ffmpeg-readable file to 16 kHz mono float32 samples."""
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def make_windows(audio: np.ndarray, count: int) -> list:
+    """Speech windows from the file and near-silent windows (attenuated noise floor) of the same length."""
+    speech = [audio[i:i + WINDOW_SAMPLES] for i in range(0, len(audio) - WINDOW_SAMPLES + 1, WINDOW_SAMPLES)][:count]
+    rng = np.random.default_rng(0)
+    silent = [(rng.standard_normal(WINDOW_SAMPLES) * 1e-3).astype(np.float32) for _ in range(len(speech))]
+    return speech + silent
+
+
+def regex_hits(texts: list, patterns: list) -> int:
+    return sum(len(p.findall(text)) for text in texts for p in patterns)
+
+
+def decode_run(decoder: BatchedWhisperDecoder, windows: list, language: str, beam_size: int, batch_size: int):
+    start = time.perf_counter()
+    texts = []
+    for i in range(0, len(windows), batch_size):
+        results = decoder.transcribe_batch(windows[i:i + batch_size], language=language, beam_size=beam_size)
+        texts.extend(r.text for r in results)
+    return texts, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the effect of decode-time hallucination suppression")
+    parser.add_argument("audio", nargs="?", default=DEFAULT_AUDIO)
+    parser.add_argument("--model", default=None, help="Model (defaults to the configured long-form model)")
+    parser.add_argument("--language", default=None, help="Language (defaults to the configured long-form language)")
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--windows", type=int, default=16, help="Speech windows to decode (as many silent ones are added)")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    config = Config.load_from_file()
+    language = args.language or config.longform_language
+    model_id = args.model or config.longform_model
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Loading {model_id} on {device}...")
+    model = WhisperModel(model_id, device=device, compute_type="float16" if device == "cuda" else "float32")
+
+    windows = make_windows(load_audio(args.audio), args.windows)
+    print(f"Decoding {len(windows)} windows of 30 s ({len(windows) // 2} speech, {len(windows) // 2} near-silent)")
+
+    plain = BatchedWhisperDecoder(model, max_batch_size=args.batch_size)
+    lexicon = HallucinationLexicon(config.hallucination_phrases)
+    filtered = BatchedWhisperDecoder(model, max_batch_size=args.batch_size, lexicon=lexicon)
+
+    # Warm-up so neither run pays for CUDA/kernel initialisation
+    decode_run(plain, windows[:1], language, args.beam_size, args.batch_size)
+    lexicon.reset_stats()
+
+    plain_texts, plain_seconds = decode_run(plain, windows, language, args.beam_size, args.batch_size)
+    filtered_texts, filtered_seconds = decode_run(filtered, windows, language, args.beam_size, args.batch_size)
+
+    tokenizer = plain._tokenizer(language, "transcribe")
+    stats = lexicon.report()
+    report = {
+        "audio": args.audio,
+        "model": model_id,
+        "windows": len(windows),
+        "regex_only": {
+            "decode_seconds": round(plain_seconds, 3),
+            "text_tokens": sum(len(tokenizer.encode(t)) for t in plain_texts),
+            "regex_hits": regex_hits(plain_texts, config.hallucinations_regex),
+        },
+        "lexicon": {
+            "decode_seconds": round(filtered_seconds, 3),
+            "text_tokens": sum(len(tokenizer.encode(t)) for t in filtered_texts),
+            "regex_hits": regex_hits(filtered_texts, config.hallucinations_regex),
+            **{k: round(v, 4) if isinstance(v, float) else v for k, v in stats.items()},
+        },
+    }
+    saved = plain_seconds - filtered_seconds
+    report["decode_seconds_saved"] = round(saved, 3)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\nRegex-only hallucination hits: {report['regex_only']['regex_hits']}  ->  "
+          f"with lexicon: {report['lexicon']['regex_hits']}")
+    print(f"Decode time: {plain_seconds:.2f} s -> {filtered_seconds:.2f} s "
+          f"({saved:+.2f} s, {100 * saved / plain_seconds if plain_seconds else 0:+.1f}%)")
+    print(f"Time the model spent on hallucinated tokens (lexicon run): {stats['hallucinated_decode_seconds']:.2f} s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
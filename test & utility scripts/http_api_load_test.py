@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# http_api_load_test.py
+#
+# Load test for the local HTTP transcription API (SCRIPT/http_api.py)
+#
+# Sends the same audio clip (by default the first seconds of the WER test
+# audio) from many concurrent clients to POST /v1/transcribe and reports:
+# - Throughput in requests/s and seconds of audio per second
+# - Latency percentiles (p50/p95/p99) and the server-side queue/decode split
+# - Mean micro-batch size seen by the requests
+# - Refused (503) and failed requests
+#
+# Usage:
+#   python http_api_load_test.py [audio_file] [--url http://127.0.0.1:34910] [--clients 16]
+#                                [--requests 200] [--clip-seconds 8] [--language el] [--self-host]
+#
+# --self-host starts the API in this process with a stand-in transcriber whose
+# batched call costs 80 ms + 15 ms per item, to check the batching and the
+# admission control without loading a model.
+
+import io
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+import numpy as np
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCRIPT")
+sys.path.insert(0, os.path.abspath(SCRIPT_DIR))
+
+from http_api import TranscriptionAPI  # noqa: E402
+
+DEFAULT_AUDIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WER testing", "test3.mp3")
+SAMPLE_RATE = 16000
+
+
+class QuietConsole:
+    def print(self, *args, **kwargs):
+        pass
+
+
+class StandInTranscriber:
+    """Costs like a batched model call: fixed overhead plus a little per item."""
+
+    num_workers = 1
+    config = SimpleNamespace(longform_language="en")
+
+    def transcribe_batch(self, audios, language=None):
+        time.sleep(0.08 + 0.015 * len(audios))
+        return [f"{len(a) / SAMPLE_RATE:.1f} s of audio" for a in audios]
+
+    def transcribe_batch_timed(self, audios, language=None):
+        texts = self.transcribe_batch(audios, language)
+        return [SimpleNamespace(text=t, segments=[(0.0, len(a) / SAMPLE_RATE, t)]) for t, a in zip(texts, audios)]
+
+
+def load_clip(path: str, seconds: float) -> bytes:
+    """First `seconds` of the file as a 16 kHz mono WAV upload."""
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", path, "-t", str(seconds), "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(result.stdout)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the HTTP transcription API")
+    parser.add_argument("audio", nargs="?", default=DEFAULT_AUDIO)
+    parser.add_argument("--url", default="http://127.0.0.1:34910")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests")
+    parser.add_argument("--clip-seconds", type=float, default=8.0, help="Audio per request")
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--self-host", action="store_true", help="Serve the API in-process with a stand-in transcriber")
+    args = parser.parse_args()
+
+    upload = load_clip(args.audio, args.clip_seconds)
+    clip_seconds = (len(upload) - 44) / 2 / SAMPLE_RATE
+
+    api = None
+    if args.self_host:
+        config = SimpleNamespace(http_api_port=0, http_api_batch_window_ms=30, http_api_max_batch=8,
+                                 http_api_max_queue=32, http_api_max_upload_mb=200,
+                                 http_api_request_timeout_s=600)
+        api = TranscriptionAPI(config, QuietConsole(), StandInTranscriber())
+        api.start(port=0)
+        args.url = f"http://127.0.0.1:{api.port}"
+
+    endpoint = args.url.rstrip("/") + "/v1/transcribe"
+    if args.language:
+        endpoint += f"?language={args.language}"
+
+    latencies, queue_ms, decode_ms, batch_sizes = [], [], [], []
+    refused, failed = [0], [0]
+    lock = threading.Lock()
+    remaining = [args.requests]
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            request = urllib.request.Request(endpoint, data=upload, headers={"Content-Type": "audio/wav"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=300) as response:
+                    reply = json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                with lock:
+                    if e.code == 503:
+                        refused[0] += 1
+                    else:
+                        failed[0] += 1
+                time.sleep(float(e.headers.get("Retry-After", 0) or 0) * 0.1)
+                continue
+            except OSError:
+                with lock:
+                    failed[0] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                queue_ms.append(reply["timings"]["queue_ms"])
+                decode_ms.append(reply["timings"]["decode_ms"])
+                batch_sizes.append(reply["timings"]["batch_size"])
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    ms = np.array(latencies) * 1000
+    print(f"{len(ms)} requests of {clip_seconds:.1f} s audio from {args.clients} clients in {wall:.2f} s")
+    if len(ms):
+        print(f"Throughput: {len(ms) / wall:.1f} requests/s, {len(ms) * clip_seconds / wall:.1f} s of audio per second")
+        print(f"Latency: p50 {np.percentile(ms, 50):.0f} ms   p95 {np.percentile(ms, 95):.0f} ms   "
+              f"p99 {np.percentile(ms, 99):.0f} ms   max {ms.max():.0f} ms")
+        print(f"Server side: queue p50 {np.percentile(queue_ms, 50):.0f} ms, decode p50 {np.percentile(decode_ms, 50):.0f} ms, "
+              f"mean batch size {np.mean(batch_sizes):.2f}")
+    print(f"Refused (503): {refused[0]}   failed: {failed[0]}")
+
+    if api is not None:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
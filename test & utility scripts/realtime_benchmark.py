@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# realtime_benchmark.py
+#
+# Headless latency/throughput harness for the real-time transcription path
+#
+# Streams an audio file (by default the WER test audio) through
+# RealtimeTranscriptionHandler in place of a capture-hub subscription, so the
+# real-time path can be tuned without talking into a microphone. The fake stream:
+# - Releases audio at 1x real time or faster (--speed)
+# - Models a bounded capture buffer and drops frames when the reader falls
+#   behind, like PortAudio does with exception_on_overflow=False
+# - Appends trailing silence so the last utterance is finalized, then ends
+#   like an input that stopped (no busy reads after the end of the file)
+#
+# The run ends once capture has stopped and every utterance it produced has
+# been decoded, so the CPU figure covers the replay and nothing else.
+#
+# Reported as JSON (and optionally compared against a previous run):
+# - Per-utterance end-of-speech-to-text latency percentiles
+# - Real-time factor (decode time / audio duration)
+# - Dropped frames
+# - CPU utilization of the process
+#
+# Usage:
+#   python realtime_benchmark.py [audio_file] [--speed 1.0] [--output run.json] [--compare old.json]
+#                                [--model NAME] [--language el] [--vad-backend webrtc]
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from typing import Optional
+import numpy as np
+import psutil
+from rich.console import Console
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCRIPT")
+sys.path.insert(0, os.path.abspath(SCRIPT_DIR))
+
+from main import Config  # noqa: E402
+from realtime_transcription_handler import RealtimeTranscriptionHandler  # noqa: E402
+from batch_transcribe import NullTray  # noqa: E402
+
+DEFAULT_AUDIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WER testing", "test3.mp3")
+
+
+def load_audio(path: str, rate: int) -> np.ndarray:
+    """Decode any ffmpeg-readable file to mono int16 samples at the given rate."""
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", path, "-vn", "-ac", "1", "-ar", str(rate), "-f", "s16le", "-"],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+class FakeStream:
+    """Replays samples like a capture subscription (audio_capture_hub.py), paced on the wall clock."""
+
+    def __init__(self, samples: np.ndarray, rate: int, chunk: int, speed: float = 1.0, buffer_frames: int = 16384,
+                 trailing_silence_s: float = 3.0):
+        self.samples = np.concatenate([samples, np.zeros(int(trailing_silence_s * rate), dtype=np.int16)])
+        self.rate = rate
+        self.chunk = chunk
+        self.speed = speed
+        self.buffer_frames = buffer_frames
+        self.position = 0
+        self.dropped_frames = 0
+        self.start_time = None
+        self.closed = False
+
+    def _available(self) -> int:
+        """Frames 'captured' so far according to the playback clock."""
+        return min(int((time.perf_counter() - self.start_time) * self.rate * self.speed), len(self.samples))
+
+    def read(self, timeout: float = 0.5) -> Optional[bytes]:
+        """Next block of `chunk` frames, paced on the playback clock (None once closed or at the end)."""
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        if self.closed:
+            return None
+        if self.position >= len(self.samples):
+            self.closed = True  # End of the file: the lane stops reading, as for an input that went away
+            return None
+        num_frames = self.chunk
+
+        # Overflow: the capture buffer only holds buffer_frames, older frames are lost
+        available = self._available()
+        if available - self.position > self.buffer_frames:
+            lost = available - self.position - self.buffer_frames
+            self.dropped_frames += lost
+            self.position += lost
+
+        # Block until enough audio has "arrived"
+        target = min(self.position + num_frames, len(self.samples))
+        while self._available() < target:
+            time.sleep(max((target - self._available()) / (self.rate * self.speed), 0.0005))
+
+        data = self.samples[self.position:target]
+        self.position = target
+        if len(data) < num_frames:
+            data = np.concatenate([data, np.zeros(num_frames - len(data), dtype=np.int16)])
+        return data.tobytes()
+
+    def close(self):
+        self.closed = True
+
+
+class NoFallbackTranscriber:
+    """Stands in for the long-form Transcriber so the harness only loads the real-time model."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_audio_data(self, audio):
+        self.calls += 1
+        return ""
+
+
+class ReplayHandler(RealtimeTranscriptionHandler):
+    """Real-time handler reading from FakeStream and timing its decodes."""
+
+    def __init__(self, stream: FakeStream, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fake_stream = stream
+        self.decode_seconds = 0.0
+        self.in_flight = 0
+        self.results = []
+        self.stats_lock = threading.Lock()
+        self.utterances_queued = 0
+        self.utterances_decoded = 0
+        self.capture_done = threading.Event()
+        self.last_utterance_done = threading.Event()   # Capture ended and every utterance was decoded
+
+    def _initialize_audio(self):
+        self.lanes = [self._create_lane("mic", self.fake_stream)]
+        return True
+
+    def _cleanup_audio(self):
+        self.fake_stream.close()
+
+    def _capture_loop(self, lane):
+        # Count the utterances the segmenter finishes (also the one flushed at the end); they are queued right after
+        segmenter = lane["segmenter"]
+
+        def counted(method):
+            def call(*args, **kwargs):
+                utterance = method(*args, **kwargs)
+                if utterance is not None:
+                    with self.stats_lock:
+                        self.utterances_queued += 1
+                return utterance
+            return call
+
+        segmenter.process = counted(segmenter.process)
+        segmenter.flush = counted(segmenter.flush)
+        try:
+            super()._capture_loop(lane)
+        finally:
+            self.capture_done.set()
+            self._check_done()
+
+    def _check_done(self):
+        with self.stats_lock:
+            if self.capture_done.is_set() and self.utterances_decoded >= self.utterances_queued:
+                self.last_utterance_done.set()
+
+    def _transcribe_utterances(self, utterances):
+        with self.stats_lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            texts = super()._transcribe_utterances(utterances)
+        finally:
+            with self.stats_lock:
+                self.decode_seconds += time.perf_counter() - start
+                self.in_flight -= 1
+                self.utterances_decoded += len(utterances)
+            self._check_done()
+        self.results.extend(texts)
+        return texts
+
+
+def compare(current: dict, previous: dict) -> None:
+    """Print the change of the headline numbers against an earlier run."""
+    rows = [
+        ("latency p50 (ms)", ("latency_ms", "p50")),
+        ("latency p95 (ms)", ("latency_ms", "p95")),
+        ("real-time factor", ("real_time_factor",)),
+        ("dropped frames", ("dropped_frames",)),
+        ("cpu % (per core)", ("cpu_percent_per_core",)),
+    ]
+    print(f"\n{'metric':<20}{'previous':>12}{'current':>12}{'change':>10}")
+    for label, path in rows:
+        old, new = previous, current
+        for key in path:
+            old, new = old.get(key, 0), new.get(key, 0)
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{label:<20}{old:>12.3f}{new:>12.3f}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay audio through the real-time transcription path")
+    parser.add_argument("audio", nargs="?", default=DEFAULT_AUDIO)
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed (1.0 = real time)")
+    parser.add_argument("--model", default=None, help="Real-time model (defaults to the configured one)")
+    parser.add_argument("--language", default=None, help="Real-time language (defaults to the configured one)")
+    parser.add_argument("--vad-backend", default=None, help="VAD backend: webrtc, energy or onnx")
+    parser.add_argument("--buffer-frames", type=int, default=16384, help="Simulated capture buffer size")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--compare", default=None, help="Previous JSON report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the handler's console output")
+    args = parser.parse_args()
+
+    config = Config.load_from_file()
+    if args.language:
+        config.realtime_language = args.language
+    if args.vad_backend:
+        config.vad_backend = args.vad_backend
+    config.realtime_dual_source = False
+
+    console = Console() if args.verbose else Console(file=io.StringIO())
+    samples = load_audio(args.audio, config.rate)
+    duration = len(samples) / config.rate
+    stream = FakeStream(samples, config.rate, config.chunk, speed=args.speed, buffer_frames=args.buffer_frames)
+
+    # No capture hub: the fake stream stands in for the lane's subscription
+    handler = ReplayHandler(stream, config, console, NoFallbackTranscriber(), NullTray(), None,
+                            model_name=args.model or config.realtime_model)
+    if not handler._load_realtime_model():
+        sys.exit("Could not load the real-time model.")
+
+    process = psutil.Process()
+    cpu_before = process.cpu_times()
+    wall_start = time.perf_counter()
+
+    handler.start()
+    if not handler.is_running:
+        sys.exit("Could not start the real-time handler.")
+    # Capture stops at the end of the file; then wait for the last utterance to be decoded
+    handler.last_utterance_done.wait()
+    handler.stop()
+
+    wall = time.perf_counter() - wall_start
+    cpu_after = process.cpu_times()
+    cpu_seconds = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+
+    stats = handler.latency_stats
+    report = {
+        "audio": os.path.abspath(args.audio),
+        "audio_seconds": round(duration, 3),
+        "speed": args.speed,
+        "model": handler.realtime_model_name,
+        "language": config.realtime_language,
+        "vad_backend": handler.lanes[0]["segmenter"].vad_backend.name if handler.lanes else config.vad_backend,
+        "utterances": len(stats.latencies),
+        "latency_ms": {
+            "p50": round(stats.percentile_ms(50), 1),
+            "p90": round(stats.percentile_ms(90), 1),
+            "p95": round(stats.percentile_ms(95), 1),
+            "p99": round(stats.percentile_ms(99), 1),
+            "max": round(stats.percentile_ms(100), 1),
+        },
+        "decode_seconds": round(handler.decode_seconds, 3),
+        "real_time_factor": round(handler.decode_seconds / duration, 4) if duration else 0.0,
+        "dropped_frames": stream.dropped_frames,
+        "dropped_seconds": round(stream.dropped_frames / config.rate, 3),
+        "wall_seconds": round(wall, 3),
+        "cpu_percent": round(cpu_seconds / wall * 100, 1) if wall else 0.0,
+        "cpu_percent_per_core": round(cpu_seconds / wall * 100 / (psutil.cpu_count() or 1), 1) if wall else 0.0,
+        "transcript": " ".join(t.strip() for t in handler.results if t),
+    }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
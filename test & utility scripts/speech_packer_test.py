@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# speech_packer_test.py
+#
+# Property check of StreamingSpeechPacker (SCRIPT/static_audio_stream.py)
+#
+# Feeds random audio in random block sizes with random VAD decisions, padding,
+# hangover and segment lengths, and checks every emitted segment:
+# - At most max_samples of speech (one decoding window, so it can be batched)
+# - Its audio is exactly the original samples of its ranges
+# - Ranges are in order and never overlap, within and across segments
+# - Segment indices count up from 0
+#
+# Usage:
+#   python speech_packer_test.py [--cases 300] [--seed 0]
+# Also collected by pytest (test_segments_never_exceed_max_samples).
+
+import os
+import sys
+import argparse
+import numpy as np
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCRIPT")
+sys.path.insert(0, os.path.abspath(SCRIPT_DIR))
+
+from static_audio_stream import StreamingSpeechPacker  # noqa: E402
+
+RATE = 16000
+FRAME = RATE // 100  # Frame size of the packer without a VAD backend (flags are passed in)
+
+
+def random_flags(rng: np.random.Generator, n_frames: int) -> np.ndarray:
+    """Speech and pauses of random lengths, from single frames to runs longer than a segment."""
+    flags = np.zeros(n_frames, dtype=bool)
+    position, speech = 0, bool(rng.integers(2))
+    while position < n_frames:
+        length = int(rng.choice([rng.integers(1, 10), rng.integers(10, 200), rng.integers(200, 1500)]))
+        flags[position:position + length] = speech
+        position += length
+        speech = not speech
+    return flags
+
+
+def run_case(rng: np.random.Generator) -> list:
+    """One random stream; returns the violated properties (empty if none)."""
+    target_seconds = float(rng.choice([1.0, 2.5, 4.0, 8.0]))
+    packer = StreamingSpeechPacker(None, RATE, target_seconds=target_seconds,
+                                   pad_ms=float(rng.choice([0, 30, 90])), hangover_ms=float(rng.choice([0, 100, 300])))
+    n_frames = int(rng.integers(50, 4000))
+    audio = rng.integers(-8000, 8000, n_frames * FRAME).astype(np.int16)
+    flags = random_flags(rng, n_frames)
+
+    segments = []
+    position = 0
+    while position < n_frames:
+        block_frames = int(rng.integers(1, 1200))
+        block = audio[position * FRAME:(position + block_frames) * FRAME]
+        segments.extend(packer.feed(block, flags[position:position + block_frames]))
+        position += block_frames
+    segments.extend(packer.finish())
+
+    problems = []
+    last_end = 0
+    for expected_index, segment in enumerate(segments):
+        label = f"segment {segment.index} (max {packer.max_samples})"
+        if segment.index != expected_index:
+            problems.append(f"{label}: index out of order")
+        if segment.num_samples > packer.max_samples:
+            problems.append(f"{label}: {segment.num_samples} samples")
+        expected = np.concatenate([audio[start:end] for start, end in segment.ranges]).astype(np.float32) / 32768.0
+        if len(expected) != len(segment.audio) or not np.allclose(expected, segment.audio):
+            problems.append(f"{label}: audio does not match its ranges")
+        for start, end in segment.ranges:
+            if start < last_end or end <= start:
+                problems.append(f"{label}: range ({start}, {end}) overlaps or is empty")
+            last_end = end
+    return problems
+
+
+def test_segments_never_exceed_max_samples(cases: int = 300, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    failures = []
+    for case in range(cases):
+        failures.extend(f"case {case}: {problem}" for problem in run_case(rng))
+    assert not failures, "\n".join(failures[:20])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Property check of the streaming speech packer")
+    parser.add_argument("--cases", type=int, default=300, help="Random streams to check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    failed = 0
+    for case in range(args.cases):
+        problems = run_case(rng)
+        if problems:
+            failed += 1
+            print(f"case {case}: " + "; ".join(problems[:3]))
+    print(f"{args.cases - failed}/{args.cases} cases passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# trace_report.py
+#
+# Offline report for the JSONL span traces written by SCRIPT/tracing.py
+# (tracing_enabled in the config, or batch_transcribe.py --trace DIR)
+#
+# For every session (one long-form recording, real-time run or static job):
+# - Timeline: spans in start order, nested by parent, with their offset from
+#   the session start, duration, thread and attributes
+# - Time per stage: total and count per span name
+# - Critical path: walking back from the end, the chain of work spans that
+#   finished last (waits skipped), so the time of a slow stop (long-form) or
+#   job (static) is split into transcription, capture, I/O, paste, ... and
+#   untraced gaps
+#
+# --chrome writes a Chrome trace (chrome://tracing, Perfetto, or speedscope,
+# which imports this format): one process per session, one track per thread.
+#
+# Usage:
+#   python trace_report.py TRACE.jsonl [TRACE.jsonl ...] [--session ID] [--last N]
+#                          [--window stop,job] [--max-spans 200] [--chrome trace.json]
+
+import sys
+import json
+import argparse
+from collections import defaultdict, OrderedDict
+
+EPSILON = 1e-6
+
+
+def load_spans(paths):
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"{path}:{line_number}: skipping a malformed line", file=sys.stderr)
+                    continue
+                span["end"] = span["ts"] + span["dur"]
+                spans.append(span)
+    return spans
+
+
+def group_sessions(spans):
+    sessions = defaultdict(list)
+    for span in spans:
+        sessions[span.get("session") or "(no session)"].append(span)
+    for session_spans in sessions.values():
+        session_spans.sort(key=lambda s: (s["ts"], -s["dur"]))
+    return OrderedDict(sorted(sessions.items(), key=lambda item: item[1][0]["ts"]))
+
+
+def describe(span):
+    attrs = span.get("attrs") or {}
+    shown = {k: v for k, v in attrs.items() if k != "waits"}
+    return span["name"] + ("(" + ", ".join(f"{k}={v}" for k, v in shown.items()) + ")" if shown else "")
+
+
+def print_timeline(session_spans, max_spans):
+    start = session_spans[0]["ts"]
+    depth = {}
+    for span in session_spans:
+        depth[span["id"]] = depth.get(span.get("parent"), -1) + 1 if span.get("parent") in depth else 0
+    print(f"  {'offset':>9} {'duration':>9}  span")
+    for span in session_spans[:max_spans]:
+        indent = "  " * depth[span["id"]]
+        print(f"  {span['ts'] - start:8.3f}s {span['dur'] * 1000:8.1f}ms  {indent}{describe(span)}  [{span['thread']}]")
+    if len(session_spans) > max_spans:
+        print(f"  ... {len(session_spans) - max_spans} more spans")
+
+
+def print_stage_totals(session_spans):
+    totals = defaultdict(lambda: [0.0, 0])
+    for span in session_spans:
+        totals[span["name"]][0] += span["dur"]
+        totals[span["name"]][1] += 1
+    print(f"  {'stage':<18} {'total':>10} {'count':>7} {'mean':>10}")
+    for name, (total, count) in sorted(totals.items(), key=lambda item: -item[1][0]):
+        print(f"  {name:<18} {total:9.3f}s {count:7d} {total / count * 1000:8.1f}ms")
+
+
+def critical_path(session_spans, start, end, exclude_names):
+    """Chain of work spans that finished last, walking back from `end`; gaps are untraced time."""
+    parents = {span.get("parent") for span in session_spans}
+    work = [s for s in session_spans
+            if s["id"] not in parents                     # Leaves: the innermost work
+            and not (s.get("attrs") or {}).get("waits")    # Waiting for other spans is not work
+            and s["name"] not in exclude_names
+            and s["ts"] < end and s["end"] > start]
+    path = []
+    cursor = end
+    while cursor > start + EPSILON:
+        candidates = [s for s in work if s["ts"] < cursor - EPSILON]
+        if not candidates:
+            path.append((None, start, cursor))
+            break
+        best = max(candidates, key=lambda s: (min(s["end"], cursor), -s["ts"]))
+        finish = min(best["end"], cursor)
+        if finish < cursor - EPSILON:
+            path.append((None, finish, cursor))
+        begin = max(best["ts"], start)
+        path.append((best, begin, finish))
+        cursor = begin
+    path.reverse()
+    return path
+
+
+def print_critical_path(title, path, origin, by_id):
+    total = sum(finish - begin for _, begin, finish in path) or EPSILON
+    print(f"  Critical path of {title}: {total:.3f} s")
+    by_stage = defaultdict(float)
+    for span, begin, finish in path:
+        label = "(untraced)"
+        if span is not None:
+            # The parent says what the work was for (e.g. which chunk a decode belongs to)
+            parent = by_id.get(span.get("parent"))
+            label = (describe(parent) + " > " if parent is not None else "") + describe(span)
+        by_stage[span["name"] if span is not None else "(untraced)"] += finish - begin
+        if finish - begin >= 0.001:
+            print(f"    {begin - origin:8.3f}s +{(finish - begin) * 1000:8.1f}ms  {label}")
+    print("    breakdown: " + ", ".join(f"{name} {seconds:.3f}s ({100 * seconds / total:.0f}%)"
+                                       for name, seconds in sorted(by_stage.items(), key=lambda item: -item[1])))
+
+
+def chrome_trace(sessions):
+    events = []
+    for pid, (session, session_spans) in enumerate(sessions.items(), 1):
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": session}})
+        threads = {}
+        for span in session_spans:
+            if span["thread"] not in threads:
+                threads[span["thread"]] = len(threads) + 1
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": threads[span["thread"]],
+                               "args": {"name": span["thread"]}})
+            events.append({
+                "name": span["name"],
+                "cat": span.get("pipeline") or "",
+                "ph": "X",
+                "ts": span["ts"] * 1e6,
+                "dur": span["dur"] * 1e6,
+                "pid": pid,
+                "tid": threads[span["thread"]],
+                "args": span.get("attrs") or {},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Timelines and critical paths from pipeline traces")
+    parser.add_argument("traces", nargs="+", help="JSONL trace files")
+    parser.add_argument("--session", default=None, help="Only sessions whose id starts with this")
+    parser.add_argument("--last", type=int, default=None, help="Only the last N sessions")
+    parser.add_argument("--window", default="stop,job",
+                        help="Span names whose time is explained by a critical path (comma-separated)")
+    parser.add_argument("--max-spans", type=int, default=200, help="Timeline lines per session")
+    parser.add_argument("--chrome", default=None, help="Write a Chrome trace (also opens in speedscope)")
+    args = parser.parse_args()
+
+    sessions = group_sessions(load_spans(args.traces))
+    if args.session:
+        sessions = OrderedDict((k, v) for k, v in sessions.items() if k.startswith(args.session))
+    if args.last:
+        sessions = OrderedDict(list(sessions.items())[-args.last:])
+    if not sessions:
+        sys.exit("No matching sessions.")
+    windows = {name.strip() for name in args.window.split(",") if name.strip()}
+
+    for session, session_spans in sessions.items():
+        start = session_spans[0]["ts"]
+        end = max(span["end"] for span in session_spans)
+        pipeline = session_spans[0].get("pipeline") or "?"
+        print(f"\n=== {session} ({pipeline}): {end - start:.3f} s, {len(session_spans)} spans ===")
+        print_timeline(session_spans, args.max_spans)
+        print()
+        print_stage_totals(session_spans)
+        print()
+        by_id = {span["id"]: span for span in session_spans}
+        window_spans = [span for span in session_spans if span["name"] in windows]
+        if window_spans:
+            for window in window_spans:
+                print_critical_path(describe(window), critical_path(session_spans, window["ts"], window["end"], windows),
+                                    start, by_id)
+        else:
+            print_critical_path("the session", critical_path(session_spans, start, end, windows), start, by_id)
+
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as f:
+            json.dump(chrome_trace(sessions), f)
+        print(f"\nChrome trace written to {args.chrome}")
+
+
+if __name__ == "__main__":
+    main()
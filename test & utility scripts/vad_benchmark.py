@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# vad_benchmark.py
+#
+# Benchmarks the VAD backends from SCRIPT/voice_activity_detection.py
+#
+# For every backend available in this environment it reports:
+# - Throughput in frames/second (and how many times faster than real time)
+# - Fraction of audio classified as speech
+# - Frame agreement with a reference backend (WebRTC when installed),
+#   compared on a common 10 ms time grid since frame sizes differ
+#
+# Usage:
+#   python vad_benchmark.py [audio_file] [--reference webrtc] [--onnx-model path] [--aggressiveness 2]
+#
+# By default the WER test audio (WER testing/test3.mp3) is used.
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import numpy as np
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCRIPT")
+sys.path.insert(0, os.path.abspath(SCRIPT_DIR))
+
+from voice_activity_detection import available_vad_backends, create_vad_backend  # noqa: E402
+
+DEFAULT_AUDIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WER testing", "test3.mp3")
+SAMPLE_RATE = 16000
+GRID_SAMPLES = 160  # 10 ms comparison grid
+
+
+def load_audio(path: str) -> np.ndarray:
+    """Decode any ffmpeg-readable file to 16 kHz mono int16 samples."""
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+def to_grid(flags: np.ndarray, frame_samples: int, n_samples: int) -> np.ndarray:
+    """Resample per-frame decisions onto the common 10 ms grid."""
+    grid_positions = np.arange(n_samples // GRID_SAMPLES) * GRID_SAMPLES
+    frame_index = grid_positions // frame_samples
+    valid = frame_index < len(flags)
+    grid = np.zeros(len(grid_positions), dtype=bool)
+    grid[valid] = flags[frame_index[valid]]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VAD backends")
+    parser.add_argument("audio", nargs="?", default=DEFAULT_AUDIO)
+    parser.add_argument("--reference", default="webrtc", help="Backend used as the agreement reference")
+    parser.add_argument("--onnx-model", default="", help="Path to a Silero-style ONNX VAD model")
+    parser.add_argument("--aggressiveness", type=int, default=2)
+    args = parser.parse_args()
+
+    samples = load_audio(args.audio)
+    duration = len(samples) / SAMPLE_RATE
+    print(f"Audio: {args.audio} ({duration:.1f} s)")
+
+    names = available_vad_backends()
+    if "onnx" in names and not args.onnx_model:
+        names.remove("onnx")
+
+    results = {}
+    for name in names:
+        backend = create_vad_backend(name, SAMPLE_RATE, args.aggressiveness, model_path=args.onnx_model)
+        if backend.name != name:
+            continue
+
+        start = time.perf_counter()
+        flags = backend.speech_flags(samples)
+        elapsed = time.perf_counter() - start
+
+        results[name] = {
+            "frames": len(flags),
+            "fps": len(flags) / elapsed if elapsed > 0 else float("inf"),
+            "xrt": duration / elapsed if elapsed > 0 else float("inf"),
+            "speech_ratio": float(flags.mean()) if len(flags) else 0.0,
+            "grid": to_grid(flags, backend.frame_samples, len(samples)),
+        }
+
+    reference = args.reference if args.reference in results else next(iter(results))
+    ref_grid = results[reference]["grid"]
+
+    print(f"Reference backend for agreement: {reference}\n")
+    print(f"{'backend':<10}{'frames':>10}{'frames/s':>14}{'x realtime':>12}{'speech %':>10}{'agreement %':>13}")
+    for name, r in results.items():
+        agreement = float(np.mean(r["grid"] == ref_grid)) * 100
+        print(f"{name:<10}{r['frames']:>10}{r['fps']:>14.0f}{r['xrt']:>12.0f}"
+              f"{r['speech_ratio'] * 100:>10.1f}{agreement:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
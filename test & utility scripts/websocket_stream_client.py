@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# websocket_stream_client.py
+#
+# Streams an audio file to the WebSocket streaming endpoint (SCRIPT/websocket_streaming.py)
+#
+# Opens one or more concurrent sessions, sends the file as 16 kHz mono PCM in
+# 100 ms frames at the chosen speed and prints what comes back:
+# - Partials (with --show-partials) and finals as they arrive
+# - Per session: finals, partials, wall time and final latency p50/max
+#
+# Usage:
+#   python websocket_stream_client.py [audio_file] [--url ws://127.0.0.1:34911/v1/stream]
+#                                     [--sessions 1] [--speed 1.0] [--language el] [--show-partials]
+#
+# A speed above the server's websocket_max_speed shows the backpressure: the
+# wall time stays close to the audio length divided by the allowed speed.
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+import websockets
+
+DEFAULT_AUDIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WER testing", "test3.mp3")
+SAMPLE_RATE = 16000
+FRAME_BYTES = SAMPLE_RATE // 10 * 2
+
+
+def load_pcm(path: str) -> bytes:
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return result.stdout
+
+
+async def run_session(index: int, url: str, pcm: bytes, speed: float, show_partials: bool) -> dict:
+    finals, partials = [], 0
+    start = time.monotonic()
+    async with websockets.connect(url) as ws:
+        async def receive():
+            nonlocal partials
+            async for message in ws:
+                reply = json.loads(message)
+                if reply["type"] == "partial":
+                    partials += 1
+                    if show_partials:
+                        print(f"[{index}] ~ {reply['text']}")
+                elif reply["type"] == "final":
+                    finals.append(reply)
+                    print(f"[{index}] {reply['start']:7.2f}-{reply['end']:7.2f}  {reply['text']}  "
+                          f"({reply['latency_ms']:.0f} ms)")
+                elif reply["type"] == "done":
+                    return
+
+        receiver = asyncio.create_task(receive())
+        for offset in range(0, len(pcm), FRAME_BYTES):
+            await ws.send(pcm[offset:offset + FRAME_BYTES])
+            await asyncio.sleep(FRAME_BYTES / 2 / SAMPLE_RATE / speed)
+        await ws.send(json.dumps({"type": "end"}))
+        await receiver
+
+    latencies = np.array([f["latency_ms"] for f in finals]) if finals else np.zeros(1)
+    return {"session": index, "finals": len(finals), "partials": partials, "wall": time.monotonic() - start,
+            "latency_p50": float(np.percentile(latencies, 50)), "latency_max": float(latencies.max())}
+
+
+async def run(args) -> None:
+    pcm = load_pcm(args.audio)
+    url = args.url + (f"?language={args.language}" if args.language else "")
+    print(f"Streaming {len(pcm) / 2 / SAMPLE_RATE:.1f} s of audio over {args.sessions} session(s) at {args.speed}x")
+    results = await asyncio.gather(*(run_session(i, url, pcm, args.speed, args.show_partials)
+                                     for i in range(args.sessions)))
+    print()
+    for r in results:
+        print(f"Session {r['session']}: {r['finals']} finals, {r['partials']} partials in {r['wall']:.1f} s, "
+              f"final latency p50 {r['latency_p50']:.0f} ms, max {r['latency_max']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream an audio file to the WebSocket transcription endpoint")
+    parser.add_argument("audio", nargs="?", default=DEFAULT_AUDIO)
+    parser.add_argument("--url", default="ws://127.0.0.1:34911/v1/stream")
+    parser.add_argument("--sessions", type=int, default=1, help="Concurrent sessions")
+    parser.add_argument("--speed", type=float, default=1.0, help="Sending speed relative to real time")
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--show-partials", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()